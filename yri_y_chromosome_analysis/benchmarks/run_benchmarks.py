@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Benchmark the analysis pipeline stages on synthetic cohorts and compare against stored baselines
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..', 'scripts'))
+
+import analyze_yri_haplogroups
+import cohort_stream
+import path_trie
+import visualize_yri_haplogroups
+from instrumentation import current_peak_rss_mb, reset_peak_rss
+from synthetic_cohort import PROFILE_FILE, REFERENCE_DIR, generate_cohort
+from y_tree import tree_file
+
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, 'baselines.json')
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+# Path and derived-SNP files run to several KB per sample
+PATHS_MAX_SAMPLES = 100_000
+PLOT_DPI = 72
+
+def measure(function, *args, **kwargs):
+    """Run one stage; returns (result, {'seconds', 'peak_mb'})"""
+    reset_peak_rss()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = function(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    return result, {'seconds': round(seconds, 4), 'peak_mb': round(current_peak_rss_mb(), 1)}
+
+def _in_fresh_process(function, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(function, *args).result()
+
+def benchmark_size(n_samples, files, work_dir):
+    """Time every stage on one synthetic cohort
+
+    Runs in a fresh process per size (see run_benchmarks), so peaks are not
+    inflated by the generator or by memory an earlier cohort left behind.
+    Returns a dict mapping stage name to its measurements.
+    """
+    output_dir = os.path.join(work_dir, f"results_{n_samples}")
+
+    stages = {}
+    df, stages['load'] = measure(analyze_yri_haplogroups.load_haplogroup_data, files['haplogroups'])
+    counts_dict, stages['analyze'] = measure(analyze_yri_haplogroups.analyze_haplogroup_frequencies, df)
+    tables, stages['tables'] = measure(analyze_yri_haplogroups.create_frequency_tables, counts_dict)
+    e_tables, stages['e_subclades'] = measure(analyze_yri_haplogroups.analyze_e_subclades, counts_dict)
+    _, stages['save'] = measure(analyze_yri_haplogroups.save_analysis_results, df, counts_dict,
+                                *tables, *e_tables[:2], output_dir=output_dir)
+    del df, counts_dict, tables, e_tables
+
+    _, stages['stream'] = measure(cohort_stream.aggregate_cohort, files['haplogroups'],
+                                  os.path.join(work_dir, f"stream_{n_samples}"), write_analyzed=False)
+    if 'paths' in files:
+        _, stages['path_trie'] = measure(path_trie.load_path_trie, files['paths'])
+
+    paths = dict(analyze_yri_haplogroups.result_paths(output_dir), tree=tree_file(REFERENCE_DIR, 'aligned.ycc'))
+    visualize_yri_haplogroups.init_renderer()
+    for name, (_, inputs, default_output) in visualize_yri_haplogroups.FIGURES.items():
+        _, stages[f"plot:{name}"] = measure(visualize_yri_haplogroups.render_figure, name,
+                                            {key: paths[key] for key in inputs},
+                                            os.path.join(output_dir, default_output), PLOT_DPI)
+    return stages
+
+def run_benchmarks(sizes=DEFAULT_SIZES, work_dir=None, seed=0):
+    """Generate and benchmark every cohort size, each step in its own worker process"""
+    results = {}
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        for n_samples in sizes:
+            files = _in_fresh_process(generate_cohort, n_samples, os.path.join(tmp, f"cohort_{n_samples}"),
+                                      'SYN_males_chrY', REFERENCE_DIR, PROFILE_FILE, 0.8, 0.8,
+                                      n_samples <= PATHS_MAX_SAMPLES, seed)
+            results[str(n_samples)] = _in_fresh_process(benchmark_size, n_samples, files, tmp)
+            print(f"{n_samples:>10} samples: "
+                  + ", ".join(f"{stage} {m['seconds']:.2f}s" for stage, m in results[str(n_samples)].items()))
+    return results
+
+def compare(results, baselines, time_tolerance=0.5, memory_tolerance=0.25, min_seconds=0.05, min_mb=16):
+    """Stages slower or larger than their baseline beyond the tolerances
+
+    A stage regresses when it takes more than (1 + time_tolerance) times its
+    baseline plus min_seconds, or peaks more than (1 + memory_tolerance)
+    times its baseline plus min_mb; the absolute slack keeps tiny stages
+    from flapping on timer noise. Sizes or stages without a baseline are
+    not compared. Returns a list of (size, stage, metric, baseline, value).
+    """
+    regressions = []
+    for size, stages in results.items():
+        for stage, measured in stages.items():
+            baseline = baselines.get('sizes', {}).get(size, {}).get(stage)
+            if not baseline:
+                continue
+            if measured['seconds'] > baseline['seconds'] * (1 + time_tolerance) + min_seconds:
+                regressions.append((size, stage, 'seconds', baseline['seconds'], measured['seconds']))
+            if measured['peak_mb'] > baseline['peak_mb'] * (1 + memory_tolerance) + min_mb:
+                regressions.append((size, stage, 'peak_mb', baseline['peak_mb'], measured['peak_mb']))
+    return regressions
+
+def load_baselines(path=BASELINE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_baselines(results, path=BASELINE_FILE):
+    """Store results as the new baselines, keeping sizes that were not rerun"""
+    baselines = load_baselines(path)
+    baselines['machine'] = {'platform': platform.platform(), 'python': platform.python_version(),
+                            'cpus': os.cpu_count()}
+    baselines.setdefault('sizes', {}).update(results)
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="cohort sizes to benchmark (10^3 to 10^7)")
+    parser.add_argument('--baselines', default=BASELINE_FILE)
+    parser.add_argument('--update-baselines', action='store_true',
+                        help="store this run as the new baselines instead of comparing")
+    parser.add_argument('--time-tolerance', type=float, default=0.5,
+                        help="allowed relative slowdown before a stage counts as regressed")
+    parser.add_argument('--memory-tolerance', type=float, default=0.25,
+                        help="allowed relative peak-memory growth before a stage counts as regressed")
+    parser.add_argument('--output', help="also write the measurements to this JSON file")
+    parser.add_argument('--work-dir', help="where to put the temporary synthetic cohorts")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.work_dir, args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baselines:
+        save_baselines(results, args.baselines)
+        print(f"Baselines updated: {args.baselines}")
+        return results
+
+    regressions = compare(results, load_baselines(args.baselines), args.time_tolerance, args.memory_tolerance)
+    for size, stage, metric, baseline, value in regressions:
+        print(f"REGRESSION {stage} at {size} samples: {metric} {value} (baseline {baseline})")
+    if regressions:
+        sys.exit(1)
+    print("No regressions against baselines")
+    return results
+
+if __name__ == "__main__":
+    results = main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic yhaplo-style cohorts from the ISOGG tree for benchmarking
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from analyze_yri_haplogroups import load_haplogroup_data
+from haplogroup_caller import load_reference
+from y_tree import node_lookup
+
+REFERENCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'results', 'yri_haplogroups')
+PROFILE_FILE = os.path.join(REFERENCE_DIR, 'haplogroups.YRI_males_chrY.txt')
+
+# Distinct SNP subsets drawn per terminal node; samples pick one at random
+VARIANTS = 4
+CHUNK_ROWS = 1_000_000
+
+def terminal_weights(reference, profile_file=PROFILE_FILE, profile_weight=0.8):
+    """Probability of each tree node being a sample's terminal haplogroup
+
+    A profile_weight share follows the haplogroup frequencies observed in
+    profile_file (by default the 52 YRI calls), so cohorts are dominated by
+    a realistic handful of lineages. The rest is spread evenly over the
+    leaves of the whole tree, which keeps rare and deep lineages in play
+    in proportion to how finely ISOGG resolves each clade.
+    """
+    parent = np.asarray(reference['parent'])
+    n_nodes = len(parent)
+    is_leaf = np.bincount(parent[1:], minlength=n_nodes) == 0
+
+    weights = (1 - profile_weight) * is_leaf / is_leaf.sum()
+    if profile_file and profile_weight:
+        lookup = node_lookup(reference['names'])
+        labels = load_haplogroup_data(profile_file)['YCC_Haplogroup']
+        nodes = np.array([lookup[label] for label in labels if label in lookup])
+        weights += profile_weight * np.bincount(nodes, minlength=n_nodes) / len(nodes)
+
+    return weights / weights.sum()
+
+class CohortWriter:
+    """Formats yhaplo output lines for sampled terminal nodes
+
+    Lines are assembled from per-node templates that are built lazily, the
+    first time a node is drawn: VARIANTS random subsets of the SNPs along
+    its root-to-node path (each SNP observed with probability coverage)
+    and a matching terminal SNP. A sample's line is its ID plus one
+    template, so writing costs O(samples) string joins.
+    """
+
+    def __init__(self, reference, coverage=0.8, seed=0):
+        self.names = reference['names']
+        self.representative = reference['representative']
+        self.parent = np.asarray(reference['parent'])
+        snps = reference['snps']
+        self.node_snps = {node: group['SNP'].tolist() for node, group in snps.groupby('Node', sort=False)}
+        self.coverage = coverage
+        self.rng = np.random.default_rng(seed)
+        self._templates = {}
+
+    def _chain(self, node):
+        chain = []
+        while node > 0:
+            chain.append(node)
+            node = self.parent[node]
+        return chain[::-1]
+
+    def _build(self, node):
+        ycc = self.names[node]
+        hg_prefix = self.representative[node].rsplit('-', 1)[0]
+        variants = []
+        for _ in range(VARIANTS):
+            terminal_snps = self.node_snps.get(node, [])
+            terminal = (f"{hg_prefix}-{terminal_snps[self.rng.integers(len(terminal_snps))]}"
+                        if terminal_snps else self.representative[node])
+            path_steps, derived_steps = [], []
+            for step in self._chain(node):
+                snps = self.node_snps.get(step, [])
+                observed = [snp for snp, seen in zip(snps, self.rng.random(len(snps)) < self.coverage)
+                            if seen or (step == node and f"{hg_prefix}-{snp}" == terminal)]
+                if observed:
+                    path_steps.append(f"{self.names[step]}:{len(observed)}:{','.join(observed)}")
+                    derived_steps.extend(f"{self.names[step]}:{snp}" for snp in observed)
+            variants.append((
+                f" {terminal:15s} {self.representative[node]:15s} {ycc:25s}\n",
+                f" {ycc:25s} {terminal:15s} | {' '.join(path_steps)}\n",
+                f" {ycc:25s} {terminal:15s} | {' '.join(derived_steps)}\n",
+            ))
+        return variants
+
+    def lines(self, sample_ids, nodes, kind):
+        """Lines of one output kind (0 haplogroups, 1 paths, 2 derived SNPs) for a chunk"""
+        variant = self.rng.integers(VARIANTS, size=len(nodes))
+        out = []
+        for sample_id, node, v in zip(sample_ids, nodes.tolist(), variant.tolist()):
+            templates = self._templates.get(node)
+            if templates is None:
+                templates = self._templates[node] = self._build(node)
+            out.append(f"{sample_id:8s}" + templates[v][kind])
+        return out
+
+def output_files(output_dir, name):
+    """Paths of the generated haplogroups, paths and derived SNP files"""
+    return {kind: os.path.join(output_dir, f"{kind}.{name}.txt")
+            for kind in ('haplogroups', 'paths', 'derived.snps')}
+
+def generate_cohort(n_samples, output_dir, name='SYN_males_chrY', reference_dir=REFERENCE_DIR,
+                    profile_file=PROFILE_FILE, profile_weight=0.8, coverage=0.8, paths=True,
+                    seed=0, chunk_rows=CHUNK_ROWS):
+    """Write a synthetic cohort of n_samples in yhaplo's output layout
+
+    Always writes haplogroups.<name>.txt; with paths, also the matching
+    paths.<name>.txt and derived.snps.<name>.txt (several KB per sample, so
+    best kept for cohorts up to ~10^5). Samples are drawn in chunks, so
+    memory stays flat up to 10^7 samples. Returns the paths written.
+    """
+    reference = load_reference(reference_dir)
+    weights = terminal_weights(reference, profile_file, profile_weight)
+    writer = CohortWriter(reference, coverage, seed)
+    rng = np.random.default_rng(seed)
+
+    os.makedirs(output_dir, exist_ok=True)
+    files = output_files(output_dir, name)
+    kinds = ['haplogroups'] + (['paths', 'derived.snps'] if paths else [])
+    handles = {kind: open(files[kind], 'w') for kind in kinds}
+    try:
+        for start in range(0, n_samples, chunk_rows):
+            size = min(chunk_rows, n_samples - start)
+            nodes = rng.choice(len(weights), size=size, p=weights)
+            sample_ids = [f"SYN{i:07d}" for i in range(start, start + size)]
+            for kind_index, kind in enumerate(['haplogroups', 'paths', 'derived.snps']):
+                if kind in handles:
+                    handles[kind].writelines(writer.lines(sample_ids, nodes, kind_index))
+    finally:
+        for handle in handles.values():
+            handle.close()
+
+    return {kind: files[kind] for kind in kinds}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('n_samples', type=int, help="cohort size (10^3 to 10^7)")
+    parser.add_argument('--output-dir', default='synthetic')
+    parser.add_argument('--name', default='SYN_males_chrY')
+    parser.add_argument('--reference-dir', default=REFERENCE_DIR,
+                        help="yhaplo --all_aux_output directory holding the tree and ISOGG tables")
+    parser.add_argument('--profile', default=PROFILE_FILE,
+                        help="haplogroups.*.txt whose frequencies the cohort follows")
+    parser.add_argument('--profile-weight', type=float, default=0.8,
+                        help="share of samples drawn from the profile (rest: uniform over tree leaves)")
+    parser.add_argument('--coverage', type=float, default=0.8, help="probability each path SNP is observed")
+    parser.add_argument('--no-paths', action='store_true', help="only write the haplogroups file")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    files = generate_cohort(args.n_samples, args.output_dir, args.name, args.reference_dir, args.profile,
+                            args.profile_weight, args.coverage, not args.no_paths, args.seed)
+    print(f"Generated {args.n_samples} synthetic samples:")
+    for path in files.values():
+        print(f"- {path}")
+
+    return files
+
+if __name__ == "__main__":
+    files = main()
@@ -3,129 +3,137 @@
 Analyze YRI Y-chromosome haplogroup results from yhaplo
 """
 
+import os
+
 import pandas as pd
-import numpy as np
-from collections import Counter
-import matplotlib.pyplot as plt
-import seaborn as sns
+
+from diversity_stats import diversity_table, rarefied_richness
+from frequency_engine import standard_frequency_tables
+from lineage_encoder import encode_lineages, level_labels
+
+# Output files written by save_analysis_results(), keyed by table
+RESULT_FILES = {
+    'analyzed': '{prefix}_haplogroups_analyzed.csv',
+    'major': '{prefix}_major_haplogroup_frequencies.csv',
+    'ycc': '{prefix}_ycc_haplogroup_frequencies.csv',
+    'terminal_snp': '{prefix}_terminal_snp_frequencies.csv',
+    'e1': '{prefix}_e_subclade_l1_frequencies.csv',
+    'e2': '{prefix}_e_subclade_l2_frequencies.csv',
+    'summary': '{prefix}_haplogroup_analysis_summary.txt',
+}
+
+# Subsample sizes at which the summary rarefies richness for cross-population comparison
+RAREFACTION_SIZES = (10, 25, 50)
+
+# Columns of yhaplo's haplogroups.*.txt
+HAPLOGROUP_COLUMNS = ['Sample_ID', 'Terminal_SNP', 'Representative_SNP', 'YCC_Haplogroup']
+
+def result_paths(output_dir='.', prefix='yri'):
+    """Paths of the analysis outputs for one population prefix"""
+    return {key: os.path.join(output_dir, name.format(prefix=prefix))
+            for key, name in RESULT_FILES.items()}
 
 def load_haplogroup_data(file_path):
     """Load haplogroup data from yhaplo output"""
-    # Read the haplogroup file (whitespace-separated, no header)
-    df = pd.read_csv(file_path, sep='\s+', header=None, 
-                     names=['Sample_ID', 'Terminal_SNP', 'Representative_SNP', 'YCC_Haplogroup'])
-    # Strip any trailing whitespace
-    df = df.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
+    # Read the haplogroup file (whitespace-separated, no header); splitting on
+    # whitespace already drops the fixed-width padding
+    try:
+        df = pd.read_csv(file_path, sep=r'\s+', header=None, names=HAPLOGROUP_COLUMNS, dtype=str)
+    except pd.errors.EmptyDataError:
+        df = pd.DataFrame(columns=HAPLOGROUP_COLUMNS, dtype=str)
     return df
 
-def analyze_haplogroup_frequencies(df):
-    """Analyze haplogroup frequencies at different phylogenetic levels"""
+def add_analysis_columns(df):
+    """Add the major haplogroup and E subclade level columns; returns the encoded lineages"""
+    
+    # Parse each distinct YCC label once into its ancestor chain
+    lineages = encode_lineages(df['YCC_Haplogroup'])
     
     # Extract major haplogroup (first letter)
     df['Major_Haplogroup'] = df['YCC_Haplogroup'].str[0]
     
     # Extract E subclade levels
-    df['E_Level1'] = df['YCC_Haplogroup'].str.extract(r'(E\d+)')
-    df['E_Level2'] = df['YCC_Haplogroup'].str.extract(r'(E\d+[a-z]+)')
-    df['E_Level3'] = df['YCC_Haplogroup'].str.extract(r'(E\d+[a-z]+\d+)')
+    df['E_Level1'] = level_labels(lineages, 1, major='E')
+    df['E_Level2'] = level_labels(lineages, 2, major='E')
+    df['E_Level3'] = level_labels(lineages, 3, major='E')
     
-    # Count frequencies at different levels
-    major_counts = df['Major_Haplogroup'].value_counts()
-    ycc_counts = df['YCC_Haplogroup'].value_counts()
-    terminal_snp_counts = df['Terminal_SNP'].value_counts()
+    return lineages
+
+def analyze_haplogroup_frequencies(df):
+    """Analyze haplogroup frequencies at different phylogenetic levels"""
     
-    # E subclade analysis
-    e_samples = df[df['Major_Haplogroup'] == 'E']
-    e1_counts = e_samples['E_Level1'].value_counts()
-    e2_counts = e_samples['E_Level2'].value_counts()
-    e3_counts = e_samples['E_Level3'].value_counts()
+    lineages = add_analysis_columns(df)
+    
+    # Count every level (E subclades within E) in one pass over the samples
+    tables = standard_frequency_tables(df)
     
     return {
-        'major': major_counts,
-        'ycc': ycc_counts,
-        'terminal_snp': terminal_snp_counts,
-        'e1': e1_counts,
-        'e2': e2_counts,
-        'e3': e3_counts,
-        'e_samples': e_samples
+        'tables': tables,
+        'e_total': int((df['Major_Haplogroup'] == 'E').sum()),
+        'lineages': lineages
     }
 
-def create_frequency_tables(counts_dict, df):
+def create_frequency_tables(counts_dict):
     """Create detailed frequency tables"""
     
-    total_samples = len(df)
-    
-    # Major haplogroup table
-    major_table = pd.DataFrame({
-        'Haplogroup': counts_dict['major'].index,
-        'Count': counts_dict['major'].values,
-        'Frequency': counts_dict['major'].values / total_samples,
-        'Percentage': (counts_dict['major'].values / total_samples) * 100
-    })
-    
-    # YCC haplogroup table
-    ycc_table = pd.DataFrame({
-        'YCC_Haplogroup': counts_dict['ycc'].index,
-        'Count': counts_dict['ycc'].values,
-        'Frequency': counts_dict['ycc'].values / total_samples,
-        'Percentage': (counts_dict['ycc'].values / total_samples) * 100
-    })
-    
-    # Terminal SNP table
-    terminal_table = pd.DataFrame({
-        'Terminal_SNP': counts_dict['terminal_snp'].index,
-        'Count': counts_dict['terminal_snp'].values,
-        'Frequency': counts_dict['terminal_snp'].values / total_samples,
-        'Percentage': (counts_dict['terminal_snp'].values / total_samples) * 100
-    })
+    tables = counts_dict['tables']
+    major_table = tables['major']
+    ycc_table = tables['ycc'].rename(columns={'Haplogroup': 'YCC_Haplogroup'})
+    terminal_table = tables['terminal_snp'].rename(columns={'Haplogroup': 'Terminal_SNP'})
     
     return major_table, ycc_table, terminal_table
 
 def analyze_e_subclades(counts_dict):
     """Detailed analysis of E haplogroup subclades"""
     
-    e_total = counts_dict['e_samples'].shape[0]
-    
-    # E1 level analysis
-    e1_table = pd.DataFrame({
-        'E_Subclade_L1': counts_dict['e1'].index,
-        'Count': counts_dict['e1'].values,
-        'Frequency_in_E': counts_dict['e1'].values / e_total,
-        'Percentage_in_E': (counts_dict['e1'].values / e_total) * 100
-    })
+    # Frequencies within E: the E samples are the denominator for both levels
+    tables = counts_dict['tables']
+    in_e = {'Frequency': 'Frequency_in_E', 'Percentage': 'Percentage_in_E'}
     
-    # E2 level analysis
-    e2_table = pd.DataFrame({
-        'E_Subclade_L2': counts_dict['e2'].index,
-        'Count': counts_dict['e2'].values,
-        'Frequency_in_E': counts_dict['e2'].values / e_total,
-        'Percentage_in_E': (counts_dict['e2'].values / e_total) * 100
-    })
+    e1_table = tables['e1'].rename(columns={'Haplogroup': 'E_Subclade_L1', **in_e})
+    e2_table = tables['e2'].rename(columns={'Haplogroup': 'E_Subclade_L2', **in_e})
     
-    return e1_table, e2_table, e_total
+    return e1_table, e2_table, counts_dict['e_total']
 
-def save_analysis_results(df, counts_dict, major_table, ycc_table, terminal_table, e1_table, e2_table):
-    """Save all analysis results to files"""
-    
-    # Save raw data with additional columns
-    df.to_csv('yri_haplogroups_analyzed.csv', index=False)
-    
-    # Save frequency tables
-    major_table.to_csv('yri_major_haplogroup_frequencies.csv', index=False)
-    ycc_table.to_csv('yri_ycc_haplogroup_frequencies.csv', index=False)
-    terminal_table.to_csv('yri_terminal_snp_frequencies.csv', index=False)
-    e1_table.to_csv('yri_e_subclade_l1_frequencies.csv', index=False)
-    e2_table.to_csv('yri_e_subclade_l2_frequencies.csv', index=False)
-    
-    # Create summary report
-    total_samples = len(df)
-    e_total = len(counts_dict['e_samples'])
-    
-    summary = f"""
-YRI Y-Chromosome Haplogroup Analysis Summary
+def format_summary(total_samples, e_total, major_table, ycc_table, terminal_table, e1_table,
+                   population='YRI', n_boot=0):
+    """Text of the analysis summary report
+
+    With n_boot > 0 the diversity statistics get 95% intervals from n_boot
+    bootstrap resamples (seed 0, so reruns give the same report).
+    """
+    
+    if total_samples == 0 or ycc_table.empty:
+        raise ValueError(f"No {population} samples with a YCC haplogroup to summarize")
+    
+    top_ycc = ycc_table.iloc[0]
+    findings = [
+        f"- {e_total}/{total_samples} ({e_total/total_samples*100:.1f}%) belong to haplogroup E",
+        f"- Most common YCC haplogroup: {top_ycc['YCC_Haplogroup']} ({top_ycc['Percentage']:.1f}%)",
+    ]
+    if not e1_table.empty:
+        top_e1 = e1_table.iloc[0]
+        findings.append(f"- Most common E subclade: {top_e1['E_Subclade_L1']} "
+                        f"({top_e1['Percentage_in_E']:.1f}% of haplogroup E)")
+    findings.append(f"- {ycc_table.shape[0]} YCC haplogroups and {terminal_table.shape[0]} terminal SNPs observed")
+    findings_text = '\n'.join(findings)
+    
+    counts = ycc_table['Count'].to_numpy()[None, :]
+    diversity = diversity_table(counts, n_boot=n_boot, seed=0).iloc[0]
+    rarefied = rarefied_richness(counts, RAREFACTION_SIZES)[0]
+    diversity_header = f" (95% CI from {n_boot} bootstrap resamples)" if n_boot else ''
+    diversity_lines = '\n'.join(
+        f"- {label}: {diversity[statistic]:.4g}"
+        + (f" ({diversity[f'{statistic}_CI_Low']:.4g}-{diversity[f'{statistic}_CI_High']:.4g})" if n_boot else '')
+        for statistic, label in [('Richness', 'Richness'), ('Shannon', 'Shannon entropy'), ('Nei_h', "Nei's h")])
+    rarefied_lines = ', '.join(f"{expected:.2f} at n={size}" for size, expected in zip(RAREFACTION_SIZES, rarefied)
+                               if size <= total_samples)
+    
+    return f"""
+{population} Y-Chromosome Haplogroup Analysis Summary
 ==========================================
 
-Total YRI male samples analyzed: {total_samples}
+Total {population} male samples analyzed: {total_samples}
 
 Major Haplogroup Distribution:
 {major_table.to_string(index=False)}
@@ -136,31 +144,53 @@ E Haplogroup Subclades (Level 1):
 Most Common YCC Haplogroups:
 {ycc_table.head(10).to_string(index=False)}
 
+YCC Haplogroup Diversity{diversity_header}:
+{diversity_lines}
+- Rarefied richness: {rarefied_lines or 'fewer samples than the smallest rarefaction size'}
+
 Key Findings:
-- {e_total}/{total_samples} ({e_total/total_samples*100:.1f}%) belong to haplogroup E
-- E1b1a1a1 subclades are predominant, consistent with West African ancestry
-- Multiple E1b1a1a1 sublineages present, indicating diverse Y-chromosome lineages
-- Terminal SNPs show fine-scale population structure within YRI
+{findings_text}
 
 """
+
+def save_analysis_results(df, counts_dict, major_table, ycc_table, terminal_table, e1_table, e2_table,
+                          output_dir='.', prefix='yri', population='YRI', n_boot=0):
+    """Save all analysis results to files"""
+    
+    paths = result_paths(output_dir, prefix)
+    os.makedirs(output_dir, exist_ok=True)
     
-    with open('yri_haplogroup_analysis_summary.txt', 'w') as f:
+    # Save raw data with additional columns
+    df.to_csv(paths['analyzed'], index=False)
+    
+    # Save frequency tables
+    major_table.to_csv(paths['major'], index=False)
+    ycc_table.to_csv(paths['ycc'], index=False)
+    terminal_table.to_csv(paths['terminal_snp'], index=False)
+    e1_table.to_csv(paths['e1'], index=False)
+    e2_table.to_csv(paths['e2'], index=False)
+    
+    # Create summary report
+    summary = format_summary(len(df), counts_dict['e_total'], major_table, ycc_table,
+                             terminal_table, e1_table, population, n_boot)
+    
+    with open(paths['summary'], 'w') as f:
         f.write(summary)
     
     print("Analysis complete! Files saved:")
-    print("- yri_haplogroups_analyzed.csv")
-    print("- yri_major_haplogroup_frequencies.csv")
-    print("- yri_ycc_haplogroup_frequencies.csv")
-    print("- yri_terminal_snp_frequencies.csv")
-    print("- yri_e_subclade_l1_frequencies.csv")
-    print("- yri_e_subclade_l2_frequencies.csv")
-    print("- yri_haplogroup_analysis_summary.txt")
-
-def main():
+    for path in paths.values():
+        print(f"- {os.path.relpath(path)}")
+    
+    return paths
+
+def main(haplogroup_file='yri_haplogroups/haplogroups.YRI_males_chrY.txt',
+         output_dir='.', prefix='yri', population='YRI', n_boot=0):
     # Load data
-    df = load_haplogroup_data('yri_haplogroups/haplogroups.YRI_males_chrY.txt')
+    df = load_haplogroup_data(haplogroup_file)
+    if df['YCC_Haplogroup'].dropna().empty:
+        raise ValueError(f"{haplogroup_file}: no {population} samples with a YCC haplogroup")
     
-    print(f"Loaded {len(df)} YRI male samples")
+    print(f"Loaded {len(df)} {population} male samples")
     print(f"Unique YCC haplogroups: {df['YCC_Haplogroup'].nunique()}")
     print(f"Unique terminal SNPs: {df['Terminal_SNP'].nunique()}")
     
@@ -168,13 +198,14 @@ def main():
     counts_dict = analyze_haplogroup_frequencies(df)
     
     # Create frequency tables
-    major_table, ycc_table, terminal_table = create_frequency_tables(counts_dict, df)
+    major_table, ycc_table, terminal_table = create_frequency_tables(counts_dict)
     
     # Analyze E subclades
     e1_table, e2_table, e_total = analyze_e_subclades(counts_dict)
     
     # Save results
-    save_analysis_results(df, counts_dict, major_table, ycc_table, terminal_table, e1_table, e2_table)
+    save_analysis_results(df, counts_dict, major_table, ycc_table, terminal_table, e1_table, e2_table,
+                          output_dir=output_dir, prefix=prefix, population=population, n_boot=n_boot)
     
     return df, counts_dict, major_table, ycc_table, terminal_table, e1_table, e2_table
 
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Derived/ancestral consistency QC of yhaplo calls from counts.anc_der.<name>.txt
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from y_tree import ancestor_matrix, load_tree, node_lookup, tree_file
+
+# Sample-level QC outputs, next to the analysis tables
+QC_FILES = {
+    'samples': '{prefix}_call_qc_samples.csv',
+    'nodes': '{prefix}_call_qc_nodes.csv',
+}
+
+# A call is flagged when any of these is crossed
+QC_THRESHOLDS = {
+    # a node conflicts when its minority state is at least this share of its calls
+    'conflict_share': 0.2,
+    # derived SNPs at nodes off the called path (recurrent or mis-called sites)
+    'max_off_path_derived': 2,
+    # ancestral SNPs on the called path (back-mutations or missed branches)
+    'max_on_path_ancestral': 2,
+    # derived SNPs supporting the terminal node itself (single-SNP terminals are
+    # common at 1000 Genomes coverage, so only unsupported terminals are flagged)
+    'min_terminal_derived': 1,
+}
+
+# Rows of the samples x nodes arrays scored at a time, bounding temporaries
+BLOCK_ROWS = 16_384
+
+def anc_der_file_for(haplogroup_file):
+    """counts.anc_der.<name>.txt written next to haplogroups.<name>.txt by yhaplo --all_aux_output"""
+    directory, base = os.path.split(haplogroup_file)
+    return os.path.join(directory, 'counts.anc_der.' + base[len('haplogroups.'):])
+
+def load_anc_der(anc_der_file):
+    """Load counts.anc_der.<name>.txt into samples x nodes int32 ancestral and derived arrays
+
+    Each sample block lists '<sample> <node> <ancestral> <derived>' for the
+    nodes yhaplo visited and ends with '<sample> <haplogroup> | <terminal
+    SNP> <representative SNP>'. Nodes are columns in order of first
+    appearance; a node a sample never visited counts 0/0.
+    Returns a dict with 'samples', 'nodes', 'calls' (YCC haplogroup per
+    sample), 'ancestral' and 'derived'.
+    """
+    rows = pd.read_csv(anc_der_file, sep=r'\s+', header=None, names=['Sample', 'Node', 'Ancestral', 'Derived', 'Extra'],
+                       dtype=str, usecols=[0, 1, 2, 3])
+    is_call = (rows['Ancestral'] == '|').to_numpy()
+    counts = rows[~is_call]
+    samples = pd.Index(rows.loc[is_call, 'Sample'])
+    sample_codes = samples.get_indexer(counts['Sample'])
+    node_codes, nodes = pd.factorize(counts['Node'])
+
+    shape = (len(samples), len(nodes))
+    ancestral = np.zeros(shape, dtype=np.int32)
+    derived = np.zeros(shape, dtype=np.int32)
+    keep = sample_codes >= 0
+    ancestral[sample_codes[keep], node_codes[keep]] = counts['Ancestral'].to_numpy(dtype=np.int32)[keep]
+    derived[sample_codes[keep], node_codes[keep]] = counts['Derived'].to_numpy(dtype=np.int32)[keep]
+
+    return {
+        'samples': list(samples),
+        'nodes': list(nodes),
+        'calls': rows.loc[is_call, 'Node'].tolist(),
+        'ancestral': ancestral,
+        'derived': derived,
+    }
+
+def on_path_matrix(tree, nodes, calls):
+    """(distinct calls x nodes) boolean matrix of nodes on each call's root-to-terminal path, and each sample's row
+
+    Labels not in the tree are on no path.
+    """
+    lookup = node_lookup(tree['names'])
+    call_codes, call_labels = pd.factorize(pd.Series(calls, dtype=object))
+    column_ids = np.array([lookup.get(node, -1) for node in nodes], dtype=np.int64)
+    call_ids = np.array([lookup.get(label, -1) for label in call_labels], dtype=np.int64)
+
+    tree_nodes = np.unique(np.concatenate([column_ids, call_ids]))
+    tree_nodes = tree_nodes[tree_nodes >= 0]
+    position = np.full(len(tree['parent']), -1, dtype=np.int64)
+    position[tree_nodes] = np.arange(len(tree_nodes))
+    ancestors = ancestor_matrix(tree['parent'], tree_nodes)
+
+    on_path = np.zeros((len(call_labels), len(nodes)), dtype=bool)
+    known_columns = column_ids >= 0
+    for row, call_id in enumerate(call_ids):
+        if call_id >= 0:
+            on_path[row, known_columns] = ancestors[position[column_ids[known_columns]], position[call_id]]
+    return on_path, call_codes, column_ids, call_ids
+
+def score_calls(qc, tree, thresholds=QC_THRESHOLDS, block_rows=BLOCK_ROWS):
+    """Per-sample and per-node consistency metrics of the calls, with array ops over row blocks
+
+    Per sample: SNPs called, share consistent with the call (derived on
+    its path, ancestral off it), conflicting nodes and conflict score (the
+    minority-state share of all calls), derived SNPs off the path,
+    ancestral SNPs on it, and the derived support of the terminal node.
+    Per node: samples observed, conflicting, derived off their path, and
+    ancestral on their path. Samples crossing any threshold get their
+    reasons in 'Flags'.
+    Returns (sample table, node table).
+    """
+    ancestral, derived = qc['ancestral'], qc['derived']
+    on_path, call_codes, column_ids, call_ids = on_path_matrix(tree, qc['nodes'], qc['calls'])
+    # Column of each sample's terminal node (-1 if it was never visited)
+    column_of = {node_id: column for column, node_id in enumerate(column_ids.tolist()) if node_id >= 0}
+    terminal_column = np.array([column_of.get(node_id, -1) for node_id in call_ids.tolist()], dtype=np.int64)
+
+    n_samples, n_nodes = ancestral.shape
+    sample_stats = {name: np.zeros(n_samples, dtype=np.int64) for name in
+                    ('SNPs_Called', 'Consistent', 'Conflicting_Nodes', 'Minority_Calls',
+                     'Off_Path_Derived', 'On_Path_Ancestral', 'Terminal_Derived', 'Terminal_Ancestral')}
+    node_stats = {name: np.zeros(n_nodes, dtype=np.int64) for name in
+                  ('Samples_Observed', 'Samples_Conflicting', 'Samples_Off_Path_Derived',
+                   'Samples_On_Path_Ancestral', 'Ancestral', 'Derived')}
+
+    for start in range(0, n_samples, block_rows):
+        rows = slice(start, min(start + block_rows, n_samples))
+        anc, der = ancestral[rows].astype(np.int64), derived[rows].astype(np.int64)
+        path = on_path[call_codes[rows]]
+        total = anc + der
+        minority = np.minimum(anc, der)
+        conflicting = (minority > 0) & (minority >= thresholds['conflict_share'] * total)
+        off_path_derived = np.where(path, 0, der)
+        on_path_ancestral = np.where(path, anc, 0)
+
+        sample_stats['SNPs_Called'][rows] = total.sum(axis=1)
+        sample_stats['Consistent'][rows] = np.where(path, der, anc).sum(axis=1)
+        sample_stats['Conflicting_Nodes'][rows] = conflicting.sum(axis=1)
+        sample_stats['Minority_Calls'][rows] = minority.sum(axis=1)
+        sample_stats['Off_Path_Derived'][rows] = off_path_derived.sum(axis=1)
+        sample_stats['On_Path_Ancestral'][rows] = on_path_ancestral.sum(axis=1)
+        terminal = terminal_column[call_codes[rows]]
+        visited = terminal >= 0
+        block_index = np.arange(len(terminal))
+        sample_stats['Terminal_Derived'][rows] = np.where(visited, der[block_index, terminal], 0)
+        sample_stats['Terminal_Ancestral'][rows] = np.where(visited, anc[block_index, terminal], 0)
+
+        node_stats['Samples_Observed'] += (total > 0).sum(axis=0)
+        node_stats['Samples_Conflicting'] += conflicting.sum(axis=0)
+        node_stats['Samples_Off_Path_Derived'] += (off_path_derived > 0).sum(axis=0)
+        node_stats['Samples_On_Path_Ancestral'] += (on_path_ancestral > 0).sum(axis=0)
+        node_stats['Ancestral'] += anc.sum(axis=0)
+        node_stats['Derived'] += der.sum(axis=0)
+
+    samples = pd.DataFrame({'Sample_ID': qc['samples'], 'YCC_Haplogroup': qc['calls'], **sample_stats})
+    called = samples['SNPs_Called'].where(samples['SNPs_Called'] > 0)
+    samples['Consistency'] = (samples['Consistent'] / called).round(4)
+    samples['Conflict_Score'] = (samples['Minority_Calls'] / called).round(4)
+
+    reasons = {
+        'conflict': samples['Conflicting_Nodes'] > 0,
+        'off_path_derived': samples['Off_Path_Derived'] > thresholds['max_off_path_derived'],
+        'on_path_ancestral': samples['On_Path_Ancestral'] > thresholds['max_on_path_ancestral'],
+        'weak_terminal': samples['Terminal_Derived'] < thresholds['min_terminal_derived'],
+    }
+    flags = pd.Series('', index=samples.index)
+    for reason, mask in reasons.items():
+        flags[mask] += reason + ','
+    samples['Flags'] = flags.str.rstrip(',')
+
+    nodes = pd.DataFrame({'Node': qc['nodes'], **node_stats})
+    observed = nodes['Samples_Observed'].where(nodes['Samples_Observed'] > 0)
+    nodes['Conflict_Rate'] = (nodes['Samples_Conflicting'] / observed).round(4)
+    nodes = nodes.sort_values(['Samples_Conflicting', 'Samples_Off_Path_Derived'], ascending=False, kind='stable')
+    return samples, nodes.reset_index(drop=True)
+
+def qc_paths(output_dir='.', prefix='yri'):
+    return {key: os.path.join(output_dir, name.format(prefix=prefix)) for key, name in QC_FILES.items()}
+
+def run_qc(anc_der_file, output_dir='.', prefix='yri', tree=None, thresholds=QC_THRESHOLDS):
+    """Score a yhaplo run's calls, write the QC tables and print the flagged samples
+
+    tree defaults to the YCC tree yhaplo wrote next to anc_der_file.
+    Returns (sample table, node table).
+    """
+    qc = load_anc_der(anc_der_file)
+    tree = load_tree(tree or tree_file(os.path.dirname(anc_der_file), 'ycc'))
+    samples, nodes = score_calls(qc, tree, thresholds)
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = qc_paths(output_dir, prefix)
+    samples.to_csv(paths['samples'], index=False)
+    nodes.to_csv(paths['nodes'], index=False)
+
+    flagged = samples[samples['Flags'] != '']
+    print(f"Call QC: {len(flagged)} of {len(samples)} samples flagged "
+          f"({len(qc['nodes'])} nodes, {int((nodes['Samples_Conflicting'] > 0).sum())} with conflicts)")
+    for _, row in flagged.head(20).iterrows():
+        print(f"  {row['Sample_ID']} {row['YCC_Haplogroup']}: {row['Flags']} "
+              f"(consistency {row['Consistency']:.3f}, terminal {row['Terminal_Derived']} derived)")
+    if len(flagged) > 20:
+        print(f"  ... {len(flagged) - 20} more in {paths['samples']}")
+    return samples, nodes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('anc_der_file', nargs='?', default='yri_haplogroups/counts.anc_der.YRI_males_chrY.txt')
+    parser.add_argument('--tree', help="yhaplo YCC Newick tree (default: the one next to anc_der_file)")
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--prefix', default='yri', help="output file prefix")
+    args = parser.parse_args()
+
+    return run_qc(args.anc_der_file, args.output_dir, args.prefix, args.tree)
+
+if __name__ == "__main__":
+    samples, nodes = main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Stream a large yhaplo haplogroups file in chunks and aggregate frequency tables with bounded memory
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from analyze_yri_haplogroups import HAPLOGROUP_COLUMNS, result_paths
+from frequency_engine import STANDARD_LEVELS
+from incremental_results import write_tables
+from instrumentation import current_peak_rss_mb
+from lineage_encoder import encode_lineages, level_labels
+
+CHUNK_ROWS = 500_000
+RSS_TARGET_MB = 1024
+
+# Known dtypes: sample IDs are unique per row, every label column repeats
+HAPLOGROUP_DTYPES = {
+    'Sample_ID': str,
+    'Terminal_SNP': 'category',
+    'Representative_SNP': 'category',
+    'YCC_Haplogroup': 'category',
+}
+
+def iter_haplogroup_chunks(file_path, chunk_rows=CHUNK_ROWS, columns=None):
+    """Yield DataFrames of at most chunk_rows rows with categorical label columns"""
+    columns = columns or HAPLOGROUP_COLUMNS
+    with pd.read_csv(file_path, sep=r'\s+', header=None, names=HAPLOGROUP_COLUMNS, usecols=columns,
+                     dtype={column: HAPLOGROUP_DTYPES[column] for column in columns},
+                     chunksize=chunk_rows) as reader:
+        yield from reader
+
+def _category_columns(categories):
+    """Derived analysis columns for each distinct YCC label, with a trailing NaN for missing codes
+
+    The labels are parsed once per chunk, however many rows share them.
+    """
+    labels = np.asarray(categories, dtype=object)
+    lineages = encode_lineages(labels)
+    columns = {
+        'YCC_Haplogroup': labels,
+        'Major_Haplogroup': pd.Series(labels, dtype=object).str[0].to_numpy(),
+        'E_Level1': level_labels(lineages, 1, major='E'),
+        'E_Level2': level_labels(lineages, 2, major='E'),
+        'E_Level3': level_labels(lineages, 3, major='E'),
+    }
+    return {column: np.append(values, np.nan) for column, values in columns.items()}
+
+def _code_counts(codes, n_categories):
+    """Rows per category code and the first row each code appears in"""
+    present = codes[codes >= 0]
+    counts = np.bincount(present, minlength=n_categories)
+    first = np.full(n_categories, len(codes), dtype=np.int64)
+    seen, first_index = np.unique(present, return_index=True)
+    first[seen] = first_index
+    return counts, first
+
+def _add_counts(counts, labels, code_counts, code_first):
+    """Fold per-code counts into a {label: count} dict, new labels in first-appearance order"""
+    present = np.flatnonzero(code_counts)
+    for code in present[np.argsort(code_first[present], kind='stable')]:
+        label = labels[code]
+        if isinstance(label, str):
+            counts[label] = counts.get(label, 0) + int(code_counts[code])
+
+def aggregate_cohort(haplogroup_file, output_dir='.', prefix='yri', population='YRI',
+                     chunk_rows=CHUNK_ROWS, write_analyzed=True):
+    """Chunked equivalent of analyze_yri_haplogroups.main() for very large cohorts
+
+    Each chunk is parsed with categorical label columns; the per-level
+    counts come from bincounts over the category codes, with derived levels
+    (major clade, E subclades) resolved once per distinct YCC label. Only
+    the running per-level counts outlive a chunk, so memory is bounded by
+    chunk_rows and the number of distinct labels, not by the cohort size.
+    With write_analyzed, the analyzed-samples CSV is written chunk by chunk.
+
+    Writes the same frequency tables and summary as the in-memory analysis.
+    Returns (levels, total samples, paths written).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = result_paths(output_dir, prefix)
+    levels = {level: {} for level in STANDARD_LEVELS}
+    total = 0
+
+    columns = None if write_analyzed else ['Terminal_SNP', 'YCC_Haplogroup']
+    for i, chunk in enumerate(iter_haplogroup_chunks(haplogroup_file, chunk_rows, columns)):
+        ycc = chunk['YCC_Haplogroup'].cat
+        ycc_codes = ycc.codes.to_numpy()
+        per_category = _category_columns(ycc.categories)
+        ycc_counts, ycc_first = _code_counts(ycc_codes, len(ycc.categories))
+
+        snp = chunk['Terminal_SNP'].cat
+        snp_counts, snp_first = _code_counts(snp.codes.to_numpy(), len(snp.categories))
+
+        for level, (column, _) in STANDARD_LEVELS.items():
+            if column == 'Terminal_SNP':
+                _add_counts(levels[level], np.asarray(snp.categories, dtype=object), snp_counts, snp_first)
+            else:
+                _add_counts(levels[level], per_category[column], ycc_counts, ycc_first)
+        total += len(chunk)
+
+        if write_analyzed:
+            analyzed = chunk.assign(**{column: per_category[column][ycc_codes]
+                                       for column in ('Major_Haplogroup', 'E_Level1', 'E_Level2', 'E_Level3')})
+            analyzed.to_csv(paths['analyzed'], mode='w' if i == 0 else 'a', header=i == 0, index=False)
+
+    written = write_tables(levels, total, output_dir, prefix, population)
+    if write_analyzed:
+        written['analyzed'] = paths['analyzed']
+    return levels, total, written
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('haplogroup_file', nargs='?', default='yri_haplogroups/haplogroups.YRI_males_chrY.txt')
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--prefix', default='yri')
+    parser.add_argument('--population', default='YRI')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="rows parsed per chunk")
+    parser.add_argument('--no-analyzed', action='store_true',
+                        help="skip the per-sample analyzed CSV (only read the label columns)")
+    parser.add_argument('--rss-target-mb', type=float, default=RSS_TARGET_MB,
+                        help="peak resident memory target; exit with status 1 if exceeded")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    levels, total, paths = aggregate_cohort(args.haplogroup_file, args.output_dir, args.prefix,
+                                            args.population, args.chunk_rows, not args.no_analyzed)
+    elapsed = time.perf_counter() - start
+    peak = current_peak_rss_mb()
+
+    print(f"Aggregated {total} {args.population} samples in {elapsed:.1f}s "
+          f"({args.chunk_rows} rows per chunk)")
+    for path in paths.values():
+        print(f"- {os.path.relpath(path)}")
+    print(f"Peak RSS: {peak:.0f} MiB (target {args.rss_target_mb:.0f} MiB, "
+          f"{'within target' if peak <= args.rss_target_mb else 'EXCEEDED'})")
+
+    if peak > args.rss_target_mb:
+        sys.exit(1)
+    return levels, total, paths
+
+if __name__ == "__main__":
+    levels, total, paths = main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Haplogroup diversity statistics with rarefaction and batched multinomial bootstrap intervals
+"""
+
+import argparse
+import math
+
+import numpy as np
+import pandas as pd
+
+STATISTICS = ('Richness', 'Shannon', 'Nei_h')
+# Cells (replicates x groups x categories) drawn per bootstrap batch
+BATCH_CELLS = 1 << 24
+
+def count_matrix(table, group_by=None, column='Haplogroup'):
+    """(groups x categories) count matrix from a frequency_engine table, with the group keys"""
+    group_by = list(group_by or [])
+    if group_by:
+        group_codes, keys = pd.factorize(pd.MultiIndex.from_frame(table[group_by]), sort=True)
+        keys = keys.to_frame(index=False)
+        keys.columns = group_by
+    else:
+        group_codes, keys = np.zeros(len(table), dtype=np.int64), pd.DataFrame(index=[0])
+    category_codes, _ = pd.factorize(table[column])
+    counts = np.zeros((len(keys), category_codes.max() + 1 if len(table) else 0), dtype=np.int64)
+    np.add.at(counts, (group_codes, category_codes), table['Count'].to_numpy())
+    return counts, keys
+
+def diversity(counts):
+    """Richness, Shannon entropy (nats) and Nei's unbiased diversity over the last axis
+
+    counts is an integer array with any leading dimensions (groups,
+    bootstrap replicates). Shannon is log n - sum c log c / n, with c log c
+    looked up per distinct count; Nei's h = n / (n - 1) * (1 - sum p^2) is
+    NaN for n < 2. Returns a dict of arrays shaped like counts without its
+    last axis.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    n = counts.sum(axis=-1).astype(np.float64)
+    values = np.arange(counts.max(initial=0) + 1, dtype=np.float64)
+    c_log_c = values * np.log(np.maximum(values, 1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shannon = np.log(n) - c_log_c[counts].sum(axis=-1) / n
+        nei_h = n / (n - 1) * (1 - (counts.astype(np.float64) ** 2).sum(axis=-1) / n ** 2)
+    return {
+        'Richness': (counts > 0).sum(axis=-1),
+        'Shannon': np.where(n > 0, shannon, np.nan),
+        'Nei_h': np.where(n > 1, nei_h, np.nan),
+    }
+
+_lgamma = np.vectorize(math.lgamma, otypes=[np.float64])
+
+def _log_choose(n, k):
+    return _lgamma(n + 1) - _lgamma(k + 1) - _lgamma(n - k + 1)
+
+def rarefied_richness(counts, sizes):
+    """Expected richness in random subsamples of each size, without replacement (Hurlbert 1971)
+
+    E[S_m] = sum_i 1 - C(n - n_i, m) / C(n, m) for a group of n samples with
+    category counts n_i. counts is (groups x categories); returns a (groups
+    x sizes) array, NaN where a size exceeds the group's sample count.
+    Results are clamped to min(m, observed richness), which also absorbs
+    lgamma rounding (E[S_1] is exactly 1).
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    m = np.asarray(sizes, dtype=np.float64)[None, None, :]
+    n = counts.sum(axis=1)[:, None, None]
+    rest = n - counts[:, :, None]
+    # log C(n - n_i, m) - log C(n, m), clamped where the binomials vanish and masked below
+    log_absent = _log_choose(np.maximum(rest, m), m) - _log_choose(np.maximum(n, m), m)
+    absent = np.where(rest >= m, np.minimum(np.exp(log_absent), 1.0), 0.0)
+    expected = np.where(counts[:, :, None] > 0, 1 - absent, 0).sum(axis=1)
+    expected = np.minimum(expected, np.minimum(m[0], (counts > 0).sum(axis=1)[:, None]))
+    return np.where(m[0] <= n[:, 0], expected, np.nan)
+
+def bootstrap_diversity(counts, n_boot=1000, confidence=0.95, seed=None, batch_cells=BATCH_CELLS):
+    """Percentile intervals of each statistic from multinomial resamples of every group
+
+    Replicates are drawn as one (replicates x groups x categories)
+    multinomial array per batch, sized so a batch holds about batch_cells
+    counts, and reduced to statistics before the next batch. Richness
+    intervals are taken at observed replicate values (lower/higher
+    quantile methods), so they stay integers.
+    Returns {statistic: (low, high)} arrays over groups.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    n_groups, n_categories = counts.shape
+    totals = counts.sum(axis=1)
+    pvals = counts / np.maximum(totals, 1)[:, None]
+    # Empty groups draw nothing; any valid distribution will do
+    pvals[totals == 0] = 1 / max(n_categories, 1)
+    rng = np.random.default_rng(seed)
+
+    replicates = {statistic: np.empty((n_boot, n_groups)) for statistic in STATISTICS}
+    batch = max(1, batch_cells // max(n_groups * n_categories, 1))
+    for start in range(0, n_boot, batch):
+        size = min(batch, n_boot - start)
+        draws = rng.multinomial(totals, pvals, size=(size, n_groups))
+        for statistic, values in diversity(draws).items():
+            replicates[statistic][start:start + size] = values
+
+    alpha = (1 - confidence) / 2
+    intervals = {}
+    for statistic, values in replicates.items():
+        if statistic == 'Richness':
+            intervals[statistic] = (np.nanquantile(values, alpha, axis=0, method='lower'),
+                                    np.nanquantile(values, 1 - alpha, axis=0, method='higher'))
+        else:
+            intervals[statistic] = tuple(np.nanquantile(values, [alpha, 1 - alpha], axis=0))
+    return intervals
+
+def diversity_table(counts, keys=None, n_boot=0, confidence=0.95, seed=None, rarefy_to=None):
+    """Diversity statistics per group, with bootstrap intervals and a common-size rarefied richness
+
+    rarefy_to defaults to the smallest group's sample count, so
+    Rarefied_Richness compares groups of different sizes at equal effort.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    keys = pd.DataFrame(index=range(len(counts))) if keys is None else keys.reset_index(drop=True)
+    totals = counts.sum(axis=1)
+
+    table = keys.copy()
+    table['Samples'] = totals
+    intervals = bootstrap_diversity(counts, n_boot, confidence, seed) if n_boot else {}
+    for statistic, values in diversity(counts).items():
+        table[statistic] = values
+        if statistic in intervals:
+            table[f'{statistic}_CI_Low'], table[f'{statistic}_CI_High'] = intervals[statistic]
+
+    rarefy_to = int(rarefy_to or totals[totals > 0].min(initial=0))
+    if rarefy_to:
+        table['Rarefied_To'] = rarefy_to
+        table['Rarefied_Richness'] = rarefied_richness(counts, [rarefy_to])[:, 0]
+    return table
+
+def rarefaction_curves(counts, keys=None, n_points=20):
+    """Long table of expected richness against subsample size, up to each group's sample count"""
+    counts = np.asarray(counts, dtype=np.int64)
+    keys = pd.DataFrame(index=range(len(counts))) if keys is None else keys.reset_index(drop=True)
+    totals = counts.sum(axis=1)
+    sizes = np.unique(np.linspace(1, max(totals.max(initial=1), 1), n_points).round().astype(np.int64))
+    sizes = np.union1d(sizes, totals[totals > 0])
+    expected = rarefied_richness(counts, sizes)
+
+    group, size = np.nonzero(~np.isnan(expected))
+    curves = keys.iloc[group].reset_index(drop=True)
+    curves['Sample_Size'] = sizes[size]
+    curves['Expected_Richness'] = expected[group, size]
+    return curves
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('frequency_table', nargs='+',
+                        help="frequency CSVs with a Count column (e.g. yri_ycc_haplogroup_frequencies.csv)")
+    parser.add_argument('--column', default='YCC_Haplogroup', help="category column of the tables")
+    parser.add_argument('--bootstrap', type=int, default=1000, help="bootstrap replicates for the intervals")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the diversity table to this CSV")
+    args = parser.parse_args()
+
+    tables = pd.concat([pd.read_csv(path).assign(Table=path) for path in args.frequency_table], ignore_index=True)
+    counts, keys = count_matrix(tables, ['Table'], args.column)
+    table = diversity_table(counts, keys, args.bootstrap, seed=args.seed)
+    print(table.to_string(index=False))
+    if args.output:
+        table.to_csv(args.output, index=False)
+    return table
+
+if __name__ == "__main__":
+    table = main()
@@ -3,8 +3,14 @@
 Extract YRI male samples from 1000 Genomes panel file
 """
 
+import argparse
+import csv
+import os
+
 import pandas as pd
 
+PANEL_COLUMNS = ['sample', 'pop', 'super_pop', 'gender']
+
 def extract_yri_males(panel_file):
     """Extract YRI male sample IDs from panel file"""
     # Read the panel file
@@ -29,7 +35,112 @@ def extract_yri_males(panel_file):
     
     return yri_male_ids
 
-if __name__ == "__main__":
-    panel_file = "integrated_call_samples_v3.20130502.ALL.panel"
-    yri_males = extract_yri_males(panel_file)
+def sample_list_path(output_dir, population, sex):
+    """Path of the sample list written for one (population, sex) group"""
+    return os.path.join(output_dir, f"{population.lower()}_{sex}_samples.txt")
+
+def _selected(value, selection):
+    """True if value passes an optional selector (None selects everything)"""
+    return selection is None or value in selection
+
+def _extract_groups_pandas(panel_file, populations, super_populations, sexes, output_dir):
+    """Read the panel once with pandas and write one list per group"""
+    panel = pd.read_csv(panel_file, sep='\t', usecols=PANEL_COLUMNS, dtype=str)
+    
+    mask = panel['gender'].isin(sexes)
+    if populations is not None:
+        mask &= panel['pop'].isin(populations)
+    if super_populations is not None:
+        mask &= panel['super_pop'].isin(super_populations)
+    
+    group_counts = {}
+    for (population, sex), group in panel[mask].groupby(['pop', 'gender'], sort=True):
+        with open(sample_list_path(output_dir, population, sex), 'w') as f:
+            f.write(''.join(f"{sample_id}\n" for sample_id in group['sample']))
+        group_counts[(population, sex)] = len(group)
+    
+    return len(panel), group_counts
 
+def _extract_groups_streaming(panel_file, populations, super_populations, sexes, output_dir):
+    """Stream the panel row by row, appending each sample to its group's list"""
+    handles = {}
+    group_counts = {}
+    total = 0
+    
+    try:
+        with open(panel_file, newline='') as panel:
+            reader = csv.reader(panel, delimiter='\t')
+            header = next(reader)
+            sample_col, pop_col, super_col, sex_col = (header.index(c) for c in PANEL_COLUMNS)
+            
+            for row in reader:
+                if not row:
+                    continue
+                total += 1
+                population, sex = row[pop_col], row[sex_col]
+                if (sex not in sexes or not _selected(population, populations)
+                        or not _selected(row[super_col], super_populations)):
+                    continue
+                
+                key = (population, sex)
+                if key not in handles:
+                    handles[key] = open(sample_list_path(output_dir, population, sex), 'w')
+                    group_counts[key] = 0
+                handles[key].write(f"{row[sample_col]}\n")
+                group_counts[key] += 1
+    finally:
+        for handle in handles.values():
+            handle.close()
+    
+    return total, dict(sorted(group_counts.items()))
+
+def extract_population_samples(panel_file, populations=None, super_populations=None,
+                               sexes=('male',), output_dir='.', streaming=False):
+    """Extract sample IDs for every selected (population, sex) group in a single panel pass
+    
+    One list is written per group as <pop>_<sex>_samples.txt in output_dir.
+    Populations and super-populations default to everything in the panel.
+    The streaming path never holds more than one panel row in memory, for
+    panels too large to load as a DataFrame.
+    Returns a dict mapping (population, sex) to the number of samples written.
+    """
+    populations = set(populations) if populations is not None else None
+    super_populations = set(super_populations) if super_populations is not None else None
+    sexes = set(sexes)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    extract = _extract_groups_streaming if streaming else _extract_groups_pandas
+    total, group_counts = extract(panel_file, populations, super_populations, sexes, output_dir)
+    
+    print(f"Total samples in panel: {total}")
+    print(f"Sample lists written to {output_dir}: {len(group_counts)}")
+    for (population, sex), count in group_counts.items():
+        print(f"  {population} {sex}: {count}")
+    
+    return group_counts
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('panel_file', nargs='?',
+                        default="integrated_call_samples_v3.20130502.ALL.panel")
+    parser.add_argument('--all-populations', action='store_true',
+                        help="write a sample list for every (population, sex) group")
+    parser.add_argument('--populations', nargs='+', help="population codes to include (e.g. YRI ESN)")
+    parser.add_argument('--super-populations', nargs='+', help="super-population codes to include (e.g. AFR)")
+    parser.add_argument('--sexes', nargs='+', default=['male'], help="sexes to include (default: male)")
+    parser.add_argument('--output-dir', default='.', help="directory for the sample lists")
+    parser.add_argument('--streaming', action='store_true',
+                        help="stream the panel row by row instead of loading it with pandas")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.all_populations or args.populations or args.super_populations:
+        return extract_population_samples(args.panel_file, populations=args.populations,
+                                          super_populations=args.super_populations,
+                                          sexes=args.sexes, output_dir=args.output_dir,
+                                          streaming=args.streaming)
+    return extract_yri_males(args.panel_file)
+
+if __name__ == "__main__":
+    result = main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Single-pass multi-level haplogroup frequency tables with optional bootstrap intervals
+"""
+
+import numpy as np
+import pandas as pd
+
+# Levels reported by analyze_yri_haplogroups.py: level name -> (column, restrict to E samples)
+STANDARD_LEVELS = {
+    'major': ('Major_Haplogroup', False),
+    'ycc': ('YCC_Haplogroup', False),
+    'terminal_snp': ('Terminal_SNP', False),
+    'e1': ('E_Level1', True),
+    'e2': ('E_Level2', True),
+    'e3': ('E_Level3', True),
+}
+
+# Cells (replicates x groups x categories) drawn per bootstrap batch
+BATCH_CELLS = 1 << 24
+
+def _group_codes(df, group_by):
+    """Integer group code per row and a DataFrame of the sorted group keys"""
+    if not group_by:
+        return np.zeros(len(df), dtype=np.int64), pd.DataFrame(index=[0])
+    codes, keys = pd.factorize(pd.MultiIndex.from_frame(df[group_by]), sort=True)
+    keys = keys.to_frame(index=False)
+    keys.columns = group_by
+    return codes.astype(np.int64), keys
+
+def _bootstrap_intervals(counts, totals, n_boot, confidence, rng, batch_cells=BATCH_CELLS):
+    """Percentile intervals of each category frequency from batched multinomial draws
+
+    counts is a (groups x categories) matrix and totals the per-group sample
+    sizes; any remainder (samples without a label at this level) is resampled
+    as an extra category so frequencies keep the same denominator. Groups
+    are drawn in batches of about batch_cells (replicates x groups x
+    categories) counts, each reduced to its quantiles before the next.
+    """
+    remainder = totals - counts.sum(axis=1)
+    observed = np.column_stack([counts, remainder])
+    safe_totals = np.maximum(totals, 1)
+    pvals = observed / safe_totals[:, None]
+    pvals[totals == 0, -1] = 1.0
+
+    n_groups, n_cells = observed.shape
+    alpha = (1 - confidence) / 2
+    low = np.empty(counts.shape)
+    high = np.empty(counts.shape)
+    batch = max(1, batch_cells // max(n_boot * n_cells, 1))
+    for start in range(0, n_groups, batch):
+        groups = slice(start, min(start + batch, n_groups))
+        # Group-major draws consume the stream in the same order whatever the batch size
+        draws = rng.multinomial(totals[groups, None], pvals[groups, None, :],
+                                size=(len(totals[groups]), n_boot))[..., :-1]
+        frequencies = draws / safe_totals[groups, None, None]
+        low[groups], high[groups] = np.quantile(frequencies, [alpha, 1 - alpha], axis=1)
+    return low, high
+
+def frequency_tables(df, levels, group_by=None, within=None, n_boot=0, confidence=0.95, seed=None):
+    """Count, frequency and percentage tables for several tree levels and groups at once
+
+    levels maps a level name to a column of df. group_by is an optional list
+    of grouping columns (population, super-population, sex, ...). within maps
+    a level name to a boolean column or array restricting both its counts and
+    its denominator (e.g. E subclade levels counted within haplogroup E).
+
+    Each level is counted with a single bincount over (group, category)
+    codes. Rows within a group are ordered like Series.value_counts(): by
+    descending count, ties in order of first appearance. With n_boot > 0,
+    Frequency_CI_Low/High columns give percentile bootstrap intervals from
+    n_boot multinomial resamples of every group, drawn in batches of groups
+    that bound the replicate array to about BATCH_CELLS counts.
+
+    Returns a dict mapping each level name to a DataFrame with the group
+    columns followed by Haplogroup, Count, Frequency and Percentage.
+    """
+    group_by = list(group_by or [])
+    within = within or {}
+    group_codes, group_keys = _group_codes(df, group_by)
+    n_groups = len(group_keys)
+    rng = np.random.default_rng(seed)
+
+    tables = {}
+    for level, column in levels.items():
+        in_scope = np.ones(len(df), dtype=bool)
+        if level in within:
+            restriction = within[level]
+            in_scope = np.asarray(df[restriction] if isinstance(restriction, str) else restriction, dtype=bool)
+        totals = np.bincount(group_codes[in_scope], minlength=n_groups)
+
+        rows = np.flatnonzero(in_scope & df[column].notna().to_numpy())
+        codes, categories = pd.factorize(df[column].to_numpy()[rows])
+        n_categories = len(categories)
+        combined = group_codes[rows] * n_categories + codes
+
+        cells, first_row = np.unique(combined, return_index=True)
+        counts = np.bincount(combined, minlength=n_groups * n_categories)[cells]
+        cell_group = cells // max(n_categories, 1)
+        order = np.lexsort((first_row, -counts, cell_group))
+        cells, counts, cell_group = cells[order], counts[order], cell_group[order]
+
+        table = group_keys.iloc[cell_group].reset_index(drop=True)
+        denominators = totals[cell_group]
+        table['Haplogroup'] = categories[cells % max(n_categories, 1)]
+        table['Count'] = counts
+        table['Frequency'] = counts / denominators
+        table['Percentage'] = (counts / denominators) * 100
+
+        if n_boot:
+            count_matrix = np.zeros((n_groups, n_categories), dtype=np.int64)
+            count_matrix[cell_group, cells % n_categories] = counts
+            low, high = _bootstrap_intervals(count_matrix, totals, n_boot, confidence, rng)
+            table['Frequency_CI_Low'] = low[cell_group, cells % n_categories]
+            table['Frequency_CI_High'] = high[cell_group, cells % n_categories]
+
+        tables[level] = table
+
+    return tables
+
+def standard_frequency_tables(df, group_by=None, n_boot=0, confidence=0.95, seed=None):
+    """Frequency tables at every level analyze_yri_haplogroups.py reports
+
+    df must already carry the add_analysis_columns() columns.
+    E subclade levels are counted within haplogroup E samples.
+    """
+    is_e = (df['Major_Haplogroup'] == 'E').to_numpy()
+    levels = {level: column for level, (column, _) in STANDARD_LEVELS.items()}
+    within = {level: is_e for level, (_, e_only) in STANDARD_LEVELS.items() if e_only}
+    return frequency_tables(df, levels, group_by=group_by, within=within,
+                            n_boot=n_boot, confidence=confidence, seed=seed)
+
+def combine_levels(tables):
+    """Stack per-level tables into one long table with a Level column"""
+    return pd.concat([table.assign(Level=level) for level, table in tables.items()],
+                     ignore_index=True)
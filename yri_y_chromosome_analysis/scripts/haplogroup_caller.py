@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Call Y-chromosome haplogroups in-process from a genotype matrix, in yhaplo's output format
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import vcf_genotypes
+from y_tree import isogg_file, load_isogg_snps, load_tree, node_lookup, ancestor_matrix, tree_file
+
+OUTPUT_COLUMNS = ['Sample_ID', 'Terminal_SNP', 'Representative_SNP', 'YCC_Haplogroup']
+
+def load_reference(haplogroup_dir, snp_table='cleaned'):
+    """Load the tree and ISOGG SNP table once for calling any number of samples
+
+    Uses the YCC and representative-SNP trees and the ISOGG table that yhaplo
+    writes with --all_aux_output. Alternative names for the same SNP
+    (identical haplogroup, position and mutation) are collapsed to the first
+    name so each site is counted once.
+    """
+    ycc_tree = load_tree(tree_file(haplogroup_dir, 'ycc'))
+    hg_snp_tree = load_tree(tree_file(haplogroup_dir, 'hg_snp'))
+    if not np.array_equal(ycc_tree['parent'], hg_snp_tree['parent']):
+        raise ValueError(f"YCC and hg_snp trees in {haplogroup_dir} have different topologies")
+
+    snps = load_isogg_snps(isogg_file(haplogroup_dir, snp_table))
+    snps = snps.drop_duplicates(['Haplogroup', 'Position', 'Mutation']).reset_index(drop=True)
+    snps['Node'] = snps['Haplogroup'].map(node_lookup(ycc_tree['names']))
+    snps = snps.dropna(subset=['Node']).astype({'Node': np.int64})
+    snps = snps.sort_values('Position', kind='stable').reset_index(drop=True)
+
+    return {
+        'names': ycc_tree['names'],
+        'representative': hg_snp_tree['names'],
+        'parent': ycc_tree['parent'],
+        'depth': ycc_tree['depth'],
+        'snps': snps,
+    }
+
+def _allele_codes(alleles, ref, alt):
+    """Index of each allele among REF + ALT alleles of its site (-2 if absent)"""
+    codes = np.full(len(alleles), -2, dtype=np.int16)
+    for i, (allele, ref_allele, alt_alleles) in enumerate(zip(alleles, ref, alt)):
+        site_alleles = [ref_allele] + alt_alleles.split(',')
+        if allele in site_alleles:
+            codes[i] = site_alleles.index(allele)
+    return codes
+
+def match_sites(genotype_data, reference):
+    """Join genotyped sites to ISOGG SNPs by position and encode their alleles"""
+    sites = pd.DataFrame({'Position': genotype_data['positions'],
+                          'Site': np.arange(len(genotype_data['positions']))})
+    matched = reference['snps'].merge(sites, on='Position', how='inner')
+
+    ref = genotype_data['ref'][matched['Site']]
+    alt = genotype_data['alt'][matched['Site']]
+    matched['Ancestral_Code'] = _allele_codes(matched['Ancestral'], ref, alt)
+    matched['Derived_Code'] = _allele_codes(matched['Derived'], ref, alt)
+
+    informative = (matched['Ancestral_Code'] >= 0) | (matched['Derived_Code'] >= 0)
+    return matched[informative].reset_index(drop=True)
+
+def _terminal_label(representative, snp_name):
+    """Build a yhaplo-style hg_snp label ('E-P252') from a representative label and SNP name"""
+    return f"{representative.split('-', 1)[0]}-{snp_name}"
+
+def call_haplogroups(genotype_data, reference, batch_size=4096):
+    """Call haplogroups for every sample in a genotype matrix at once
+
+    genotype_data is a subset dict from vcf_genotypes.read_genotypes().
+    Derived and ancestral calls (samples x SNPs) are multiplied by the
+    SNP-to-node incidence matrix to get per-node counts, and the per-node
+    net support (derived - ancestral) by the ancestor matrix to score every
+    root-to-node path. Each sample is assigned the best-scoring node that
+    carries at least one derived SNP, preferring the deeper node on ties.
+    Samples are processed in batches of batch_size to bound memory.
+
+    Returns a DataFrame with the same columns as load_haplogroup_data().
+    """
+    matched = match_sites(genotype_data, reference)
+    genotypes = genotype_data['genotypes'][matched['Site'].to_numpy()]
+    samples = list(genotype_data['samples'])
+
+    nodes, snp_column = np.unique(matched['Node'].to_numpy(), return_inverse=True)
+    incidence = np.zeros((len(matched), len(nodes)), dtype=np.float32)
+    incidence[np.arange(len(matched)), snp_column] = 1
+    path = ancestor_matrix(reference['parent'], nodes).astype(np.float32)
+
+    depth = reference['depth'][nodes]
+    tie_break = depth / (depth.max() + 1)
+    derived_code = matched['Derived_Code'].to_numpy()[:, None]
+    ancestral_code = matched['Ancestral_Code'].to_numpy()[:, None]
+
+    # SNP names ranked for reporting the terminal SNP: the node's representative SNP first
+    representative = np.array(reference['representative'], dtype=object)
+    representative_snp = [label.split('-', 1)[-1].rstrip('*') for label in representative[nodes]]
+    snp_rank = np.arange(1, len(matched) + 1)
+    snp_rank[matched['SNP'].to_numpy() == np.array(representative_snp, dtype=object)[snp_column]] = 0
+    snp_names = matched['SNP'].to_numpy()
+
+    rows = []
+    for start in range(0, len(samples), batch_size):
+        batch = genotypes[:, start:start + batch_size]
+        derived = (batch == derived_code).T
+        ancestral = (batch == ancestral_code).T
+
+        derived_counts = derived.astype(np.float32) @ incidence
+        ancestral_counts = ancestral.astype(np.float32) @ incidence
+        scores = (derived_counts - ancestral_counts) @ path + tie_break
+        scores[derived_counts == 0] = -np.inf
+        best = scores.argmax(axis=1)
+        called = np.isfinite(scores[np.arange(len(best)), best])
+
+        # Terminal SNP: lowest-ranked derived SNP on the called node
+        on_node = derived & (snp_column[None, :] == best[:, None])
+        terminal = np.where(on_node, snp_rank[None, :], len(snp_rank) + 1).argmin(axis=1)
+
+        for i, sample_id in enumerate(samples[start:start + batch_size]):
+            if not called[i]:
+                rows.append((sample_id, '.', '.', reference['names'][0]))
+                continue
+            node = nodes[best[i]]
+            rows.append((sample_id,
+                         _terminal_label(representative[node], snp_names[terminal[i]]),
+                         representative[node],
+                         reference['names'][node]))
+
+    return pd.DataFrame(rows, columns=OUTPUT_COLUMNS)
+
+def write_haplogroups(haplogroups, output_file):
+    """Write calls in yhaplo's haplogroups.<name>.txt fixed-width layout"""
+    with open(output_file, 'w') as f:
+        for row in haplogroups.itertuples(index=False):
+            f.write(f"{row.Sample_ID:8s} {row.Terminal_SNP:15s} {row.Representative_SNP:15s} "
+                    f"{row.YCC_Haplogroup:25s}\n")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('genotypes', help="<name>.genotypes.npz from vcf_genotypes.py, or a VCF")
+    parser.add_argument('--reference-dir', default='yri_haplogroups',
+                        help="yhaplo --all_aux_output directory holding the tree and ISOGG tables")
+    parser.add_argument('--index-cache',
+                        help="load the tree and SNPs from a compiled ISOGG index in this cache directory")
+    parser.add_argument('--samples', help="sample list to call when reading a VCF (default: all)")
+    parser.add_argument('--output', help="output file (default: haplogroups.<name>.txt)")
+    args = parser.parse_args()
+
+    if args.genotypes.endswith('.npz'):
+        genotype_data = vcf_genotypes.load_genotypes(args.genotypes)
+        name = os.path.basename(args.genotypes)[:-len('.genotypes.npz')]
+    else:
+        samples = (vcf_genotypes.read_sample_list(args.samples) if args.samples
+                   else vcf_genotypes.read_vcf_samples(args.genotypes))
+        name = os.path.basename(args.genotypes).split('.')[0]
+        genotype_data = vcf_genotypes.read_genotypes(args.genotypes, {name: samples})[name]
+
+    if args.index_cache:
+        import isogg_index
+        index = isogg_index.load_isogg_index(args.reference_dir, args.index_cache)
+        reference = isogg_index.reference_from_index(index)
+    else:
+        reference = load_reference(args.reference_dir)
+    haplogroups = call_haplogroups(genotype_data, reference)
+
+    output_file = args.output or f"haplogroups.{name}.txt"
+    write_haplogroups(haplogroups, output_file)
+    print(f"Called {len(haplogroups)} samples")
+    print(f"Unique YCC haplogroups: {haplogroups['YCC_Haplogroup'].nunique()}")
+    print(f"Haplogroups written to {output_file}")
+
+    return haplogroups
+
+if __name__ == "__main__":
+    haplogroups = main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Append new samples to persisted haplogroup count state and re-emit the analysis tables
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import analyze_yri_haplogroups
+from frequency_engine import STANDARD_LEVELS
+from snp_detail_store import iter_anc_der_counts
+
+STATE_FILE = '{prefix}_count_state.json'
+ANC_DER_FILE = '{prefix}_node_anc_der_counts.csv'
+# One sorted .npy of sample IDs per appended batch
+SEEN_DIR = '{prefix}_seen_samples'
+# Shards are merged into one once an append would leave more than this many
+MAX_SEEN_SHARDS = 16
+
+# Tables re-emitted from the counts: level -> (label column, counted within haplogroup E)
+TABLE_COLUMNS = {
+    'major': ('Haplogroup', False),
+    'ycc': ('YCC_Haplogroup', False),
+    'terminal_snp': ('Terminal_SNP', False),
+    'e1': ('E_Subclade_L1', True),
+    'e2': ('E_Subclade_L2', True),
+}
+
+def state_path(output_dir='.', prefix='yri'):
+    """Path of the persisted count state for one population prefix"""
+    return os.path.join(output_dir, STATE_FILE.format(prefix=prefix))
+
+def seen_path(output_dir='.', prefix='yri', batch=0):
+    """Path of the sorted sample-ID shard written by one appended batch"""
+    return os.path.join(output_dir, SEEN_DIR.format(prefix=prefix), f"batch_{batch:06d}.npy")
+
+def new_state(population='YRI'):
+    """Empty count state
+
+    'levels' maps each STANDARD_LEVELS level to {label: count}, kept in
+    order of first appearance so re-emitted tables break ties like
+    value_counts() over the whole cohort. 'anc_der' maps a tree node to
+    [ancestral calls, derived calls, samples with a derived call]. The
+    sample IDs themselves live in per-batch shards (see seen_path), of
+    which the first 'batches' are committed; the state only counts them.
+    'analyzed_bytes' is the committed size of the analyzed-samples CSV;
+    rows past it belong to an append that never committed.
+    """
+    return {
+        'population': population,
+        'n_samples': 0,
+        'batches': 0,
+        'analyzed_bytes': 0,
+        'levels': {level: {} for level in STANDARD_LEVELS},
+        'anc_der': {},
+    }
+
+def save_seen(sample_ids, output_dir='.', prefix='yri', batch=0):
+    """Write one batch's sample IDs as a sorted shard"""
+    path = seen_path(output_dir, prefix, batch)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, np.sort(np.asarray(sample_ids, dtype=str)))
+    os.replace(path + '.tmp', path)
+
+def load_seen(state, output_dir='.', prefix='yri'):
+    """Memory-mapped sorted sample-ID shards of the committed batches"""
+    return [np.load(seen_path(output_dir, prefix, batch), mmap_mode='r') for batch in range(state['batches'])]
+
+def merge_seen(state, output_dir='.', prefix='yri'):
+    """Merge the committed shards into shard 0 and commit the state with a single batch
+
+    The merged shard is a superset of the old shard 0, so a crash before the
+    state save leaves a valid (if redundant) set of shards.
+    """
+    stale = state['batches']
+    merged = np.concatenate(load_seen(state, output_dir, prefix))
+    save_seen(merged, output_dir, prefix, 0)
+    state['batches'] = 1
+    save_state(state, output_dir, prefix)
+    for batch in range(1, stale):
+        os.remove(seen_path(output_dir, prefix, batch))
+
+def is_seen(sample_ids, seen):
+    """Boolean mask of sample_ids already in any shard, by binary search
+
+    Each lookup touches O(log batch size) entries of a memory-mapped shard,
+    so the cost grows with the new samples and the number of batches, not
+    with the cohort.
+    """
+    sample_ids = np.asarray(sample_ids, dtype=str)
+    found = np.zeros(len(sample_ids), dtype=bool)
+    for shard in seen:
+        if len(shard) == 0:
+            continue
+        position = np.minimum(np.searchsorted(shard, sample_ids), len(shard) - 1)
+        found |= shard[position] == sample_ids
+    return found
+
+def load_state(output_dir='.', prefix='yri', population='YRI'):
+    """Persisted count state, or an empty one if none was saved yet
+
+    A state saved with an inline 'samples' list is converted to a single
+    shard on load; one saved without 'analyzed_bytes' takes the current
+    size of the analyzed-samples CSV as committed.
+    """
+    path = state_path(output_dir, prefix)
+    if not os.path.exists(path):
+        return new_state(population)
+    with open(path) as f:
+        state = json.load(f)
+    if 'samples' in state:
+        samples = state.pop('samples')
+        save_seen(samples, output_dir, prefix, 0)
+        state.update(n_samples=len(samples), batches=1)
+    if 'analyzed_bytes' not in state:
+        analyzed = analyze_yri_haplogroups.result_paths(output_dir, prefix)['analyzed']
+        state['analyzed_bytes'] = os.path.getsize(analyzed) if os.path.exists(analyzed) else 0
+    return state
+
+def save_state(state, output_dir='.', prefix='yri'):
+    path = state_path(output_dir, prefix)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+
+def append_samples(state, new_rows, anc_der_rows=(), seen=()):
+    """Fold new samples into the count state, touching only the new rows
+
+    new_rows is a DataFrame in the load_haplogroup_data() schema;
+    anc_der_rows yields (sample, node, ancestral, derived) as read from
+    counts.anc_der.*. Samples in the seen shards (load_seen) are ignored,
+    so re-appending a batch is a no-op. The caller persists the accepted
+    IDs as the next shard. Returns the accepted rows with the
+    add_analysis_columns() columns added.
+    """
+    fresh = ~is_seen(new_rows['Sample_ID'].to_numpy(), seen)
+    df = new_rows[fresh].drop_duplicates('Sample_ID').reset_index(drop=True)
+    analyze_yri_haplogroups.add_analysis_columns(df)
+
+    for level, (column, _) in STANDARD_LEVELS.items():
+        counts = state['levels'][level]
+        new_counts = df[column].value_counts()
+        for label in df[column].dropna().unique():
+            counts[label] = counts.get(label, 0) + int(new_counts[label])
+
+    accepted = set(df['Sample_ID'])
+    for sample, node, ancestral, derived in anc_der_rows:
+        if sample in accepted:
+            tally = state['anc_der'].setdefault(node, [0, 0, 0])
+            tally[0] += ancestral
+            tally[1] += derived
+            tally[2] += int(derived > 0)
+
+    state['n_samples'] += len(df)
+    return df
+
+def count_table(counts, total, column='Haplogroup', within_e=False):
+    """Frequency table from a {label: count} dict, ordered like value_counts()"""
+    labels = list(counts)
+    values = np.array([counts[label] for label in labels], dtype=np.int64)
+    order = np.argsort(-values, kind='stable')
+    suffix = '_in_E' if within_e else ''
+    table = pd.DataFrame({column: pd.Series([labels[i] for i in order], dtype=object)})
+    table['Count'] = values[order]
+    table['Frequency' + suffix] = values[order] / total
+    table['Percentage' + suffix] = (values[order] / total) * 100
+    return table
+
+def level_tables(levels, total):
+    """The analyze_yri_haplogroups.py frequency tables from per-level {label: count} dicts"""
+    e_total = levels['major'].get('E', 0)
+    return {level: count_table(levels[level], e_total if within_e else total, column, within_e)
+            for level, (column, within_e) in TABLE_COLUMNS.items()}
+
+def write_tables(levels, total, output_dir='.', prefix='yri', population='YRI'):
+    """Write the frequency tables and summary from per-level counts; returns the paths"""
+    paths = analyze_yri_haplogroups.result_paths(output_dir, prefix)
+    tables = level_tables(levels, total)
+    for level in TABLE_COLUMNS:
+        tables[level].to_csv(paths[level], index=False)
+
+    summary = analyze_yri_haplogroups.format_summary(
+        total, levels['major'].get('E', 0), tables['major'], tables['ycc'],
+        tables['terminal_snp'], tables['e1'], population)
+    with open(paths['summary'], 'w') as f:
+        f.write(summary)
+
+    return paths
+
+def anc_der_table(state):
+    """Per-node ancestral/derived call tallies across all appended samples"""
+    nodes = list(state['anc_der'])
+    tallies = np.array([state['anc_der'][node] for node in nodes], dtype=np.int64).reshape(-1, 3)
+    return pd.DataFrame({'Node': nodes, 'Ancestral': tallies[:, 0], 'Derived': tallies[:, 1],
+                         'Samples_Derived': tallies[:, 2]})
+
+def write_results(state, output_dir='.', prefix='yri'):
+    """Rewrite the frequency tables, node tallies and summary from the count state
+
+    The analyzed-samples CSV is not touched here; update_results() appends
+    to it. Returns the paths written.
+    """
+    paths = write_tables(state['levels'], state['n_samples'], output_dir, prefix, state['population'])
+    paths['anc_der'] = os.path.join(output_dir, ANC_DER_FILE.format(prefix=prefix))
+    anc_der_table(state).to_csv(paths['anc_der'], index=False)
+    return paths
+
+def append_analyzed(df, path, committed_bytes=0):
+    """Append rows to the analyzed-samples CSV, first cutting it back to its committed size
+
+    Rows left by an append that crashed before its state was saved are
+    dropped, so rerunning that batch does not duplicate them. An empty
+    (uncommitted) file gets the header. Returns the new file size.
+    """
+    if committed_bytes:
+        with open(path, 'r+b') as f:
+            f.truncate(committed_bytes)
+    df.to_csv(path, mode='a' if committed_bytes else 'w', header=not committed_bytes, index=False)
+    return os.path.getsize(path)
+
+def update_results(haplogroup_file, output_dir='.', prefix='yri', population='YRI', anc_der_file=None):
+    """Append the samples in a haplogroups.*.txt file to a population's results
+
+    The first call (no saved state) builds the results from scratch; later
+    calls read only the new file, append its rows to the analyzed-samples
+    CSV and rewrite the small frequency tables from the updated counts.
+    The CSV rows and the batch's ID shard are written first and committed
+    by the state save that follows, so a run that crashes part-way can be
+    repeated. Once there are more than MAX_SEEN_SHARDS shards they are
+    merged into one. Returns (accepted rows, paths written).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    state = load_state(output_dir, prefix, population)
+
+    new_rows = analyze_yri_haplogroups.load_haplogroup_data(haplogroup_file)
+    anc_der_rows = iter_anc_der_counts(anc_der_file) if anc_der_file else ()
+    df = append_samples(state, new_rows, anc_der_rows, load_seen(state, output_dir, prefix))
+
+    analyzed = analyze_yri_haplogroups.result_paths(output_dir, prefix)['analyzed']
+    state['analyzed_bytes'] = append_analyzed(df, analyzed, state['analyzed_bytes'])
+    if len(df):
+        save_seen(df['Sample_ID'], output_dir, prefix, state['batches'])
+        state['batches'] += 1
+    save_state(state, output_dir, prefix)
+    if state['batches'] > MAX_SEEN_SHARDS:
+        merge_seen(state, output_dir, prefix)
+
+    paths = write_results(state, output_dir, prefix)
+    return df, paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('haplogroup_file', help="haplogroups.*.txt holding the new samples")
+    parser.add_argument('--anc-der', help="counts.anc_der.*.txt for the new samples")
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--prefix', default='yri')
+    parser.add_argument('--population', default='YRI')
+    args = parser.parse_args()
+
+    df, paths = update_results(args.haplogroup_file, args.output_dir, args.prefix, args.population,
+                               args.anc_der)
+    print(f"Appended {len(df)} new samples")
+    for path in paths.values():
+        print(f"- {os.path.relpath(path)}")
+
+    return df, paths
+
+if __name__ == "__main__":
+    df, paths = main()
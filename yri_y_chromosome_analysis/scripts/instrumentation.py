@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Optional per-stage instrumentation: JSON timings, row counts, peak memory and I/O bytes
+"""
+
+import argparse
+import contextlib
+import cProfile
+import functools
+import importlib
+import inspect
+import json
+import os
+import resource
+import sys
+import time
+
+# Scripts whose public functions are the pipeline's stages
+INSTRUMENTED_SCRIPTS = ('extract_yri_males', 'analyze_yri_haplogroups', 'visualize_yri_haplogroups')
+
+# Path and argument helpers, too small to be stages of their own
+NOT_STAGES = {'result_paths', 'sample_list_path', 'parse_args'}
+
+# Where stage records go (None: wrappers pass straight through)
+_config = {'output': None}
+# Running peak RSS of each open stage, innermost last
+_stack = []
+
+def reset_peak_rss():
+    """Reset the kernel's resident-set high-water mark for this process (Linux only)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def current_peak_rss_mb():
+    """Resident-set high-water mark since the last reset, in MiB
+
+    Falls back to the lifetime peak from getrusage() where /proc is not
+    available, in which case a stage's peak includes earlier stages.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def io_bytes():
+    """Bytes this process has read and written so far (files, pipes and sockets), or (None, None)"""
+    try:
+        with open('/proc/self/io') as f:
+            fields = dict(line.split(':') for line in f)
+        return int(fields['rchar']), int(fields['wchar'])
+    except OSError:
+        return None, None
+
+def _rows(value):
+    """Row count of a DataFrame/array, or of the first one in a tuple"""
+    if isinstance(value, tuple):
+        value = next((item for item in value if hasattr(item, 'shape')), None)
+    shape = getattr(value, 'shape', None)
+    return int(shape[0]) if shape else None
+
+def _write_record(record):
+    # One short append per record, so forked plot workers can share the file
+    with open(_config['output'], 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+def _enter_stage():
+    if _stack:
+        _stack[-1] = max(_stack[-1], current_peak_rss_mb())
+    reset_peak_rss()
+    _stack.append(0.0)
+
+def _exit_stage():
+    """Peak RSS of the stage being closed, carried into the enclosing stage"""
+    peak = max(_stack.pop(), current_peak_rss_mb())
+    if _stack:
+        _stack[-1] = max(_stack[-1], peak)
+    return peak
+
+def instrumented(function, stage=None):
+    """Wrap a function so each call emits one stage record while instrumentation is enabled
+
+    Nested stages (main -> load -> ...) each get their own record; an
+    outer stage's peak memory includes its inner stages.
+    """
+    stage = stage or f"{function.__module__}.{function.__name__}"
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if _config['output'] is None:
+            return function(*args, **kwargs)
+
+        depth = len(_stack)
+        _enter_stage()
+        read_before, written_before = io_bytes()
+        start = time.perf_counter()
+        error = None
+        try:
+            result = function(*args, **kwargs)
+            return result
+        except BaseException as exc:
+            error = repr(exc)
+            result = None
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            read_after, written_after = io_bytes()
+            peak = _exit_stage()
+            record = {
+                'stage': stage,
+                'pid': os.getpid(),
+                'depth': depth,
+                'seconds': round(seconds, 6),
+                'rows_in': next((_rows(arg) for arg in args if _rows(arg) is not None), None),
+                'rows_out': _rows(result),
+                'peak_rss_mb': round(peak, 1),
+                'io_read_bytes': None if read_before is None else read_after - read_before,
+                'io_write_bytes': None if written_before is None else written_after - written_before,
+            }
+            if error:
+                record['error'] = error
+            _write_record(record)
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+def instrument_module(module):
+    """Replace every public function defined in a module (except NOT_STAGES) with its instrumented wrapper
+
+    Calls between the module's own functions go through module globals, so
+    they are recorded too. Module-level dicts of tuples that hold the
+    originals (such as visualize_yri_haplogroups.FIGURES) are rebound to
+    the wrappers. Returns the names wrapped.
+    """
+    wrapped = {}
+    for name, value in list(vars(module).items()):
+        if (inspect.isfunction(value) and not name.startswith('_') and name not in NOT_STAGES
+                and value.__module__ == module.__name__ and not getattr(value, '__instrumented__', False)):
+            wrapped[value] = instrumented(value)
+            setattr(module, name, wrapped[value])
+
+    for value in vars(module).values():
+        if isinstance(value, dict):
+            for key, entry in value.items():
+                if isinstance(entry, tuple) and any(item in wrapped for item in entry if callable(item)):
+                    value[key] = tuple(wrapped.get(item, item) if callable(item) else item for item in entry)
+
+    return sorted(function.__name__ for function in wrapped)
+
+def enable(output_file):
+    """Start writing stage records (JSON lines) to output_file, replacing any earlier records"""
+    open(output_file, 'w').close()
+    _config['output'] = os.path.abspath(output_file)
+
+def disable():
+    _config['output'] = None
+
+@contextlib.contextmanager
+def profiled(profile_file):
+    """cProfile everything inside the block and dump pstats data to profile_file
+
+    The dump loads in pstats, snakeviz, or flameprof/gprof2dot for a
+    flamegraph or call graph.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(profile_file)
+
+def summarize(records_file):
+    """Total seconds, peak RSS and I/O per stage from a records file, slowest first"""
+    totals = {}
+    with open(records_file) as f:
+        for line in f:
+            record = json.loads(line)
+            total = totals.setdefault(record['stage'], {'calls': 0, 'seconds': 0.0, 'peak_rss_mb': 0.0,
+                                                         'io_read_bytes': 0, 'io_write_bytes': 0})
+            total['calls'] += 1
+            total['seconds'] += record['seconds']
+            total['peak_rss_mb'] = max(total['peak_rss_mb'], record['peak_rss_mb'])
+            total['io_read_bytes'] += record['io_read_bytes'] or 0
+            total['io_write_bytes'] += record['io_write_bytes'] or 0
+    return dict(sorted(totals.items(), key=lambda item: -item[1]['seconds']))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip(),
+        usage="%(prog)s [--json FILE] [--cprofile FILE] script [script arguments ...]")
+    parser.add_argument('--json', default='stage_timings.jsonl', help="stage records, one JSON object per line")
+    parser.add_argument('--cprofile', help="also dump a cProfile of the whole run to this file")
+    parser.add_argument('script', help=f"one of {', '.join(INSTRUMENTED_SCRIPTS)} (with or without .py)")
+    parser.add_argument('script_args', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    script_path = os.path.abspath(args.script if args.script.endswith('.py') else args.script + '.py')
+    if not os.path.exists(script_path):
+        script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.path.basename(script_path))
+    sys.path.insert(0, os.path.dirname(script_path))
+    module = importlib.import_module(os.path.basename(script_path)[:-len('.py')])
+    instrument_module(module)
+
+    enable(args.json)
+    sys.argv = [script_path] + args.script_args
+    with profiled(args.cprofile) if args.cprofile else contextlib.nullcontext():
+        result = module.main()
+    disable()
+
+    print(f"\nStage records: {args.json}", file=sys.stderr)
+    for stage, total in list(summarize(args.json).items())[:10]:
+        print(f"  {total['seconds']:9.3f}s  {total['peak_rss_mb']:8.1f} MiB  {total['calls']:4d}x  {stage}",
+              file=sys.stderr)
+    if args.cprofile:
+        print(f"cProfile dump: {args.cprofile}", file=sys.stderr)
+
+    return result
+
+if __name__ == "__main__":
+    result = main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Compile the yhaplo tree and ISOGG SNP tables into a memory-mappable binary index
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from haplogroup_caller import load_reference
+from y_tree import isogg_file, node_lookup, tree_file
+
+INDEX_FORMAT = 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'yri_y_chromosome_analysis')
+# Pointers from a source stat signature to the compiled index directory
+STAT_DIR = 'isogg-by-stat'
+
+def source_files(haplogroup_dir):
+    """Text inputs the index is compiled from, in hashing order"""
+    return [
+        tree_file(haplogroup_dir, 'ycc'),
+        tree_file(haplogroup_dir, 'hg_snp'),
+        isogg_file(haplogroup_dir, 'cleaned'),
+        isogg_file(haplogroup_dir, 'unique'),
+        isogg_file(haplogroup_dir, 'dropped'),
+    ]
+
+def content_hash(paths):
+    """SHA-256 over the index format version and the bytes of every source file"""
+    digest = hashlib.sha256(f"isogg-index-v{INDEX_FORMAT}".encode())
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def stat_signature(paths):
+    """Digest of the source files' absolute paths, sizes and modification times
+
+    Cheap to compute (no file contents are read); any rewrite of a source
+    file that changes its size or mtime gives a new signature.
+    """
+    digest = hashlib.sha256(f"isogg-index-v{INDEX_FORMAT}".encode())
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.abspath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode())
+    return digest.hexdigest()
+
+def _load_aliases(unique_file):
+    """Alias -> preferred SNP name pairs from the unique table's last column"""
+    aliases, names = [], []
+    with open(unique_file) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 5:
+                continue
+            for alias in fields[4].split(','):
+                if alias != fields[0]:
+                    aliases.append(alias)
+                    names.append(fields[0])
+    return aliases, names
+
+def _load_dropped(dropped_file):
+    """Name, position (-1 if not a point SNP) and reason for each dropped SNP"""
+    names, positions, reasons = [], [], []
+    with open(dropped_file) as f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            reason = line[line.find('(') + 1:line.find(')')] if '(' in line else ''
+            tail = line[line.find(')') + 1:].split() if '(' in line else fields[2:]
+            names.append(fields[0])
+            positions.append(int(tail[0]) if tail and tail[0].isdigit() else -1)
+            reasons.append(reason)
+    return names, positions, reasons
+
+def build_isogg_index(haplogroup_dir, cache_dir=DEFAULT_CACHE_DIR):
+    """Compile the tree and ISOGG tables into <cache_dir>/isogg-<hash>/ and return that path
+
+    Arrays are stored as individual .npy files so they can be memory-mapped:
+    node names, representative labels, parent and depth arrays; the SNP
+    table sorted by position (with node IDs); a sorted haplogroup-name ->
+    node map; sorted alias -> SNP name pairs; and the dropped SNPs. An
+    existing index for the same content hash is reused as-is.
+    """
+    paths = source_files(haplogroup_dir)
+    digest = content_hash(paths)
+    index_dir = os.path.join(cache_dir, f"isogg-{digest[:16]}")
+    if os.path.exists(os.path.join(index_dir, 'meta.json')):
+        return index_dir
+
+    reference = load_reference(haplogroup_dir)
+    snps = reference['snps']
+
+    lookup = node_lookup(reference['names'])
+    lookup_names = np.array(sorted(lookup))
+    alias_names, alias_targets = _load_aliases(isogg_file(haplogroup_dir, 'unique'))
+    alias_order = np.argsort(alias_names, kind='stable')
+    dropped_names, dropped_positions, dropped_reasons = _load_dropped(isogg_file(haplogroup_dir, 'dropped'))
+
+    arrays = {
+        'node_names': np.array(reference['names']),
+        'representative': np.array(reference['representative']),
+        'parent': reference['parent'].astype(np.int32),
+        'depth': reference['depth'].astype(np.int32),
+        'snp_name': snps['SNP'].to_numpy(dtype=str),
+        'snp_haplogroup': snps['Haplogroup'].to_numpy(dtype=str),
+        'snp_position': snps['Position'].to_numpy(dtype=np.int64),
+        'snp_mutation': snps['Mutation'].to_numpy(dtype=str),
+        'snp_node': snps['Node'].to_numpy(dtype=np.int32),
+        'lookup_name': lookup_names,
+        'lookup_node': np.array([lookup[name] for name in lookup_names], dtype=np.int32),
+        'alias_name': np.array(alias_names, dtype=str)[alias_order],
+        'alias_snp': np.array(alias_targets, dtype=str)[alias_order],
+        'dropped_name': np.array(dropped_names, dtype=str),
+        'dropped_position': np.array(dropped_positions, dtype=np.int64),
+        'dropped_reason': np.array(dropped_reasons, dtype=str),
+    }
+
+    os.makedirs(cache_dir, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix='.isogg-', dir=cache_dir)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(staging_dir, f"{name}.npy"), array)
+        with open(os.path.join(staging_dir, 'meta.json'), 'w') as f:
+            json.dump({'format': INDEX_FORMAT, 'content_hash': digest,
+                       'sources': [os.path.abspath(p) for p in paths],
+                       'arrays': sorted(arrays)}, f, indent=2)
+        os.replace(staging_dir, index_dir)
+    except OSError:
+        # Another process finished the same index first; keep theirs
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(index_dir, 'meta.json')):
+            raise
+
+    return index_dir
+
+def open_isogg_index(index_dir):
+    """Memory-map a compiled index without touching the source tables"""
+    with open(os.path.join(index_dir, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta['format'] != INDEX_FORMAT:
+        raise ValueError(f"{index_dir} has index format {meta['format']}, expected {INDEX_FORMAT}")
+
+    index = {name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode='r')
+             for name in meta['arrays']}
+    index['meta'] = meta
+    return index
+
+def cached_index_dir(haplogroup_dir, cache_dir=DEFAULT_CACHE_DIR):
+    """Compiled index recorded for the source files' current stat signature, or None"""
+    pointer = os.path.join(cache_dir, STAT_DIR, stat_signature(source_files(haplogroup_dir))[:16])
+    try:
+        with open(pointer) as f:
+            index_dir = os.path.join(cache_dir, f.read().strip())
+    except FileNotFoundError:
+        return None
+    return index_dir if os.path.exists(os.path.join(index_dir, 'meta.json')) else None
+
+def load_isogg_index(haplogroup_dir, cache_dir=DEFAULT_CACHE_DIR):
+    """Open the index for haplogroup_dir's tables, compiling it on first use
+
+    The source files are looked up by path, size and mtime first; only when
+    that signature is new are they hashed (build_isogg_index), and the
+    content-hashed index found or compiled is recorded under the signature
+    for the next load.
+    """
+    index_dir = cached_index_dir(haplogroup_dir, cache_dir)
+    if index_dir is None:
+        signature = stat_signature(source_files(haplogroup_dir))
+        index_dir = build_isogg_index(haplogroup_dir, cache_dir)
+        pointer = os.path.join(cache_dir, STAT_DIR, signature[:16])
+        os.makedirs(os.path.dirname(pointer), exist_ok=True)
+        with open(pointer + f'.{os.getpid()}.tmp', 'w') as f:
+            f.write(os.path.basename(index_dir))
+        os.replace(pointer + f'.{os.getpid()}.tmp', pointer)
+    return open_isogg_index(index_dir)
+
+def lookup_node(index, haplogroup):
+    """Node ID for a YCC or ISOGG haplogroup name, or -1 if unknown"""
+    names = index['lookup_name']
+    i = np.searchsorted(names, haplogroup)
+    return int(index['lookup_node'][i]) if i < len(names) and names[i] == haplogroup else -1
+
+def snps_at_position(index, position):
+    """Row slice of the SNP arrays for every ISOGG SNP at a chrY position"""
+    positions = index['snp_position']
+    return slice(np.searchsorted(positions, position, 'left'),
+                 np.searchsorted(positions, position, 'right'))
+
+def resolve_alias(index, snp_name):
+    """Preferred SNP name for an alias (returns the name itself if not an alias)"""
+    aliases = index['alias_name']
+    i = np.searchsorted(aliases, snp_name)
+    return str(index['alias_snp'][i]) if i < len(aliases) and aliases[i] == snp_name else snp_name
+
+def reference_from_index(index):
+    """Build the haplogroup_caller reference dict from a compiled index"""
+    mutation = pd.Series(index['snp_mutation'])
+    alleles = mutation.str.split('->', expand=True)
+    snps = pd.DataFrame({
+        'SNP': index['snp_name'],
+        'Haplogroup': index['snp_haplogroup'],
+        'Position': index['snp_position'],
+        'Mutation': mutation,
+        'Ancestral': alleles[0],
+        'Derived': alleles[1],
+        'Node': index['snp_node'].astype(np.int64),
+    })
+    return {
+        'names': index['node_names'].tolist(),
+        'representative': index['representative'].tolist(),
+        'parent': np.asarray(index['parent']),
+        'depth': np.asarray(index['depth']),
+        'snps': snps,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('haplogroup_dir', nargs='?', default='yri_haplogroups',
+                        help="yhaplo --all_aux_output directory holding the tree and ISOGG tables")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="where compiled indexes are kept")
+    args = parser.parse_args()
+
+    index_dir = build_isogg_index(args.haplogroup_dir, args.cache_dir)
+    index = open_isogg_index(index_dir)
+    print(f"ISOGG index: {index_dir}")
+    print(f"- {len(index['node_names'])} tree nodes")
+    print(f"- {len(index['snp_name'])} SNPs")
+    print(f"- {len(index['alias_name'])} aliases, {len(index['dropped_name'])} dropped SNPs")
+
+    return index_dir
+
+if __name__ == "__main__":
+    index_dir = main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Encode YCC haplogroup labels as categorical codes with their full ancestor chains
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# A YCC label is a major clade (leading capitals) followed by alternating
+# digit and lowercase runs, one run per tree level: E1b1a1 -> E, E1, E1b, E1b1, E1b1a, E1b1a1
+_YCC_LABEL = re.compile(r'^[A-Z]+(?:\d+|[a-z]+)*$')
+_LEVEL_RUN = re.compile(r'\d+|[a-z]+')
+
+def lineage_chain(label):
+    """Ancestor chain of a YCC label, from its major clade down to the label itself
+
+    'R/K2b2a2'-style labels use the part before the slash. Labels that do not
+    follow the YCC naming scheme (e.g. 'A0-T') are their own single-level chain.
+    """
+    name = label.split('/', 1)[0]
+    if not _YCC_LABEL.match(name):
+        return [label]
+    major = re.match(r'[A-Z]+', name).group()
+    chain = [major]
+    for run in _LEVEL_RUN.findall(name, len(major)):
+        chain.append(chain[-1] + run)
+    return chain
+
+def encode_lineages(labels):
+    """Encode a sequence of YCC labels once for counting at any tree level
+
+    Each distinct label is parsed a single time. Returns a dict with
+    'codes' (int64 per sample, -1 for missing labels), 'labels' (distinct
+    labels), 'nodes' (every label and ancestor seen), 'ancestors' (distinct
+    labels x levels matrix of node IDs, -1 past a label's depth) and 'depth'.
+    Level 0 is the major clade, level 1 is e.g. E1, level 2 E1b, and so on.
+    """
+    codes, uniques = pd.factorize(pd.Series(labels), use_na_sentinel=True)
+    chains = [lineage_chain(str(label)) for label in uniques]
+
+    node_ids = {}
+    for chain in chains:
+        for node in chain:
+            node_ids.setdefault(node, len(node_ids))
+
+    max_levels = max((len(chain) for chain in chains), default=0)
+    ancestors = np.full((len(chains), max_levels), -1, dtype=np.int64)
+    for i, chain in enumerate(chains):
+        ancestors[i, :len(chain)] = [node_ids[node] for node in chain]
+
+    return {
+        'codes': codes.astype(np.int64),
+        'labels': list(uniques),
+        'nodes': list(node_ids),
+        'ancestors': ancestors,
+        'depth': np.array([len(chain) - 1 for chain in chains], dtype=np.int64),
+    }
+
+def lineage_at_level(encoding, level):
+    """Node ID of each sample's ancestor at a tree level (-1 if the label is shallower)"""
+    ancestors = encoding['ancestors']
+    if level >= ancestors.shape[1]:
+        return np.full(len(encoding['codes']), -1, dtype=np.int64)
+    per_label = np.append(ancestors[:, level], -1)
+    return per_label[encoding['codes']]
+
+def level_labels(encoding, level, major=None):
+    """Each sample's ancestor label at a tree level as strings (NaN where absent)
+
+    If major is given, samples outside that major clade are NaN too.
+    """
+    nodes = np.array(encoding['nodes'] + [np.nan], dtype=object)
+    ids = lineage_at_level(encoding, level)
+    if major is not None:
+        major_id = encoding['nodes'].index(major) if major in encoding['nodes'] else -2
+        ids = np.where(lineage_at_level(encoding, 0) == major_id, ids, -1)
+    return nodes[ids]
+
+def descends_from(encoding, node):
+    """Boolean mask of samples whose label is node or one of its descendants"""
+    if node not in encoding['nodes']:
+        return np.zeros(len(encoding['codes']), dtype=bool)
+    per_label = np.append((encoding['ancestors'] == encoding['nodes'].index(node)).any(axis=1), False)
+    return per_label[encoding['codes']]
+
+def level_counts(encoding, level, mask=None):
+    """Sample counts per ancestor at a tree level, as a value_counts()-style Series
+
+    Counts come from one bincount over node IDs. Ties keep first-appearance
+    order, matching Series.value_counts().
+    """
+    ids = lineage_at_level(encoding, level)
+    if mask is not None:
+        ids = ids[np.asarray(mask)]
+    ids = ids[ids >= 0]
+
+    counts = np.bincount(ids, minlength=len(encoding['nodes']))
+    _, first_seen = np.unique(ids, return_index=True)
+    present = ids[np.sort(first_seen)]
+    order = present[np.argsort(-counts[present], kind='stable')]
+
+    return pd.Series(counts[order], index=pd.Index([encoding['nodes'][i] for i in order]),
+                     name='count')
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Parse yhaplo paths.*.txt into a shared root-to-tip path trie
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+class PathTrie:
+    """Trie of root-to-terminal paths shared by all samples
+
+    Every distinct path prefix is stored once. A node keeps the number of
+    samples passing through it, their summed derived-SNP count and the
+    distinct derived SNP names seen there; a sample only keeps its terminal
+    node. After finalize(), nodes are numbered in preorder so each subtree is
+    a contiguous range and subtree queries cost O(log n + subtree).
+    """
+
+    def __init__(self):
+        self.labels = ['Root']
+        self.parent = [-1]
+        self.sample_count = [0]
+        self.derived_total = [0]
+        self.snps = [set()]
+        self._children = {}
+        self.samples = []
+        self.haplogroups = []
+        self.terminal = []
+
+    def _child(self, node, label):
+        key = (node, label)
+        child = self._children.get(key)
+        if child is None:
+            child = len(self.labels)
+            self._children[key] = child
+            self.labels.append(label)
+            self.parent.append(node)
+            self.sample_count.append(0)
+            self.derived_total.append(0)
+            self.snps.append(set())
+        return child
+
+    def add_path(self, sample_id, haplogroup, path):
+        """Add one sample's path given as (node label, derived count, SNP names) steps"""
+        node = 0
+        self.sample_count[0] += 1
+        for label, count, snp_names in path:
+            node = self._child(node, label)
+            self.sample_count[node] += 1
+            self.derived_total[node] += count
+            self.snps[node].update(snp_names)
+        self.samples.append(sample_id)
+        self.haplogroups.append(haplogroup)
+        self.terminal.append(node)
+
+    def finalize(self):
+        """Freeze the trie into arrays and build the preorder and sample indexes"""
+        n_nodes = len(self.labels)
+        self.parent = np.array(self.parent, dtype=np.int32)
+        self.sample_count = np.array(self.sample_count, dtype=np.int64)
+        self.derived_total = np.array(self.derived_total, dtype=np.int64)
+        self.terminal = np.array(self.terminal, dtype=np.int32)
+
+        children = [[] for _ in range(n_nodes)]
+        for node in range(1, n_nodes):
+            children[self.parent[node]].append(node)
+
+        self.preorder = np.empty(n_nodes, dtype=np.int64)
+        self.subtree_end = np.empty(n_nodes, dtype=np.int64)
+        counter = 0
+        stack = [(0, False)]
+        while stack:
+            node, done = stack.pop()
+            if done:
+                self.subtree_end[node] = counter
+                continue
+            self.preorder[node] = counter
+            counter += 1
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children[node]))
+
+        self._sample_order = np.argsort(self.preorder[self.terminal], kind='stable')
+        self._sorted_terminal_rank = self.preorder[self.terminal][self._sample_order]
+        self._nodes_of_label = {}
+        for node, label in enumerate(self.labels):
+            self._nodes_of_label.setdefault(label, []).append(node)
+        self._sample_index = {sample_id: i for i, sample_id in enumerate(self.samples)}
+        del self._children
+        return self
+
+    def nodes(self, label):
+        """Trie node IDs carrying a haplogroup label
+
+        A label can sit on more than one trie node when samples skip
+        different intermediate nodes (no derived SNPs observed there).
+        """
+        return self._nodes_of_label.get(label, [])
+
+    def path(self, sample_id):
+        """Node labels from the root (exclusive) to a sample's terminal node"""
+        node = self.terminal[self._sample_index[sample_id]]
+        labels = []
+        while node > 0:
+            labels.append(self.labels[node])
+            node = self.parent[node]
+        return labels[::-1]
+
+    def samples_under(self, label):
+        """Samples whose terminal node lies in the subtree rooted at label"""
+        samples = []
+        for node in self.nodes(label):
+            lo = np.searchsorted(self._sorted_terminal_rank, self.preorder[node], 'left')
+            hi = np.searchsorted(self._sorted_terminal_rank, self.subtree_end[node], 'left')
+            samples.extend(self.samples[i] for i in self._sample_order[lo:hi])
+        return samples
+
+    def node_table(self):
+        """Per-node sample counts and derived-SNP tallies as a DataFrame"""
+        parent = self.parent
+        return pd.DataFrame({
+            'Node': self.labels,
+            'Parent': [self.labels[p] if p >= 0 else '' for p in parent],
+            'Samples': self.sample_count,
+            'Terminal_Samples': np.bincount(self.terminal, minlength=len(self.labels)),
+            'Derived_SNP_Total': self.derived_total,
+            'Distinct_Derived_SNPs': [len(s) for s in self.snps],
+        })
+
+def parse_path_line(line):
+    """Split a paths.*.txt line into sample ID, haplogroup and (label, count, SNPs) steps"""
+    header, _, path_text = line.partition('|')
+    header_fields = header.split()
+    steps = []
+    for token in path_text.split():
+        label, count, snp_text = token.split(':', 2)
+        steps.append((label, int(count), snp_text.split(',') if snp_text else []))
+    return header_fields[0], header_fields[1], steps
+
+def load_path_trie(paths_file):
+    """Parse a yhaplo paths file into a finalized PathTrie"""
+    trie = PathTrie()
+    with open(paths_file) as f:
+        for line in f:
+            if line.strip():
+                trie.add_path(*parse_path_line(line))
+    return trie.finalize()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('paths_file', nargs='?', default='yri_haplogroups/paths.YRI_males_chrY.txt')
+    parser.add_argument('--under', help="list the samples in the subtree of this haplogroup")
+    args = parser.parse_args()
+
+    trie = load_path_trie(args.paths_file)
+    print(f"Loaded {len(trie.samples)} sample paths into {len(trie.labels)} shared trie nodes")
+    if args.under:
+        samples = trie.samples_under(args.under)
+        print(f"{len(samples)} samples under {args.under}: {' '.join(samples)}")
+
+    return trie
+
+if __name__ == "__main__":
+    trie = main()
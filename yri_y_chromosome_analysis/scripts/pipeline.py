@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Incremental pipeline runner: extract -> genotypes -> call -> analyze -> plot, with content-addressed stage caching
+"""
+
+import argparse
+import ast
+import contextlib
+import csv
+import hashlib
+import inspect
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+STATE_FILE = '.pipeline_state.json'
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Stage functions run in worker processes, so they import their modules lazily
+
+def stage_extract(panel_file, populations, output_dir):
+    """Write one male sample list per population from a single panel pass
+
+    A population without males in the panel gets an empty list, so it does
+    not fail the stage that every population depends on.
+    """
+    import extract_yri_males
+    counts = extract_yri_males.extract_population_samples(panel_file, populations=populations,
+                                                          output_dir=output_dir, streaming=True)
+    for population in populations:
+        if not counts.get((population, 'male')):
+            open(os.path.join(output_dir, f"{population.lower()}_male_samples.txt"), 'w').close()
+
+def stage_genotypes(vcf_file, sample_files, output_dir):
+    """Decode every population's genotypes in one VCF pass"""
+    import vcf_genotypes
+    subsets = {vcf_genotypes.subset_name(path): vcf_genotypes.read_sample_list(path)
+               for path in sample_files}
+    os.makedirs(output_dir, exist_ok=True)
+    for name, genotype_data in vcf_genotypes.read_genotypes(vcf_file, subsets).items():
+        vcf_genotypes.save_genotypes(genotype_data, os.path.join(output_dir, f"{name}.genotypes.npz"))
+
+def stage_call_native(genotype_file, reference_dir, output_file):
+    """Call haplogroups in-process from a population's genotype matrix"""
+    import haplogroup_caller
+    import vcf_genotypes
+    reference = haplogroup_caller.load_reference(reference_dir)
+    haplogroups = haplogroup_caller.call_haplogroups(vcf_genotypes.load_genotypes(genotype_file), reference)
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    haplogroup_caller.write_haplogroups(haplogroups, output_file)
+
+def stage_call_yhaplo(vcf_file, sample_file, output_file):
+    """Subset the VCF with bcftools and call haplogroups with the yhaplo CLI"""
+    output_dir = os.path.dirname(output_file)
+    name = os.path.basename(output_file)[len('haplogroups.'):-len('.txt')]
+    subset_vcf = os.path.join(output_dir, f"{name}.vcf.gz")
+    os.makedirs(output_dir, exist_ok=True)
+    subprocess.run(['bcftools', 'view', '-S', sample_file, vcf_file, '-O', 'z', '-o', subset_vcf], check=True)
+    subprocess.run(['yhaplo', '-i', subset_vcf, '-o', output_dir, '--all_aux_output'], check=True)
+
+def stage_analyze(haplogroup_file, output_dir, population):
+    """Frequency analysis for one population, after call QC when yhaplo wrote counts.anc_der"""
+    import analyze_yri_haplogroups
+    import anc_der_qc
+    os.makedirs(output_dir, exist_ok=True)
+    anc_der_file = anc_der_qc.anc_der_file_for(haplogroup_file)
+    with open(os.path.join(output_dir, 'analysis.log'), 'w') as log, contextlib.redirect_stdout(log):
+        if os.path.exists(anc_der_file):
+            anc_der_qc.run_qc(anc_der_file, output_dir, population.lower())
+        analyze_yri_haplogroups.main(haplogroup_file, output_dir=output_dir,
+                                     prefix=population.lower(), population=population)
+
+def stage_plot(data_dir, output_dir, population, tree):
+    """Figures for one population (render_figures also skips unchanged figures itself)"""
+    import visualize_yri_haplogroups
+    visualize_yri_haplogroups.render_figures(data_dir, output_dir, population.lower(), workers=1, tree=tree,
+                                             population=population)
+
+def panel_populations(panel_file):
+    """Population codes present in a 1000 Genomes panel file"""
+    with open(panel_file, newline='') as f:
+        reader = csv.reader(f, delimiter='\t')
+        pop_col = next(reader).index('pop')
+        return sorted({row[pop_col] for row in reader if row})
+
+def build_stages(panel_file, vcf_file, reference_dir, work_dir, populations=None, caller='native'):
+    """Declare every stage with its function, inputs, outputs and parameters
+
+    Stages are per population from the call step on, so a new population
+    only adds stages and a changed sample list only invalidates its own
+    population downstream of the shared extract/genotype passes. Those
+    stages name their population's 'sample_list'; run_pipeline() marks them
+    'empty' instead of running them when the list has no samples.
+    """
+    import isogg_index
+    from analyze_yri_haplogroups import result_paths
+    from anc_der_qc import anc_der_file_for, qc_paths
+    from y_tree import tree_file
+
+    populations = sorted(populations or panel_populations(panel_file))
+    lists_dir = os.path.join(work_dir, 'sample_lists')
+    genotypes_dir = os.path.join(work_dir, 'genotypes')
+    reference_files = isogg_index.source_files(reference_dir)
+    tree = tree_file(reference_dir, 'aligned.ycc')
+
+    list_files = {pop: os.path.join(lists_dir, f"{pop.lower()}_male_samples.txt") for pop in populations}
+    stages = [{
+        'name': 'extract',
+        'function': stage_extract,
+        'args': (panel_file, populations, lists_dir),
+        'inputs': [panel_file],
+        'outputs': list(list_files.values()),
+        'params': {'populations': populations, 'sex': 'male'},
+    }]
+
+    if caller == 'native':
+        genotype_files = {pop: os.path.join(genotypes_dir, f"{pop.lower()}_male.genotypes.npz")
+                          for pop in populations}
+        stages.append({
+            'name': 'genotypes',
+            'function': stage_genotypes,
+            'args': (vcf_file, list(list_files.values()), genotypes_dir),
+            'inputs': [vcf_file] + list(list_files.values()),
+            'outputs': list(genotype_files.values()),
+            'params': {},
+        })
+
+    for pop in populations:
+        call_dir = os.path.join(work_dir, 'haplogroups', pop)
+        haplogroup_file = os.path.join(call_dir, f"haplogroups.{pop}_males_chrY.txt")
+        analysis_dir = os.path.join(work_dir, 'analysis', pop)
+        analysis_files = result_paths(analysis_dir, pop.lower())
+        # Only yhaplo writes the per-node counts that stage_analyze QCs the calls with
+        anc_der_files = [anc_der_file_for(haplogroup_file)] if caller == 'yhaplo' else []
+        qc_files = list(qc_paths(analysis_dir, pop.lower()).values()) if anc_der_files else []
+
+        if caller == 'native':
+            call = {'function': stage_call_native,
+                    'args': (genotype_files[pop], reference_dir, haplogroup_file),
+                    'inputs': [genotype_files[pop]] + reference_files}
+        else:
+            call = {'function': stage_call_yhaplo,
+                    'args': (vcf_file, list_files[pop], haplogroup_file),
+                    'inputs': [vcf_file, list_files[pop]]}
+        stages.append(dict(call, name=f"call:{pop}", outputs=[haplogroup_file] + anc_der_files,
+                           params={'caller': caller}, sample_list=list_files[pop]))
+
+        stages.append({
+            'name': f"analyze:{pop}",
+            'function': stage_analyze,
+            'args': (haplogroup_file, analysis_dir, pop),
+            'inputs': [haplogroup_file] + anc_der_files,
+            'outputs': list(analysis_files.values()) + qc_files,
+            'params': {},
+            'sample_list': list_files[pop],
+        })
+        stages.append({
+            'name': f"plot:{pop}",
+            'function': stage_plot,
+            'args': (analysis_dir, os.path.join(work_dir, 'figures', pop), pop, tree),
+            # Every table load_analysis_data() reads
+            'inputs': [analysis_files[table] for table in ('analyzed', 'major', 'ycc', 'terminal_snp', 'e1', 'e2')]
+                      + [tree],
+            'outputs': [os.path.join(work_dir, 'figures', pop, f"{pop.lower()}_haplogroup_dashboard.png")],
+            'params': {'dpi': 300},
+            'sample_list': list_files[pop],
+        })
+
+    for stage in stages:
+        stage['code'] = stage_code_files(stage['function'])
+
+    producers = {output: stage['name'] for stage in stages for output in stage['outputs']}
+    for stage in stages:
+        stage['deps'] = sorted({producers[path] for path in stage['inputs'] if path in producers})
+
+    return stages
+
+def script_files(modules):
+    """Paths of the given scripts/ modules and of every scripts/ module they import, at any depth"""
+    files, seen, pending = [], set(), list(modules)
+    while pending:
+        module = pending.pop()
+        path = os.path.join(SCRIPTS_DIR, f"{module}.py")
+        if module in seen or not os.path.exists(path):
+            continue
+        seen.add(module)
+        files.append(path)
+        with open(path) as f:
+            pending.extend(imported_modules(ast.parse(f.read(), path)))
+    return sorted(files)
+
+def imported_modules(tree):
+    """Top-level names of the absolute imports anywhere in a syntax tree, lazy ones included"""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            yield from (alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            yield node.module.split('.')[0]
+
+def stage_code_files(function):
+    """Script files a stage function runs: the modules it imports and everything they import"""
+    return script_files(imported_modules(ast.parse(inspect.getsource(function))))
+
+def has_samples(sample_file):
+    """Whether a sample list holds at least one ID"""
+    with open(sample_file) as f:
+        return any(line.strip() for line in f)
+
+def file_digest(path, file_cache):
+    """SHA-256 of a file's content, reusing the cached digest while size and mtime are unchanged
+
+    .npz archives are hashed by their arrays rather than their bytes, since
+    the zip container embeds write timestamps.
+    """
+    stat = os.stat(path)
+    signature = [stat.st_size, stat.st_mtime_ns]
+    cached = file_cache.get(path)
+    if cached and cached[:2] == signature:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    if path.endswith('.npz'):
+        with np.load(path) as data:
+            for name in sorted(data.files):
+                array = data[name]
+                digest.update(f"{name}|{array.dtype}|{array.shape}".encode())
+                digest.update(np.ascontiguousarray(array).tobytes())
+    else:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+
+    file_cache[path] = signature + [digest.hexdigest()]
+    return digest.hexdigest()
+
+def stage_key(stage, file_cache):
+    """Content address of a stage: its name, parameters, code and the digests of its inputs
+
+    The code is the stage function's source and the script files it
+    imports (stage['code']), so editing a script reruns the stages using it.
+    """
+    digest = hashlib.sha256(stage['name'].encode())
+    digest.update(json.dumps(stage['params'], sort_keys=True).encode())
+    digest.update(inspect.getsource(stage['function']).encode())
+    for path in stage.get('code', ()):
+        digest.update(os.path.basename(path).encode())
+        digest.update(file_digest(path, file_cache).encode())
+    for path in stage['inputs']:
+        digest.update(path.encode())
+        digest.update(file_digest(path, file_cache).encode())
+    return digest.hexdigest()
+
+def _load_state(work_dir):
+    path = os.path.join(work_dir, STATE_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {'stages': {}, 'files': {}}
+
+def _save_state(state, work_dir):
+    path = os.path.join(work_dir, STATE_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def run_pipeline(stages, work_dir, workers=None, force=False):
+    """Run stages in dependency order, concurrently where independent, skipping up-to-date ones
+
+    A stage is up to date when its content key matches the key recorded
+    after its last successful run and all of its outputs exist. Keys are
+    computed only once a stage's dependencies have finished, so they see
+    the upstream outputs as rewritten in this run. If a stage fails, its
+    dependents are not run; every other stage still is. A stage whose
+    sample list is empty, or that depends on such a stage, is 'empty'.
+    Returns a dict mapping stage name to 'ran', 'skipped', 'empty', 'failed' or 'blocked'.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    state = _load_state(work_dir)
+    by_name = {stage['name']: stage for stage in stages}
+    status = {}
+    running = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while len(status) < len(stages):
+            for stage in stages:
+                name = stage['name']
+                if name in status or name in (entry[0] for entry in running.values()):
+                    continue
+                if any(status.get(dep) in ('failed', 'blocked') for dep in stage['deps']):
+                    status[name] = 'blocked'
+                    continue
+                if not all(status.get(dep) in ('ran', 'skipped', 'empty') for dep in stage['deps']):
+                    continue
+                if (any(status[dep] == 'empty' for dep in stage['deps'])
+                        or (stage.get('sample_list') and not has_samples(stage['sample_list']))):
+                    status[name] = 'empty'
+                    print(f"[empty] {name}: no samples in {stage.get('sample_list')}")
+                    continue
+
+                key = stage_key(stage, state['files'])
+                if (not force and state['stages'].get(name) == key
+                        and all(os.path.exists(path) for path in stage['outputs'])):
+                    status[name] = 'skipped'
+                    continue
+
+                print(f"[run] {name}")
+                future = pool.submit(stage['function'], *stage['args'])
+                running[future] = (name, key, time.perf_counter())
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, key, started = running.pop(future)
+                elapsed = time.perf_counter() - started
+                try:
+                    future.result()
+                except Exception as error:
+                    status[name] = 'failed'
+                    state['stages'].pop(name, None)
+                    print(f"[failed] {name}: {error!r}")
+                else:
+                    missing = [path for path in by_name[name]['outputs'] if not os.path.exists(path)]
+                    if missing:
+                        status[name] = 'failed'
+                        print(f"[failed] {name}: outputs not written: {missing}")
+                    else:
+                        status[name] = 'ran'
+                        state['stages'][name] = key
+                        print(f"[done] {name} ({elapsed:.1f}s)")
+                _save_state(state, work_dir)
+
+    _save_state(state, work_dir)
+    return status
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--panel', default='data/integrated_call_samples_v3.20130502.ALL.panel')
+    parser.add_argument('--vcf', default='data/ALL.chrY.phase3_integrated_v2b.20130502.genotypes.vcf.gz')
+    parser.add_argument('--reference-dir', default='results/yri_haplogroups',
+                        help="directory holding the yhaplo tree and ISOGG tables")
+    parser.add_argument('--work-dir', default='pipeline_output')
+    parser.add_argument('--populations', nargs='+', help="population codes (default: all in the panel)")
+    parser.add_argument('--caller', choices=['native', 'yhaplo'], default='native',
+                        help="in-process caller, or bcftools + yhaplo CLI per population")
+    parser.add_argument('--workers', type=int, help="stages run concurrently (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="rerun every stage")
+    args = parser.parse_args()
+
+    stages = build_stages(args.panel, args.vcf, args.reference_dir, args.work_dir,
+                          args.populations, args.caller)
+    status = run_pipeline(stages, args.work_dir, args.workers, args.force)
+
+    counts = {}
+    for result in status.values():
+        counts[result] = counts.get(result, 0) + 1
+    print("\nPipeline finished: " + ", ".join(f"{n} {result}" for result, n in sorted(counts.items())))
+
+    return status
+
+if __name__ == "__main__":
+    status = main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Compile yhaplo haplogroup results into a memory-mapped store with sample and haplogroup indexes
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+STORE_FORMAT = 1
+
+def _preorder(parent):
+    """Preorder rank and subtree end (exclusive) of every tree node"""
+    n_nodes = len(parent)
+    children = [[] for _ in range(n_nodes)]
+    for node in range(1, n_nodes):
+        children[parent[node]].append(node)
+
+    rank = np.empty(n_nodes, dtype=np.int32)
+    end = np.empty(n_nodes, dtype=np.int32)
+    counter = 0
+    stack = [(0, False)]
+    while stack:
+        node, done = stack.pop()
+        if done:
+            end[node] = counter
+            continue
+        rank[node] = counter
+        counter += 1
+        stack.append((node, True))
+        stack.extend((child, False) for child in reversed(children[node]))
+    return rank, end
+
+def _read_derived_snps(path, sample_index, node_of):
+    """Flatten derived.snps.<name>.txt into per-sample offsets and (node, SNP) entries
+
+    Each line is '<sample> <ycc> <terminal SNP> | <node>:<snp> ...'.
+    Returns (offsets, counts, entry nodes, entry SNP codes, SNP names).
+    """
+    import pandas as pd
+
+    n_samples = len(sample_index)
+    per_sample = [None] * n_samples
+    with open(path) as f:
+        for line in f:
+            header, _, entries = line.partition('|')
+            fields = header.split()
+            if fields and fields[0] in sample_index:
+                per_sample[sample_index[fields[0]]] = entries.split()
+
+    counts = np.array([len(entries or ()) for entries in per_sample], dtype=np.int32)
+    offsets = np.zeros(n_samples, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)[:-1]
+    tokens = [token for entries in per_sample if entries for token in entries]
+    labels, snps = zip(*(token.split(':', 1) for token in tokens)) if tokens else ((), ())
+    snp_codes, snp_names = pd.factorize(pd.Series(snps, dtype=object))
+    entry_nodes = np.array([node_of(label) for label in labels], dtype=np.int32)
+    return offsets, counts, entry_nodes, snp_codes.astype(np.int32), np.asarray(snp_names, dtype=str)
+
+def build_results_store(haplogroup_dir, output_dir, name='YRI_males_chrY', cache_dir=None):
+    """Compile haplogroups.<name>.txt and derived.snps.<name>.txt into a store directory
+
+    Node IDs are those of the compiled ISOGG index for haplogroup_dir's
+    tree, so stores built from the same tables share them. Arrays:
+    - samples: fixed-width records (sample ID, node, categorical codes for
+      the YCC, terminal SNP and representative labels, offset and count
+      into the derived-SNP entries)
+    - derived_node / derived_snp: every sample's derived SNPs, flattened
+    - sample_id_sorted / sample_id_order: index by sample ID
+    - node_rank_sorted / node_order: samples ordered by the preorder rank
+      of their node, so every subtree is one contiguous range
+    plus the label tables and the tree arrays the queries need. The store
+    is written to a staging directory and swapped in whole. cache_dir
+    defaults to the ISOGG index cache. Returns output_dir.
+    """
+    # Building needs pandas and the ISOGG index; opening and querying a store only numpy
+    import pandas as pd
+    from analyze_yri_haplogroups import load_haplogroup_data
+    from isogg_index import DEFAULT_CACHE_DIR, load_isogg_index, lookup_node
+
+    index = load_isogg_index(haplogroup_dir, cache_dir or DEFAULT_CACHE_DIR)
+    haplogroups = load_haplogroup_data(os.path.join(haplogroup_dir, f"haplogroups.{name}.txt"))
+    sample_ids = haplogroups['Sample_ID'].tolist()
+    n_samples = len(sample_ids)
+
+    nodes = np.array([lookup_node(index, label) for label in haplogroups['YCC_Haplogroup']], dtype=np.int32)
+    ycc_codes, ycc_labels = pd.factorize(haplogroups['YCC_Haplogroup'])
+    terminal_codes, terminal_labels = pd.factorize(haplogroups['Terminal_SNP'])
+    representative_codes, representative_labels = pd.factorize(haplogroups['Representative_SNP'])
+
+    derived_file = os.path.join(haplogroup_dir, f"derived.snps.{name}.txt")
+    if os.path.exists(derived_file):
+        offsets, counts, derived_node, derived_snp, snp_names = _read_derived_snps(
+            derived_file, {sample_id: i for i, sample_id in enumerate(sample_ids)},
+            lambda label: lookup_node(index, label))
+    else:
+        offsets, counts = np.zeros(n_samples, dtype=np.int64), np.zeros(n_samples, dtype=np.int32)
+        derived_node, derived_snp, snp_names = (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32),
+                                                np.zeros(0, dtype=str))
+
+    id_width = max((len(sample_id) for sample_id in sample_ids), default=1)
+    records = np.zeros(n_samples, dtype=[
+        ('sample_id', f'S{id_width}'), ('node', np.int32), ('ycc', np.int32), ('terminal', np.int32),
+        ('representative', np.int32), ('snp_offset', np.int64), ('snp_count', np.int32)])
+    records['sample_id'] = sample_ids
+    records['node'] = nodes
+    records['ycc'] = ycc_codes
+    records['terminal'] = terminal_codes
+    records['representative'] = representative_codes
+    records['snp_offset'] = offsets
+    records['snp_count'] = counts
+
+    parent = np.asarray(index['parent'])
+    rank, subtree_end = _preorder(parent)
+    # Samples whose label is not in the tree sort past every subtree
+    sample_rank = np.where(nodes >= 0, rank[np.maximum(nodes, 0)], len(parent)).astype(np.int32)
+    node_order = np.argsort(sample_rank, kind='stable').astype(np.int32)
+    id_order = np.argsort(records['sample_id'], kind='stable').astype(np.int32)
+
+    arrays = {
+        'samples': records,
+        'derived_node': derived_node,
+        'derived_snp': derived_snp,
+        'snp_names': snp_names,
+        'ycc_labels': np.asarray(ycc_labels, dtype=str),
+        'terminal_labels': np.asarray(terminal_labels, dtype=str),
+        'representative_labels': np.asarray(representative_labels, dtype=str),
+        'sample_id_order': id_order,
+        'sample_id_sorted': records['sample_id'][id_order],
+        'node_order': node_order,
+        'node_rank_sorted': sample_rank[node_order],
+        'node_names': np.asarray(index['node_names']),
+        'parent': parent.astype(np.int32),
+        'preorder': rank,
+        'subtree_end': subtree_end,
+        'lookup_name': np.asarray(index['lookup_name']),
+        'lookup_node': np.asarray(index['lookup_node']),
+    }
+
+    output_dir = os.path.abspath(output_dir)
+    parent_dir = os.path.dirname(output_dir)
+    os.makedirs(parent_dir, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix='.results-store-', dir=parent_dir)
+    try:
+        for array_name, array in arrays.items():
+            np.save(os.path.join(staging_dir, f"{array_name}.npy"), array)
+        with open(os.path.join(staging_dir, 'meta.json'), 'w') as f:
+            json.dump({'format': STORE_FORMAT, 'name': name, 'samples': n_samples,
+                       'source': os.path.abspath(haplogroup_dir),
+                       'isogg_index': index['meta']['content_hash'],
+                       'arrays': sorted(arrays)}, f, indent=2)
+        if os.path.exists(output_dir):
+            retired = tempfile.mkdtemp(prefix='.retired-', dir=parent_dir)
+            os.replace(output_dir, os.path.join(retired, 'store'))
+            shutil.rmtree(retired, ignore_errors=True)
+        os.replace(staging_dir, output_dir)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    return output_dir
+
+def open_results_store(store_dir):
+    """Memory-map a results store read-only; safe to share across worker processes"""
+    with open(os.path.join(store_dir, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta['format'] != STORE_FORMAT:
+        raise ValueError(f"{store_dir} has store format {meta['format']}, expected {STORE_FORMAT}")
+
+    store = {name: np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode='r')
+             for name in meta['arrays']}
+    store['meta'] = meta
+    return store
+
+def find_sample(store, sample_id):
+    """Row of a sample in the store, or -1 if absent"""
+    ids = store['sample_id_sorted']
+    key = sample_id.encode()
+    i = np.searchsorted(ids, key)
+    return int(store['sample_id_order'][i]) if i < len(ids) and ids[i] == key else -1
+
+def store_node(store, haplogroup):
+    """Tree node ID of a YCC or ISOGG haplogroup name, or -1 if unknown"""
+    names = store['lookup_name']
+    i = np.searchsorted(names, haplogroup)
+    return int(store['lookup_node'][i]) if i < len(names) and names[i] == haplogroup else -1
+
+def sample_record(store, sample_id):
+    """A sample's haplogroup call as a dict, or None if the sample is not in the store"""
+    row = find_sample(store, sample_id)
+    if row < 0:
+        return None
+    record = store['samples'][row]
+    return {
+        'Sample_ID': sample_id,
+        'Terminal_SNP': str(store['terminal_labels'][record['terminal']]),
+        'Representative_SNP': str(store['representative_labels'][record['representative']]),
+        'YCC_Haplogroup': str(store['ycc_labels'][record['ycc']]),
+        'Node': int(record['node']),
+    }
+
+def sample_path(store, sample_id):
+    """Root-to-terminal path of a sample as (node label, derived SNPs observed there) steps
+
+    Every ancestor of the called node is listed, including those where no
+    derived SNP was observed.
+    """
+    row = find_sample(store, sample_id)
+    if row < 0:
+        return None
+    record = store['samples'][row]
+    entries = slice(int(record['snp_offset']), int(record['snp_offset']) + int(record['snp_count']))
+    snps_at = {}
+    for node, snp in zip(store['derived_node'][entries].tolist(), store['derived_snp'][entries].tolist()):
+        snps_at.setdefault(node, []).append(str(store['snp_names'][snp]))
+
+    path = []
+    node = int(record['node'])
+    while node > 0:
+        path.append((str(store['node_names'][node]), snps_at.get(node, [])))
+        node = int(store['parent'][node])
+    return path[::-1]
+
+def subtree_rows(store, haplogroup):
+    """Rows of the samples called at haplogroup or below it (empty if the name is unknown)"""
+    node = store_node(store, haplogroup)
+    if node < 0:
+        return np.zeros(0, dtype=np.int32)
+    ranks = store['node_rank_sorted']
+    lo = np.searchsorted(ranks, store['preorder'][node], 'left')
+    hi = np.searchsorted(ranks, store['subtree_end'][node], 'left')
+    return store['node_order'][lo:hi]
+
+def samples_under(store, haplogroup):
+    """Sample IDs called at haplogroup or below it"""
+    rows = np.sort(subtree_rows(store, haplogroup))
+    return [sample_id.decode() for sample_id in store['samples']['sample_id'][rows]]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('store', help="store directory")
+    parser.add_argument('--build-from', metavar='HAPLOGROUP_DIR',
+                        help="(re)build the store from this yhaplo --all_aux_output directory first")
+    parser.add_argument('--name', default='YRI_males_chrY', help="yhaplo run name of the input files")
+    parser.add_argument('--cache-dir', help="where compiled ISOGG indexes are kept (default: ~/.cache/yri_y_chromosome_analysis)")
+    parser.add_argument('--sample', nargs='+', default=[], help="print these samples' calls and paths")
+    parser.add_argument('--under', nargs='+', default=[], help="list the samples in these haplogroups' subtrees")
+    args = parser.parse_args()
+
+    if args.build_from:
+        build_results_store(args.build_from, args.store, args.name, args.cache_dir)
+    store = open_results_store(args.store)
+    print(f"Results store {args.store}: {store['meta']['samples']} samples, "
+          f"{len(store['derived_snp'])} derived SNP entries")
+
+    for sample_id in args.sample:
+        record = sample_record(store, sample_id)
+        if record is None:
+            print(f"{sample_id}: not in store")
+            continue
+        print(f"{sample_id}: {record['YCC_Haplogroup']} ({record['Terminal_SNP']})")
+        print("  " + " ".join(f"{label}:{len(snps)}" for label, snps in sample_path(store, sample_id)))
+    for haplogroup in args.under:
+        samples = samples_under(store, haplogroup)
+        print(f"{len(samples)} samples under {haplogroup}: {' '.join(samples)}")
+
+    return store
+
+if __name__ == "__main__":
+    store = main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Run the haplogroup analysis for many populations in parallel and merge the results
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import shutil
+import tempfile
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import analyze_yri_haplogroups
+from diversity_stats import count_matrix, diversity_table, rarefaction_curves
+from frequency_engine import combine_levels, standard_frequency_tables
+
+def find_haplogroup_files(patterns):
+    """Resolve yhaplo output directories, globs or haplogroups.*.txt files to haplogroup files"""
+    files = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            if os.path.isdir(path):
+                files.extend(sorted(glob.glob(os.path.join(path, 'haplogroups.*.txt'))))
+            elif os.path.isfile(path):
+                files.append(path)
+    return list(dict.fromkeys(files))
+
+def population_name(haplogroup_file):
+    """Population code from a yhaplo output name: haplogroups.YRI_males_chrY.txt -> YRI"""
+    name = os.path.basename(haplogroup_file)[len('haplogroups.'):-len('.txt')]
+    return name.split('_')[0]
+
+def check_population_names(haplogroup_files):
+    """Raise ValueError if two inputs resolve to the same population code (and output directory)"""
+    inputs = {}
+    for path in haplogroup_files:
+        inputs.setdefault(population_name(path), []).append(path)
+    duplicates = {population: paths for population, paths in inputs.items() if len(paths) > 1}
+    if duplicates:
+        raise ValueError("Inputs share a population code and would overwrite each other: "
+                         + "; ".join(f"{population}: {', '.join(paths)}" for population, paths in duplicates.items()))
+
+def analyze_population(haplogroup_file, output_root):
+    """Worker: run load -> frequencies -> tables -> save for one population
+
+    Output goes to <output_root>/<POP>/ with a <pop>_ file prefix, and the
+    step-by-step printout to analysis.log in the same directory. Everything
+    is written to a staging directory that replaces <POP>/ only once the
+    analysis succeeds, so a failure leaves no partial tables (and keeps any
+    earlier complete results).
+    """
+    population = population_name(haplogroup_file)
+    output_dir = os.path.abspath(os.path.join(output_root, population))
+    os.makedirs(output_root, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix=f'.{population}-', dir=output_root)
+    try:
+        with open(os.path.join(staging_dir, 'analysis.log'), 'w') as log, contextlib.redirect_stdout(log):
+            df = analyze_yri_haplogroups.main(haplogroup_file, output_dir=staging_dir,
+                                              prefix=population.lower(), population=population)[0]
+        if os.path.exists(output_dir):
+            retired = tempfile.mkdtemp(prefix='.retired-', dir=output_root)
+            os.replace(output_dir, os.path.join(retired, population))
+            shutil.rmtree(retired, ignore_errors=True)
+        os.replace(staging_dir, output_dir)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    paths = analyze_yri_haplogroups.result_paths(output_dir, population.lower())
+    return population, {'samples': len(df), 'analyzed': os.path.relpath(paths['analyzed'], output_root)}
+
+def _write_manifest(manifest, output_root):
+    with open(os.path.join(output_root, 'run_manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+def merge_populations(completed, output_root, n_boot=0, seed=None):
+    """Build the cross-population frequency and YCC diversity tables from the per-population outputs
+
+    Diversity is compared at equal effort through richness rarefied to the
+    smallest population and rarefaction curves; with n_boot > 0 the
+    diversity statistics also get bootstrap intervals.
+    Returns the path of the frequency table.
+    """
+    frames = [pd.read_csv(os.path.join(output_root, result['analyzed'])).assign(Population=population)
+              for population, result in sorted(completed.items())]
+    cohort = pd.concat(frames, ignore_index=True)
+
+    tables = standard_frequency_tables(cohort, group_by=['Population'], n_boot=n_boot, seed=seed)
+    merged = combine_levels(tables)
+    output_file = os.path.join(output_root, 'cross_population_frequencies.csv')
+    merged.to_csv(output_file, index=False)
+
+    counts, keys = count_matrix(tables['ycc'], ['Population'])
+    diversity_table(counts, keys, n_boot=n_boot, seed=seed).to_csv(
+        os.path.join(output_root, 'cross_population_diversity.csv'), index=False)
+    rarefaction_curves(counts, keys).to_csv(
+        os.path.join(output_root, 'cross_population_rarefaction.csv'), index=False)
+    return output_file
+
+def run_populations(haplogroup_files, output_root='populations', workers=None, n_boot=0, seed=None):
+    """Analyze every population across a process pool, then merge the completed ones
+
+    A failing population is recorded in run_manifest.json with its traceback
+    and does not stop the others; the manifest is rewritten after every
+    population finishes, so completed results survive a crash of the driver.
+    Output paths in the manifest are relative to output_root, so the whole
+    directory can be moved.
+    Inputs sharing a population code are rejected up front (ValueError).
+    Returns the manifest dict.
+    """
+    check_population_names(haplogroup_files)
+    os.makedirs(output_root, exist_ok=True)
+    manifest = {'completed': {}, 'failed': {}, 'merged': None}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(analyze_population, path, output_root): path for path in haplogroup_files}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                population, result = future.result()
+            except Exception:
+                manifest['failed'][population_name(path)] = {'input': path, 'error': traceback.format_exc()}
+                print(f"FAILED: {population_name(path)} ({path})")
+            else:
+                manifest['completed'][population] = dict(result, input=path)
+                print(f"Done: {population} ({result['samples']} samples)")
+            _write_manifest(manifest, output_root)
+
+    if manifest['completed']:
+        merged = merge_populations(manifest['completed'], output_root, n_boot=n_boot, seed=seed)
+        manifest['merged'] = os.path.relpath(merged, output_root)
+        _write_manifest(manifest, output_root)
+
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('inputs', nargs='+',
+                        help="yhaplo output directories, haplogroups.*.txt files, or globs of either")
+    parser.add_argument('--output-root', default='populations', help="directory for per-population outputs")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    parser.add_argument('--bootstrap', type=int, default=0,
+                        help="bootstrap replicates for confidence intervals in the merged and diversity tables")
+    parser.add_argument('--seed', type=int, help="random seed for the bootstrap")
+    args = parser.parse_args()
+
+    haplogroup_files = find_haplogroup_files(args.inputs)
+    try:
+        check_population_names(haplogroup_files)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"Analyzing {len(haplogroup_files)} populations...")
+    manifest = run_populations(haplogroup_files, args.output_root, args.workers, args.bootstrap, args.seed)
+
+    print(f"\nCompleted: {len(manifest['completed'])}, failed: {len(manifest['failed'])}")
+    if manifest['merged']:
+        print(f"Cross-population table: {os.path.join(args.output_root, manifest['merged'])}")
+    print(f"Manifest: {os.path.join(args.output_root, 'run_manifest.json')}")
+
+    return manifest
+
+if __name__ == "__main__":
+    manifest = main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Packed samples x SNPs derived-state bit matrix and pairwise shared-derived / discordance counts
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+STATISTICS = ('shared_derived', 'discordance', 'compared')
+# Working memory for one block of pairwise word comparisons
+BLOCK_BYTES = 64 << 20
+
+def _pack(rows, columns, n_samples, n_snps):
+    """Pack (sample, SNP) index pairs into a (samples x words) uint64 bit matrix"""
+    n_bytes = -(-n_snps // 64) * 8
+    packed = np.zeros((n_samples, n_bytes), dtype=np.uint8)
+    columns = np.asarray(columns, dtype=np.int64)
+    np.bitwise_or.at(packed, (np.asarray(rows, dtype=np.int64), columns >> 3),
+                     (np.uint8(128) >> (columns & 7).astype(np.uint8)))
+    return packed.view(np.uint64)
+
+def _pack_bool(states):
+    """Pack a (samples x SNPs) boolean array into a uint64 bit matrix"""
+    packed = np.packbits(states, axis=1)
+    padding = -packed.shape[1] % 8
+    if padding:
+        packed = np.pad(packed, ((0, 0), (0, padding)))
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+def from_detail_files(haplogroup_dir, name='YRI_males_chrY'):
+    """Build the bit matrix from yhaplo's derived/ancestral .snps.detail files
+
+    Each sample block opens with a 4-field header line; the 5-field SNP
+    lines below it are the sample's derived (or ancestral) calls. Only SNPs
+    derived in at least one sample get a column: a SNP no sample carries
+    adds nothing to either shared-derived or discordance counts.
+    Returns a dict with 'samples', 'snps', 'derived' and 'called' (derived
+    or ancestral) packed matrices.
+    """
+    tables = {}
+    for state in ('derived', 'ancestral'):
+        path = os.path.join(haplogroup_dir, f"{state}.snps.detail.{name}.txt")
+        tables[state] = pd.read_csv(path, sep=r'\s+', header=None, usecols=[0, 1, 4],
+                                    names=['Sample', 'SNP', 'Haplogroup', 'Position', 'Mutation'], dtype=str)
+
+    headers = tables['derived']['Mutation'].isna()
+    samples = pd.Index(tables['derived'].loc[headers, 'Sample'].drop_duplicates())
+    derived = tables['derived'][~headers]
+    snp_codes, snps = pd.factorize(derived['SNP'])
+    sample_codes = samples.get_indexer(derived['Sample'])
+
+    ancestral = tables['ancestral'][tables['ancestral']['Mutation'].notna()]
+    anc_snp_codes = snps.get_indexer(ancestral['SNP'])
+    anc_sample_codes = samples.get_indexer(ancestral['Sample'])
+    keep = (anc_snp_codes >= 0) & (anc_sample_codes >= 0)
+
+    derived_bits = _pack(sample_codes, snp_codes, len(samples), len(snps))
+    ancestral_bits = _pack(anc_sample_codes[keep], anc_snp_codes[keep], len(samples), len(snps))
+    return {
+        'samples': list(samples),
+        'snps': list(snps),
+        'derived': derived_bits,
+        'called': derived_bits | ancestral_bits,
+    }
+
+def from_genotypes(genotype_data, reference, batch_size=4096):
+    """Build the bit matrix from a vcf_genotypes subset and a haplogroup_caller reference
+
+    Genotypes are matched to ISOGG SNPs by position and allele, as in
+    haplogroup calling; SNPs derived in no sample are dropped.
+    """
+    from haplogroup_caller import match_sites
+
+    matched = match_sites(genotype_data, reference)
+    genotypes = genotype_data['genotypes'][matched['Site'].to_numpy()]
+    derived_code = matched['Derived_Code'].to_numpy()[:, None]
+    ancestral_code = matched['Ancestral_Code'].to_numpy()[:, None]
+
+    carried = np.zeros(len(matched), dtype=bool)
+    for start in range(0, genotypes.shape[1], batch_size):
+        carried |= (genotypes[:, start:start + batch_size] == derived_code).any(axis=1)
+    genotypes, derived_code, ancestral_code = genotypes[carried], derived_code[carried], ancestral_code[carried]
+
+    derived_parts, called_parts = [], []
+    for start in range(0, genotypes.shape[1], batch_size):
+        batch = genotypes[:, start:start + batch_size]
+        derived = batch == derived_code
+        derived_parts.append(_pack_bool(derived.T))
+        called_parts.append(_pack_bool((derived | (batch == ancestral_code)).T))
+
+    return {
+        'samples': list(genotype_data['samples']),
+        'snps': matched.loc[carried, 'SNP'].tolist(),
+        'derived': np.vstack(derived_parts),
+        'called': np.vstack(called_parts),
+    }
+
+def popcount(words):
+    """Set bits per element of an unsigned integer array"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    table = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+    as_bytes = np.ascontiguousarray(words).view(np.uint8).reshape(*words.shape, words.itemsize)
+    return table[as_bytes].sum(axis=-1, dtype=np.uint8)
+
+def _block_counts(statistic, derived, called, rows, columns, dtype=np.int64):
+    """(len(rows) x len(columns)) counts of one statistic, summing popcounts over the word axis"""
+    d_left, d_right = derived[rows][:, None, :], derived[columns][None, :, :]
+    if statistic == 'shared_derived':
+        words = d_left & d_right
+    else:
+        words = called[rows][:, None, :] & called[columns][None, :, :]
+        if statistic == 'discordance':
+            words &= d_left ^ d_right
+    return popcount(words).sum(axis=2, dtype=dtype)
+
+def _count_dtype(matrix):
+    # Counts never exceed the number of SNP columns
+    return np.uint16 if len(matrix['snps']) < 1 << 16 else np.uint32
+
+def condensed_index(n_samples, i, j):
+    """Position of pair (i, j), i != j, in a condensed (scipy pdist-order) matrix"""
+    i, j = min(i, j), max(i, j)
+    return n_samples * i - i * (i + 1) // 2 + (j - i - 1)
+
+def pairwise_counts(matrix, statistics=STATISTICS, out=None, block_bytes=BLOCK_BYTES):
+    """Condensed pairwise counts for every sample pair, in blocks of vectorized popcounts
+
+    shared_derived counts SNPs derived in both samples, compared SNPs
+    called (derived or ancestral) in both, and discordance SNPs called in
+    both but derived in only one, i.e. the mutations on the tree path
+    between the two samples. Samples are processed in strips of rows
+    against column blocks sized to block_bytes, so memory is independent
+    of the cohort size apart from the outputs; out may map statistic names
+    to preallocated (e.g. memory-mapped) condensed arrays.
+    Returns a dict mapping each statistic to its condensed array.
+    """
+    derived, called = matrix['derived'], matrix['called']
+    n_samples, n_words = derived.shape
+    n_pairs = n_samples * (n_samples - 1) // 2
+    dtype = _count_dtype(matrix)
+    out = out or {}
+    for statistic in statistics:
+        if statistic not in out:
+            out[statistic] = np.zeros(n_pairs, dtype=dtype)
+
+    block = max(1, int(np.sqrt(block_bytes / (8 * max(n_words, 1)))))
+    for row_start in range(0, n_samples - 1, block):
+        rows = np.arange(row_start, min(row_start + block, n_samples - 1))
+        for statistic in statistics:
+            strip = np.concatenate([
+                _block_counts(statistic, derived, called, rows,
+                              np.arange(col_start, min(col_start + block, n_samples)), dtype)
+                for col_start in range(row_start, n_samples, block)], axis=1)
+            target = out[statistic]
+            for k, i in enumerate(rows):
+                offset = condensed_index(n_samples, i, i + 1)
+                target[offset:offset + n_samples - i - 1] = strip[k, i - row_start + 1:]
+
+    return out
+
+def distance_fraction(counts):
+    """Discordant share of the SNPs both samples were called at (NaN where none were)"""
+    compared = counts['compared'].astype(np.float32)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(compared > 0, counts['discordance'] / compared, np.nan).astype(np.float32)
+
+def write_pairwise(matrix, output_dir, statistics=STATISTICS, block_bytes=BLOCK_BYTES):
+    """Write samples.txt and one memory-mapped <statistic>.npy condensed matrix per statistic"""
+    os.makedirs(output_dir, exist_ok=True)
+    n_samples = len(matrix['samples'])
+    dtype = _count_dtype(matrix)
+    paths = {statistic: os.path.join(output_dir, f"{statistic}.npy") for statistic in statistics}
+    out = {statistic: np.lib.format.open_memmap(path, mode='w+', dtype=dtype,
+                                                shape=(n_samples * (n_samples - 1) // 2,))
+           for statistic, path in paths.items()}
+    pairwise_counts(matrix, statistics, out, block_bytes)
+    for array in out.values():
+        array.flush()
+
+    paths['samples'] = os.path.join(output_dir, 'samples.txt')
+    with open(paths['samples'], 'w') as f:
+        f.write('\n'.join(matrix['samples']) + '\n')
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('source', nargs='?', default='yri_haplogroups',
+                        help="yhaplo --all_aux_output directory, or a <name>.genotypes.npz file")
+    parser.add_argument('--name', default='YRI_males_chrY', help="yhaplo run name of the detail files")
+    parser.add_argument('--reference-dir', default='yri_haplogroups',
+                        help="tree and ISOGG tables used to match genotypes (for .npz sources)")
+    parser.add_argument('--output-dir', default='pairwise')
+    parser.add_argument('--statistics', nargs='+', choices=STATISTICS, default=list(STATISTICS))
+    args = parser.parse_args()
+
+    if args.source.endswith('.npz'):
+        from haplogroup_caller import load_reference
+        from vcf_genotypes import load_genotypes
+        matrix = from_genotypes(load_genotypes(args.source), load_reference(args.reference_dir))
+    else:
+        matrix = from_detail_files(args.source, args.name)
+
+    print(f"Bit matrix: {len(matrix['samples'])} samples x {len(matrix['snps'])} SNPs "
+          f"({matrix['derived'].nbytes + matrix['called'].nbytes} bytes packed)")
+    paths = write_pairwise(matrix, args.output_dir, args.statistics)
+    print("Condensed pairwise matrices (scipy pdist order):")
+    for path in paths.values():
+        print(f"- {path}")
+
+    return matrix, paths
+
+if __name__ == "__main__":
+    matrix, paths = main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Convert yhaplo per-sample SNP detail files into columnar Parquet tables
+"""
+
+import argparse
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+STATES = ('derived', 'ancestral')
+BATCH_ROWS = 250_000
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("snp_detail_store requires pyarrow (pip install pyarrow)")
+
+def detail_file(haplogroup_dir, state, name):
+    """Path of yhaplo's <state>.snps.detail.<name>.txt"""
+    return os.path.join(haplogroup_dir, f"{state}.snps.detail.{name}.txt")
+
+def counts_file(haplogroup_dir, name):
+    """Path of yhaplo's counts.anc_der.<name>.txt"""
+    return os.path.join(haplogroup_dir, f"counts.anc_der.{name}.txt")
+
+def _detail_schema():
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('sample', dictionary),
+        ('snp', dictionary),
+        ('haplogroup', dictionary),
+        ('position', pa.int64()),
+        ('mutation', dictionary),
+    ])
+
+def _counts_schema():
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('sample', dictionary),
+        ('haplogroup', dictionary),
+        ('ancestral', pa.int32()),
+        ('derived', pa.int32()),
+    ])
+
+def _batch(schema, columns):
+    """Build a dictionary-encoded record batch from plain Python column lists"""
+    arrays = []
+    for field, values in zip(schema, columns):
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values, pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def _iter_detail_rows(path):
+    """Yield (sample, snp, haplogroup, position, mutation) from a ragged detail file
+
+    Each sample block opens with a 4-field header line (sample, terminal SNP,
+    representative SNP, haplogroup) followed by one 5-field line per SNP;
+    only the SNP lines are data.
+    """
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) == 5:
+                yield fields[0], fields[1], fields[2], int(fields[3]), fields[4]
+
+def iter_anc_der_counts(path):
+    """Yield (sample, haplogroup, ancestral, derived) from counts.anc_der.*"""
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) == 4:
+                yield fields[0], fields[1], int(fields[2]), int(fields[3])
+
+def _write_rows(rows, schema, output_file, batch_rows):
+    """Stream rows into a Parquet file one row group per batch"""
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    n_rows = 0
+    with pq.ParquetWriter(output_file, schema, use_dictionary=True, compression='zstd') as writer:
+        columns = [[] for _ in schema]
+        for row in rows:
+            for column, value in zip(columns, row):
+                column.append(value)
+            if len(columns[0]) == batch_rows:
+                writer.write_batch(_batch(schema, columns))
+                n_rows += batch_rows
+                columns = [[] for _ in schema]
+        if columns[0]:
+            writer.write_batch(_batch(schema, columns))
+            n_rows += len(columns[0])
+    return n_rows
+
+def convert_snp_details(haplogroup_dir, output_dir, name='YRI_males_chrY', batch_rows=BATCH_ROWS):
+    """Convert derived/ancestral detail files and anc/der counts to Parquet
+
+    Detail rows go to a hive-partitioned dataset <output_dir>/snp_details/
+    with one state=derived / state=ancestral partition, so a state filter
+    prunes whole files. Counts go to <output_dir>/anc_der_counts.parquet.
+    String columns are dictionary-encoded and files are written one row
+    group per batch_rows rows, so memory stays bounded for large cohorts.
+    Returns a dict of row counts written per table.
+    """
+    _require_pyarrow()
+    written = {}
+
+    for state in STATES:
+        source = detail_file(haplogroup_dir, state, name)
+        output_file = os.path.join(output_dir, 'snp_details', f"state={state}", f"{name}.parquet")
+        written[state] = _write_rows(_iter_detail_rows(source), _detail_schema(), output_file, batch_rows)
+
+    output_file = os.path.join(output_dir, 'anc_der_counts.parquet')
+    written['counts'] = _write_rows(iter_anc_der_counts(counts_file(haplogroup_dir, name)),
+                                    _counts_schema(), output_file, batch_rows)
+
+    return written
+
+def _filter(**values):
+    """AND together equality / membership predicates, skipping unset ones"""
+    expression = None
+    for column, value in values.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            predicate = ds.field(column).isin(list(value))
+        else:
+            predicate = ds.field(column) == value
+        expression = predicate if expression is None else expression & predicate
+    return expression
+
+def load_snp_details(store_dir, state=None, snp=None, sample=None, haplogroup=None, columns=None):
+    """Load SNP detail rows as a DataFrame, pushing filters down into the Parquet scan
+
+    state, snp, sample and haplogroup each accept a single value or a list.
+    The state filter prunes partitions; the others are evaluated against
+    row-group statistics and dictionary pages before rows are materialized.
+    """
+    _require_pyarrow()
+    dataset = ds.dataset(os.path.join(store_dir, 'snp_details'), format='parquet', partitioning='hive')
+    expression = _filter(state=state, snp=snp, sample=sample, haplogroup=haplogroup)
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+def load_anc_der_counts(store_dir, sample=None, haplogroup=None):
+    """Load per-sample, per-node ancestral/derived counts as a DataFrame"""
+    _require_pyarrow()
+    dataset = ds.dataset(os.path.join(store_dir, 'anc_der_counts.parquet'), format='parquet')
+    return dataset.to_table(filter=_filter(sample=sample, haplogroup=haplogroup)).to_pandas()
+
+def samples_derived_at(store_dir, snp):
+    """Sorted sample IDs carrying the derived allele at an ISOGG SNP"""
+    details = load_snp_details(store_dir, state='derived', snp=snp, columns=['sample'])
+    return sorted(details['sample'].astype(str).unique())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('haplogroup_dir', nargs='?', default='yri_haplogroups',
+                        help="yhaplo --all_aux_output directory")
+    parser.add_argument('--name', default='YRI_males_chrY', help="yhaplo output name (file suffix)")
+    parser.add_argument('--output-dir', default='yri_snp_store', help="Parquet store directory")
+    args = parser.parse_args()
+
+    written = convert_snp_details(args.haplogroup_dir, args.output_dir, args.name)
+    print(f"Parquet store written to {args.output_dir}:")
+    for table, n_rows in written.items():
+        print(f"- {table}: {n_rows} rows")
+
+    return written
+
+if __name__ == "__main__":
+    written = main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Lay out and draw the yhaplo tree pruned to the haplogroups observed in a cohort
+"""
+
+import numpy as np
+from matplotlib.collections import LineCollection
+
+from y_tree import node_lookup
+
+# Occupied nodes labelled by name, largest first; the rest are markers only
+MAX_LABELS = 40
+
+def node_counts(tree, labels):
+    """Samples called at each tree node from a Series of YCC labels
+
+    Returns (counts per node, number of samples whose label is not in the tree).
+    """
+    lookup = node_lookup(tree['names'])
+    label_counts = labels.value_counts()
+    nodes = np.array([lookup.get(label, -1) for label in label_counts.index], dtype=np.int64)
+    placed = nodes >= 0
+    counts = np.bincount(nodes[placed], weights=label_counts.to_numpy()[placed],
+                         minlength=len(tree['parent'])).astype(np.int64)
+    return counts, int(label_counts.to_numpy()[~placed].sum())
+
+def prune_tree(parent, counts):
+    """Reduce the tree to occupied nodes and the branch points between them
+
+    Keeps every node with samples and its ancestors, then collapses
+    unoccupied nodes with a single kept child into the edge above them, so
+    long unbranched chains (E -> E1 -> E1b -> ...) draw as one branch.
+    Node IDs must be in preorder (as parse_newick assigns them).
+    Returns (kept node IDs in preorder, their parent among the kept nodes, -1 for the root).
+    """
+    n_nodes = len(parent)
+    kept = counts > 0
+    for node in range(n_nodes - 1, 0, -1):
+        if kept[node]:
+            kept[parent[node]] = True
+
+    kept_children = np.bincount(parent[1:][kept[1:]], minlength=n_nodes)
+    shown = kept & ((counts > 0) | (kept_children != 1))
+
+    shown_parent = np.full(n_nodes, -1, dtype=np.int64)
+    nearest = np.full(n_nodes, -1, dtype=np.int64)  # nearest shown node at or above each node
+    for node in np.flatnonzero(kept):
+        up = nearest[parent[node]] if node > 0 else -1
+        shown_parent[node] = up
+        nearest[node] = node if shown[node] else up
+
+    nodes = np.flatnonzero(shown)
+    return nodes, shown_parent[nodes]
+
+def tree_layout(nodes, parents, depth, occupied):
+    """Rectangular layout of a pruned tree in one pass each way
+
+    Leaves and occupied nodes take consecutive rows in preorder, so an
+    occupied node sits on its own row just above its descendants; any
+    other internal node sits midway between its first and last child. x is
+    the node's depth in the full tree, i.e. its YCC level. Returns (x, y,
+    lowest y, highest y of the node and its children, position of the
+    parent in nodes) arrays aligned with nodes.
+    """
+    position = {node: i for i, node in enumerate(nodes.tolist())}
+    up = np.array([position.get(p, -1) for p in parents.tolist()], dtype=np.int64)
+    own_row = occupied | (np.bincount(up[up >= 0], minlength=len(nodes)) == 0)
+
+    y = np.zeros(len(nodes))
+    y[own_row] = np.arange(own_row.sum())
+    low = np.where(own_row, y, np.inf)
+    high = np.where(own_row, y, -np.inf)
+    for i in range(len(nodes) - 1, -1, -1):
+        if not own_row[i]:
+            y[i] = (low[i] + high[i]) / 2
+        if up[i] >= 0:
+            low[up[i]] = min(low[up[i]], y[i])
+            high[up[i]] = max(high[up[i]], y[i])
+
+    x = np.asarray(depth, dtype=float)[nodes]
+    return x, y, low, high, up
+
+def draw_tree(ax, tree, counts, max_labels=MAX_LABELS):
+    """Draw the pruned tree on ax: one LineCollection for the branches, one scatter for the samples
+
+    Marker area is proportional to the samples called at a node; the
+    max_labels most populated nodes are named. Returns the number of rows
+    (one per occupied node or leaf) in the drawing.
+    """
+    nodes, parents = prune_tree(np.asarray(tree['parent']), counts)
+    if len(nodes) == 0:
+        ax.text(0.5, 0.5, 'No samples placed on the tree', ha='center', va='center', transform=ax.transAxes)
+        return 0
+    x, y, low, high, up = tree_layout(nodes, parents, tree['depth'], counts[nodes] > 0)
+
+    child = np.flatnonzero(up >= 0)
+    internal = np.flatnonzero(low != high)
+    horizontal = np.stack([np.column_stack([x[up[child]], y[child]]), np.column_stack([x[child], y[child]])], axis=1)
+    vertical = np.stack([np.column_stack([x[internal], low[internal]]),
+                         np.column_stack([x[internal], high[internal]])], axis=1)
+    ax.add_collection(LineCollection(np.concatenate([horizontal, vertical]), colors='0.35', linewidths=0.8))
+
+    occupied = np.flatnonzero(counts[nodes] > 0)
+    sizes = counts[nodes][occupied]
+    ax.scatter(x[occupied], y[occupied], s=20 + 180 * sizes / sizes.max(), c=sizes, cmap='viridis',
+               edgecolors='black', linewidths=0.4, zorder=3)
+
+    labelled = occupied[np.argsort(-sizes, kind='stable')[:max_labels]]
+    for i in labelled:
+        ax.annotate(f"{tree['names'][nodes[i]]} (n={counts[nodes[i]]})", (x[i], y[i]), xytext=(6, 0),
+                    textcoords='offset points', fontsize=8, va='center')
+
+    n_rows = int(y.max()) + 1
+    ax.set_xlim(x.min() - 0.5, x.max() + 4)
+    ax.set_ylim(n_rows, -1)
+    ax.set_xlabel('Tree depth (YCC level)')
+    ax.set_yticks([])
+    for side in ('left', 'right', 'top'):
+        ax.spines[side].set_visible(False)
+    return n_rows
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Stream chrY genotypes from a bgzipped multi-sample VCF into compact NumPy matrices
+"""
+
+import argparse
+import glob
+import gzip
+import os
+
+import numpy as np
+
+MISSING = -1
+# Genotypes are stored as int8; larger allele indices are rejected rather than wrapped
+MAX_ALLELE_INDEX = np.iinfo(np.int8).max
+
+# Byte -> allele index lookup for single-character GT calls ('0'-'9', '.' is missing)
+_ALLELE_LOOKUP = np.full(256, MISSING, dtype=np.int8)
+_ALLELE_LOOKUP[np.frombuffer(b'0123456789', dtype=np.uint8)] = np.arange(10, dtype=np.int8)
+
+def _open_vcf(vcf_file):
+    """Open a plain or (b)gzipped VCF in binary mode"""
+    with open(vcf_file, 'rb') as f:
+        magic = f.read(2)
+    return gzip.open(vcf_file, 'rb') if magic == b'\x1f\x8b' else open(vcf_file, 'rb')
+
+def read_vcf_samples(vcf_file):
+    """Return the sample IDs from the VCF #CHROM header line"""
+    with _open_vcf(vcf_file) as vcf:
+        for line in vcf:
+            if line.startswith(b'#CHROM'):
+                return line.rstrip(b'\r\n').decode().split('\t')[9:]
+    raise ValueError(f"No #CHROM header line found in {vcf_file}")
+
+def read_sample_list(sample_file):
+    """Read a one-ID-per-line sample list (as written by extract_yri_males.py)"""
+    with open(sample_file) as f:
+        return [line.strip() for line in f if line.strip()]
+
+def _decode_gt_field(field):
+    """Allele index of the first allele in one sample's FORMAT field"""
+    allele = field.split(b':', 1)[0].replace(b'|', b'/').split(b'/', 1)[0]
+    if allele in (b'.', b''):
+        return MISSING
+    index = int(allele)
+    if index > MAX_ALLELE_INDEX:
+        raise ValueError(f"Allele index {index} in GT field {field.decode()!r} exceeds the int8 "
+                         f"genotype range (max {MAX_ALLELE_INDEX})")
+    return index
+
+def _decode_row(genotype_text, format_is_gt, n_samples, columns):
+    """Decode the GT calls of the selected columns from one VCF record"""
+    # Haploid chrY records with a bare GT format are fixed width ("0\t1\t.\t..."),
+    # so every call sits at an even byte offset and decodes without splitting
+    if format_is_gt and len(genotype_text) == 2 * n_samples - 1:
+        calls = np.frombuffer(genotype_text, dtype=np.uint8)[0::2]
+        return _ALLELE_LOOKUP[calls[columns]]
+
+    fields = genotype_text.split(b'\t')
+    return np.array([_decode_gt_field(fields[c]) for c in columns], dtype=np.int8)
+
+def read_genotypes(vcf_file, subsets, chunk_size=8192):
+    """Decode GT calls for several sample subsets in a single pass over the VCF
+
+    subsets maps a subset name (e.g. a population) to a list of sample IDs.
+    Only the union of the requested sample columns is decoded; each subset is
+    sliced out of that matrix at the end, so the VCF is decompressed once no
+    matter how many populations are requested.
+
+    Returns a dict mapping each subset name to a dict with 'samples',
+    'positions', 'ids', 'ref', 'alt' and 'genotypes', where genotypes is an
+    int8 (sites x samples) matrix of allele indices with -1 for missing calls;
+    a call with an allele index above MAX_ALLELE_INDEX raises ValueError.
+    The site arrays are shared between subsets.
+    """
+    vcf_samples = read_vcf_samples(vcf_file)
+    column_of = {sample_id: i for i, sample_id in enumerate(vcf_samples)}
+
+    for name, sample_ids in subsets.items():
+        missing = [s for s in sample_ids if s not in column_of]
+        if missing:
+            raise KeyError(f"{len(missing)} samples in subset {name!r} are not in {vcf_file}: {missing[:5]}")
+
+    union_columns = np.array(sorted({column_of[s] for ids in subsets.values() for s in ids}),
+                             dtype=np.int64)
+    union_index = {column: i for i, column in enumerate(union_columns)}
+    n_samples = len(vcf_samples)
+
+    positions, ids, refs, alts = [], [], [], []
+    chunks = []
+    chunk = np.empty((chunk_size, len(union_columns)), dtype=np.int8)
+    filled = 0
+
+    with _open_vcf(vcf_file) as vcf:
+        for line in vcf:
+            if line.startswith(b'#'):
+                continue
+            fields = line.rstrip(b'\r\n').split(b'\t', 9)
+            positions.append(int(fields[1]))
+            ids.append(fields[2].decode())
+            refs.append(fields[3].decode())
+            alts.append(fields[4].decode())
+
+            try:
+                chunk[filled] = _decode_row(fields[9], fields[8] == b'GT', n_samples, union_columns)
+            except ValueError as error:
+                raise ValueError(f"{vcf_file}, position {positions[-1]}: {error}") from None
+            filled += 1
+            if filled == chunk_size:
+                chunks.append(chunk)
+                chunk = np.empty((chunk_size, len(union_columns)), dtype=np.int8)
+                filled = 0
+
+    chunks.append(chunk[:filled])
+    genotypes = np.concatenate(chunks)
+
+    site_data = {
+        'positions': np.array(positions, dtype=np.int64),
+        'ids': np.array(ids),
+        'ref': np.array(refs),
+        'alt': np.array(alts),
+    }
+
+    results = {}
+    for name, sample_ids in subsets.items():
+        idx = [union_index[column_of[s]] for s in sample_ids]
+        results[name] = dict(site_data, samples=list(sample_ids), genotypes=genotypes[:, idx])
+
+    return results
+
+def save_genotypes(genotype_data, output_file):
+    """Save one subset returned by read_genotypes() as a compressed .npz"""
+    np.savez_compressed(output_file,
+                        samples=np.array(genotype_data['samples']),
+                        positions=genotype_data['positions'],
+                        ids=genotype_data['ids'],
+                        ref=genotype_data['ref'],
+                        alt=genotype_data['alt'],
+                        genotypes=genotype_data['genotypes'])
+
+def load_genotypes(npz_file):
+    """Load a subset saved with save_genotypes()"""
+    with np.load(npz_file) as data:
+        genotype_data = {key: data[key] for key in data.files}
+    genotype_data['samples'] = genotype_data['samples'].tolist()
+    return genotype_data
+
+def subset_name(sample_file):
+    """Subset name for a sample list file: yri_male_samples.txt -> yri_male"""
+    stem = os.path.basename(sample_file).split('.')[0]
+    return stem[:-len('_samples')] if stem.endswith('_samples') else stem
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('vcf_file', help="bgzipped multi-sample chrY VCF")
+    parser.add_argument('sample_lists', nargs='+',
+                        help="sample list files or globs (one subset per file)")
+    parser.add_argument('--output-dir', default='.', help="directory for <subset>.genotypes.npz files")
+    args = parser.parse_args()
+
+    sample_files = sorted({path for pattern in args.sample_lists for path in glob.glob(pattern)})
+    subsets = {subset_name(path): read_sample_list(path) for path in sample_files}
+
+    print(f"Reading {len(subsets)} sample subsets from {args.vcf_file}...")
+    results = read_genotypes(args.vcf_file, subsets)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for name, genotype_data in results.items():
+        output_file = os.path.join(args.output_dir, f"{name}.genotypes.npz")
+        save_genotypes(genotype_data, output_file)
+        n_sites, n_samples = genotype_data['genotypes'].shape
+        print(f"- {output_file}: {n_sites} sites x {n_samples} samples")
+
+    return results
+
+if __name__ == "__main__":
+    results = main()
@@ -3,29 +3,58 @@
 Create visualizations for YRI Y-chromosome haplogroup analysis
 """
 
+import argparse
+import hashlib
+import inspect
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import pandas as pd
 import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
 import seaborn as sns
 from matplotlib.patches import Wedge
 import matplotlib.patches as mpatches
 
-# Set style and color palette
-plt.style.use('default')
-sns.set_palette("husl")
+import lineage_encoder
+import tree_plot
+import y_tree
+from analyze_yri_haplogroups import result_paths
+from lineage_encoder import descends_from, encode_lineages, level_counts
+from tree_plot import draw_tree, node_counts
+from y_tree import load_tree, tree_file
+
+# Style and color palette the figures are rendered with
+PLOT_STYLE = 'default'
+PALETTE = 'husl'
+
+def init_renderer():
+    """Switch to the Agg backend and set the figure style and palette
+
+    Called by main() and in each render worker rather than at import, so
+    importing this module (e.g. from a notebook) leaves the caller's
+    backend and style alone.
+    """
+    plt.switch_backend('Agg')
+    plt.style.use(PLOT_STYLE)
+    sns.set_palette(PALETTE)
 
-def load_analysis_data():
+def load_analysis_data(data_dir='.', prefix='yri'):
     """Load the analyzed haplogroup data"""
-    df = pd.read_csv('yri_haplogroups_analyzed.csv')
-    major_freq = pd.read_csv('yri_major_haplogroup_frequencies.csv')
-    ycc_freq = pd.read_csv('yri_ycc_haplogroup_frequencies.csv')
-    terminal_freq = pd.read_csv('yri_terminal_snp_frequencies.csv')
-    e1_freq = pd.read_csv('yri_e_subclade_l1_frequencies.csv')
-    e2_freq = pd.read_csv('yri_e_subclade_l2_frequencies.csv')
+    paths = result_paths(data_dir, prefix)
+    df = pd.read_csv(paths['analyzed'])
+    major_freq = pd.read_csv(paths['major'])
+    ycc_freq = pd.read_csv(paths['ycc'])
+    terminal_freq = pd.read_csv(paths['terminal_snp'])
+    e1_freq = pd.read_csv(paths['e1'])
+    e2_freq = pd.read_csv(paths['e2'])
     
     return df, major_freq, ycc_freq, terminal_freq, e1_freq, e2_freq
 
-def create_ycc_haplogroup_pie_chart(ycc_freq):
+def create_ycc_haplogroup_pie_chart(ycc_freq, output_file='yri_ycc_haplogroup_pie_chart.png', dpi=300,
+                                    population='YRI'):
     """Create pie chart of YCC haplogroup distribution"""
     fig, ax = plt.subplots(figsize=(12, 10))
     
@@ -53,14 +82,14 @@ def create_ycc_haplogroup_pie_chart(ycc_freq):
         autotext.set_color('white')
         autotext.set_fontweight('bold')
     
-    ax.set_title('YRI Y-Chromosome Haplogroup Distribution\n(n=52 males)', 
+    ax.set_title(f'{population} Y-Chromosome Haplogroup Distribution\n(n={int(ycc_freq["Count"].sum())} males)', 
                  fontsize=16, fontweight='bold', pad=20)
     
     plt.tight_layout()
-    plt.savefig('yri_ycc_haplogroup_pie_chart.png', dpi=300, bbox_inches='tight')
+    plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
     plt.close()
 
-def create_haplogroup_bar_chart(ycc_freq):
+def create_haplogroup_bar_chart(ycc_freq, output_file='yri_haplogroup_bar_chart.png', dpi=300, population='YRI'):
     """Create horizontal bar chart of haplogroup frequencies"""
     fig, ax = plt.subplots(figsize=(12, 8))
     
@@ -76,7 +105,7 @@ def create_haplogroup_bar_chart(ycc_freq):
     ax.set_yticklabels(top_hgs['YCC_Haplogroup'])
     ax.set_xlabel('Number of Individuals', fontsize=12, fontweight='bold')
     ax.set_ylabel('Y-Chromosome Haplogroup', fontsize=12, fontweight='bold')
-    ax.set_title('Top 10 Y-Chromosome Haplogroups in YRI Population', 
+    ax.set_title(f'Top 10 Y-Chromosome Haplogroups in {population} Population', 
                  fontsize=14, fontweight='bold', pad=20)
     
     # Add count labels on bars
@@ -85,31 +114,30 @@ def create_haplogroup_bar_chart(ycc_freq):
         ax.text(width + 0.1, bar.get_y() + bar.get_height()/2, 
                 f'{int(width)}', ha='left', va='center', fontweight='bold')
     
-    # Add percentage labels
-    total = top_hgs['Count'].sum()
+    # Add percentage labels (share of all samples, as in the frequency table)
     for i, (idx, row) in enumerate(top_hgs.iterrows()):
-        pct = (row['Count'] / 52) * 100
+        pct = row['Percentage']
         ax.text(row['Count']/2, i, f'{pct:.1f}%', 
                 ha='center', va='center', color='white', fontweight='bold')
     
     ax.grid(axis='x', alpha=0.3)
     plt.tight_layout()
-    plt.savefig('yri_haplogroup_bar_chart.png', dpi=300, bbox_inches='tight')
+    plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
     plt.close()
 
-def create_e_subclade_analysis(df):
+def create_e_subclade_analysis(df, output_file='yri_e_subclade_analysis.png', dpi=300, population='YRI'):
     """Create detailed analysis of E subclade structure"""
     fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(16, 12))
+    lineages = encode_lineages(df['YCC_Haplogroup'])
     
     # E1 vs E2 distribution
-    e_major = df['YCC_Haplogroup'].str.extract(r'(E\d+)')[0].value_counts()
+    e_major = level_counts(lineages, 1, mask=descends_from(lineages, 'E'))
     ax1.pie(e_major.values, labels=e_major.index, autopct='%1.1f%%', 
             startangle=90, colors=['#ff9999', '#66b3ff'])
     ax1.set_title('E1 vs E2 Distribution', fontsize=12, fontweight='bold')
     
-    # E1b subclades
-    e1b_samples = df[df['YCC_Haplogroup'].str.contains('E1b', na=False)]
-    e1b_subclades = e1b_samples['YCC_Haplogroup'].str.extract(r'(E1b\d+[a-z]+\d+[a-z]+\d+)')[0].value_counts()
+    # E1b subclades, at the E1b1a1a1 level (level 7: E, E1, E1b, E1b1, E1b1a, E1b1a1, E1b1a1a, E1b1a1a1)
+    e1b_subclades = level_counts(lineages, 7, mask=descends_from(lineages, 'E1b'))
     
     if len(e1b_subclades) > 0:
         ax2.bar(range(len(e1b_subclades)), e1b_subclades.values, 
@@ -120,7 +148,7 @@ def create_e_subclade_analysis(df):
         ax2.set_ylabel('Count')
     
     # E1a subclades
-    e1a_samples = df[df['YCC_Haplogroup'].str.contains('E1a', na=False)]
+    e1a_samples = df[descends_from(lineages, 'E1a')]
     e1a_subclades = e1a_samples['YCC_Haplogroup'].value_counts()
     
     if len(e1a_subclades) > 0:
@@ -140,81 +168,35 @@ def create_e_subclade_analysis(df):
     ax4.set_title('Top Terminal SNPs', fontsize=12, fontweight='bold')
     ax4.set_xlabel('Count')
     
-    plt.suptitle('Detailed E Haplogroup Subclade Analysis in YRI Population', 
+    plt.suptitle(f'Detailed E Haplogroup Subclade Analysis in {population} Population', 
                  fontsize=16, fontweight='bold', y=0.98)
     plt.tight_layout()
-    plt.savefig('yri_e_subclade_analysis.png', dpi=300, bbox_inches='tight')
+    plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
     plt.close()
 
-def create_phylogenetic_tree_visualization(df):
-    """Create a simplified phylogenetic tree visualization"""
+def create_phylogenetic_tree_visualization(df, tree, output_file='yri_phylogenetic_tree.png', dpi=300,
+                                           population='YRI'):
+    """Draw the yhaplo tree pruned to the haplogroups observed in the cohort"""
     fig, ax = plt.subplots(figsize=(14, 10))
     
-    # Define hierarchical structure
-    haplogroups = df['YCC_Haplogroup'].value_counts()
-    
-    # Create a simplified tree structure
-    y_positions = {}
-    colors = {}
-    
-    # E root
-    ax.text(0, 0.5, 'E', fontsize=16, fontweight='bold', ha='center', va='center',
-            bbox=dict(boxstyle="round,pad=0.3", facecolor='lightblue'))
-    
-    # E1 and E2 branches
-    ax.plot([0.1, 0.3], [0.5, 0.7], 'k-', linewidth=2)
-    ax.plot([0.1, 0.3], [0.5, 0.3], 'k-', linewidth=2)
-    
-    ax.text(0.3, 0.7, 'E1', fontsize=14, fontweight='bold', ha='center', va='center',
-            bbox=dict(boxstyle="round,pad=0.3", facecolor='lightgreen'))
-    ax.text(0.3, 0.3, 'E2', fontsize=14, fontweight='bold', ha='center', va='center',
-            bbox=dict(boxstyle="round,pad=0.3", facecolor='lightcoral'))
-    
-    # E1a and E1b branches
-    ax.plot([0.4, 0.6], [0.7, 0.8], 'k-', linewidth=2)
-    ax.plot([0.4, 0.6], [0.7, 0.6], 'k-', linewidth=2)
-    
-    ax.text(0.6, 0.8, 'E1a', fontsize=12, fontweight='bold', ha='center', va='center',
-            bbox=dict(boxstyle="round,pad=0.3", facecolor='lightyellow'))
-    ax.text(0.6, 0.6, 'E1b', fontsize=12, fontweight='bold', ha='center', va='center',
-            bbox=dict(boxstyle="round,pad=0.3", facecolor='lightpink'))
-    
-    # Add sample counts
-    e1_count = len(df[df['YCC_Haplogroup'].str.contains('E1', na=False)])
-    e2_count = len(df[df['YCC_Haplogroup'].str.contains('E2', na=False)])
-    e1a_count = len(df[df['YCC_Haplogroup'].str.contains('E1a', na=False)])
-    e1b_count = len(df[df['YCC_Haplogroup'].str.contains('E1b', na=False)])
-    
-    ax.text(0.3, 0.65, f'n={e1_count}', fontsize=10, ha='center', va='center')
-    ax.text(0.3, 0.25, f'n={e2_count}', fontsize=10, ha='center', va='center')
-    ax.text(0.6, 0.75, f'n={e1a_count}', fontsize=10, ha='center', va='center')
-    ax.text(0.6, 0.55, f'n={e1b_count}', fontsize=10, ha='center', va='center')
-    
-    # Add major subclades
-    major_subclades = ['E1b1a1a1c1a1', 'E1b1a1a1d1a', 'E1b1a1a1d1', 'E1b1a1a1c1a1c']
-    y_pos = [0.45, 0.35, 0.25, 0.15]
-    
-    for i, subclade in enumerate(major_subclades):
-        if subclade in haplogroups.index:
-            count = haplogroups[subclade]
-            ax.plot([0.7, 0.9], [0.6, y_pos[i]], 'k-', linewidth=1)
-            ax.text(0.9, y_pos[i], f'{subclade}\n(n={count})', fontsize=9, 
-                   ha='left', va='center',
-                   bbox=dict(boxstyle="round,pad=0.2", facecolor='wheat'))
-    
-    ax.set_xlim(-0.1, 1.3)
-    ax.set_ylim(0, 1)
-    ax.set_title('Simplified Y-Chromosome Phylogenetic Tree for YRI Population', 
-                 fontsize=16, fontweight='bold', pad=20)
-    ax.axis('off')
+    counts, unplaced = node_counts(tree, df['YCC_Haplogroup'])
+    n_rows = draw_tree(ax, tree, counts)
+    # Roughly one text line per row, capped so huge cohorts keep a bounded image size
+    fig.set_size_inches(14, min(max(10, 0.15 * n_rows), 40))
     
-    plt.tight_layout()
-    plt.savefig('yri_phylogenetic_tree.png', dpi=300, bbox_inches='tight')
+    title = f'Y-Chromosome Phylogenetic Tree for {population} Population ({int((counts > 0).sum())} occupied haplogroups)'
+    if unplaced:
+        title += f'\n{unplaced} samples with haplogroups not in the tree are not shown'
+    ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
+    
+    # bbox_inches='tight' already fits the labels; a tight_layout() pass would draw all of them once more
+    plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
     plt.close()
 
-def create_summary_dashboard(df, ycc_freq):
+def create_summary_dashboard(df, ycc_freq, output_file='yri_haplogroup_dashboard.png', dpi=300, population='YRI'):
     """Create a comprehensive summary dashboard"""
     fig = plt.figure(figsize=(20, 12))
+    lineages = encode_lineages(df['YCC_Haplogroup'])
     
     # Create grid layout
     gs = fig.add_gridspec(3, 4, hspace=0.3, wspace=0.3)
@@ -238,19 +220,20 @@ def create_summary_dashboard(df, ycc_freq):
     
     # E subclade breakdown
     ax2 = fig.add_subplot(gs[0, 2])
-    e_major = df['YCC_Haplogroup'].str.extract(r'(E\d+)')[0].value_counts()
+    e_major = level_counts(lineages, 1, mask=descends_from(lineages, 'E'))
     ax2.pie(e_major.values, labels=e_major.index, autopct='%1.1f%%', 
             colors=['#ff9999', '#66b3ff'])
     ax2.set_title('E1 vs E2', fontsize=12, fontweight='bold')
     
     # Sample diversity metrics
     ax3 = fig.add_subplot(gs[1, 2])
+    e_count = int(descends_from(lineages, 'E').sum())
     metrics = [
         f"Total Samples: {len(df)}",
         f"Unique YCC Haplogroups: {df['YCC_Haplogroup'].nunique()}",
         f"Unique Terminal SNPs: {df['Terminal_SNP'].nunique()}",
-        f"E Haplogroup: {len(df[df['YCC_Haplogroup'].str.contains('E', na=False)])} (100%)",
-        f"E1b1a1a1 subclades: {len(df[df['YCC_Haplogroup'].str.contains('E1b1a1a1', na=False)])}"
+        f"E Haplogroup: {e_count} ({100 * e_count / max(len(df), 1):.0f}%)",
+        f"E1b1a1a1 subclades: {int(descends_from(lineages, 'E1b1a1a1').sum())}"
     ]
     
     for i, metric in enumerate(metrics):
@@ -279,39 +262,133 @@ def create_summary_dashboard(df, ycc_freq):
     ax5.axis('off')
     ax5.set_title('Haplogroup Frequency Table', fontsize=12, fontweight='bold', y=0.9)
     
-    plt.suptitle('YRI Y-Chromosome Haplogroup Analysis Dashboard', 
+    plt.suptitle(f'{population} Y-Chromosome Haplogroup Analysis Dashboard', 
                  fontsize=18, fontweight='bold', y=0.98)
     
-    plt.savefig('yri_haplogroup_dashboard.png', dpi=300, bbox_inches='tight')
+    plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
     plt.close()
 
+# Tree yhaplo writes with --all_aux_output, with every ISOGG node
+DEFAULT_TREE_FILE = tree_file('yri_haplogroups', 'aligned.ycc')
+
+# Figure name -> (create_* function, inputs it reads, default output file); inputs are
+# analysis tables (keys of result_paths) or 'tree'
+FIGURES = {
+    'pie_chart': (create_ycc_haplogroup_pie_chart, ['ycc'], 'yri_ycc_haplogroup_pie_chart.png'),
+    'bar_chart': (create_haplogroup_bar_chart, ['ycc'], 'yri_haplogroup_bar_chart.png'),
+    'e_subclades': (create_e_subclade_analysis, ['analyzed'], 'yri_e_subclade_analysis.png'),
+    'phylogenetic_tree': (create_phylogenetic_tree_visualization, ['analyzed', 'tree'], 'yri_phylogenetic_tree.png'),
+    'dashboard': (create_summary_dashboard, ['analyzed', 'ycc'], 'yri_haplogroup_dashboard.png'),
+}
+
+# One cache per prefix, so prefixes rendered into the same directory keep their own hashes
+FIGURE_CACHE = '.figure_cache.{prefix}.json'
+
+# Helper modules whose code shapes every figure, hashed along with each create_* function
+RENDERER_MODULES = (tree_plot, lineage_encoder, y_tree)
+
+def renderer_source():
+    """Code and library versions shared by all figures: helper module sources, style and palette"""
+    parts = [inspect.getsource(module) for module in RENDERER_MODULES]
+    parts.append(f"style={PLOT_STYLE}|palette={PALETTE}|matplotlib={matplotlib.__version__}|seaborn={sns.__version__}")
+    return '\n'.join(parts)
+
+def figure_hash(name, input_files, dpi, population='YRI'):
+    """Hash of a figure's input tables, render parameters and plotting code (including its helpers)"""
+    function = FIGURES[name][0]
+    digest = hashlib.sha256(f"{name}|dpi={dpi}|population={population}".encode())
+    digest.update(inspect.getsource(function).encode())
+    digest.update(renderer_source().encode())
+    for path in input_files:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def load_figure_input(key, path):
+    """A figure input: the Newick tree for 'tree', otherwise an analysis CSV"""
+    return load_tree(path) if key == 'tree' else pd.read_csv(path)
+
+def render_figure(name, input_files, output_file, dpi, population='YRI'):
+    """Worker: load only the tables one figure needs and render it with the Agg backend"""
+    function, inputs, _ = FIGURES[name]
+    tables = [load_figure_input(key, input_files[key]) for key in inputs]
+    function(*tables, output_file=output_file, dpi=dpi, population=population)
+    return name, output_file
+
+def render_figures(data_dir='.', output_dir='.', prefix='yri', figures=None, workers=None,
+                   dpi=300, force=False, tree=DEFAULT_TREE_FILE, population=None):
+    """Render figures in parallel worker processes, skipping those whose inputs are unchanged
+
+    Each figure is keyed on a hash of the CSV tables it reads, its dpi, the
+    population named in its titles, the source of its create_* function and
+    of the helper modules (RENDERER_MODULES) and the plot style; hashes of
+    the last successful renders are kept in <output_dir>/.figure_cache.<prefix>.json.
+    Figures whose hash matches and whose PNG still exists are skipped unless
+    force is set. tree is the yhaplo Newick tree the phylogenetic tree
+    figure prunes; population defaults to the upper-cased prefix.
+    Returns a dict mapping figure name to 'rendered' or 'cached'.
+    """
+    population = population or prefix.upper()
+    paths = dict(result_paths(data_dir, prefix), tree=tree)
+    figures = list(figures or FIGURES)
+    os.makedirs(output_dir, exist_ok=True)
+    cache_file = os.path.join(output_dir, FIGURE_CACHE.format(prefix=prefix))
+
+    cache = {}
+    if os.path.exists(cache_file):
+        with open(cache_file) as f:
+            cache = json.load(f)
+
+    status = {}
+    pending = {}
+    for name in figures:
+        _, inputs, default_output = FIGURES[name]
+        output_file = os.path.join(output_dir, default_output.replace('yri_', f'{prefix}_', 1))
+        input_files = {key: paths[key] for key in inputs}
+        digest = figure_hash(name, input_files.values(), dpi, population)
+        if not force and cache.get(name) == digest and os.path.exists(output_file):
+            status[name] = 'cached'
+        else:
+            pending[name] = (input_files, output_file, digest)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers or min(len(pending), os.cpu_count() or 1),
+                                 initializer=init_renderer) as pool:
+            futures = {pool.submit(render_figure, name, input_files, output_file, dpi, population): name
+                       for name, (input_files, output_file, _) in pending.items()}
+            for future in as_completed(futures):
+                name, output_file = future.result()
+                cache[name] = pending[name][2]
+                status[name] = 'rendered'
+                with open(cache_file, 'w') as f:
+                    json.dump(cache, f, indent=2)
+
+    return status
+
 def main():
     """Create all visualizations"""
-    print("Loading analysis data...")
-    df, major_freq, ycc_freq, terminal_freq, e1_freq, e2_freq = load_analysis_data()
-    
-    print("Creating YCC haplogroup pie chart...")
-    create_ycc_haplogroup_pie_chart(ycc_freq)
-    
-    print("Creating haplogroup bar chart...")
-    create_haplogroup_bar_chart(ycc_freq)
-    
-    print("Creating E subclade analysis...")
-    create_e_subclade_analysis(df)
-    
-    print("Creating phylogenetic tree visualization...")
-    create_phylogenetic_tree_visualization(df)
-    
-    print("Creating summary dashboard...")
-    create_summary_dashboard(df, ycc_freq)
-    
-    print("\nVisualization files created:")
-    print("- yri_ycc_haplogroup_pie_chart.png")
-    print("- yri_haplogroup_bar_chart.png")
-    print("- yri_e_subclade_analysis.png")
-    print("- yri_phylogenetic_tree.png")
-    print("- yri_haplogroup_dashboard.png")
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--data-dir', default='.', help="directory holding the analysis CSVs")
+    parser.add_argument('--output-dir', default='.', help="directory for the PNG files")
+    parser.add_argument('--prefix', default='yri', help="analysis file prefix (population)")
+    parser.add_argument('--population', help="population named in the figure titles (default: PREFIX upper-cased)")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per figure)")
+    parser.add_argument('--force', action='store_true', help="re-render figures even if unchanged")
+    parser.add_argument('--tree', default=DEFAULT_TREE_FILE,
+                        help="yhaplo Newick tree drawn (pruned to observed haplogroups) in the tree figure")
+    args = parser.parse_args()
+    init_renderer()
+    
+    print("Rendering visualizations...")
+    status = render_figures(args.data_dir, args.output_dir, args.prefix,
+                            workers=args.workers, force=args.force, tree=args.tree, population=args.population)
+    
+    print("\nVisualization files:")
+    for name in FIGURES:
+        output_file = FIGURES[name][2].replace('yri_', f'{args.prefix}_', 1)
+        print(f"- {output_file} ({status[name]})")
+    
+    return status
 
 if __name__ == "__main__":
     main()
-
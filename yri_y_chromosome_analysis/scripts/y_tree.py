@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Load the yhaplo Y-chromosome tree (Newick) and ISOGG SNP tables
+"""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+TREE_VERSION = '2016.01.04'
+
+_NEWICK_TOKEN = re.compile(r'[(),;]|[^(),;]+')
+
+def tree_file(haplogroup_dir, kind='ycc', version=TREE_VERSION):
+    """Path of a tree yhaplo writes with --all_aux_output (kind: ycc, hg_snp, aligned.ycc, ...)"""
+    return os.path.join(haplogroup_dir, f"y.tree.{kind}.{version}.nwk")
+
+def isogg_file(haplogroup_dir, table='cleaned', version=TREE_VERSION):
+    """Path of an ISOGG SNP table yhaplo writes (table: cleaned, unique, dropped)"""
+    return os.path.join(haplogroup_dir, f"isogg.snps.{table}.{version}.txt")
+
+def parse_newick(text):
+    """Parse a Newick string into flat preorder node arrays
+
+    Returns a dict with 'names' (list of labels), 'parent' (int32, -1 for the
+    root), 'depth' (int32, root = 0) and 'length' (float64 branch lengths,
+    NaN where the tree has none). Because node IDs are assigned in preorder,
+    every parent ID is smaller than its children's IDs.
+    """
+    names, parents, lengths = [], [], []
+    stack = []
+    closed = None
+    previous = None
+
+    for token in _NEWICK_TOKEN.findall(text.strip()):
+        if token == '(':
+            names.append('')
+            parents.append(stack[-1] if stack else -1)
+            lengths.append(np.nan)
+            stack.append(len(names) - 1)
+        elif token == ')':
+            closed = stack.pop()
+        elif token in (',', ';'):
+            pass
+        else:
+            label, _, length = token.strip().partition(':')
+            if previous == ')':
+                node = closed
+            else:
+                names.append('')
+                parents.append(stack[-1] if stack else -1)
+                lengths.append(np.nan)
+                node = len(names) - 1
+            names[node] = label
+            lengths[node] = float(length) if length else np.nan
+        previous = token
+
+    parent = np.array(parents, dtype=np.int32)
+    depth = np.zeros(len(parent), dtype=np.int32)
+    for node in range(1, len(parent)):
+        depth[node] = depth[parent[node]] + 1
+
+    return {'names': names, 'parent': parent, 'depth': depth,
+            'length': np.array(lengths, dtype=np.float64)}
+
+def load_tree(newick_file):
+    """Load a yhaplo Newick tree file with parse_newick()"""
+    with open(newick_file) as f:
+        return parse_newick(f.read())
+
+def node_lookup(names):
+    """Map haplogroup labels to node IDs
+
+    YCC labels of the form 'R/K2b2a2' are also reachable by each part
+    ('R', 'K2b2a2'), since the ISOGG tables use the short names.
+    """
+    lookup = {}
+    for node, name in enumerate(names):
+        lookup.setdefault(name, node)
+        if '/' in name:
+            for part in name.split('/'):
+                lookup.setdefault(part, node)
+    return lookup
+
+def ancestor_matrix(parent, nodes=None):
+    """Boolean matrix A where A[i, j] is True if nodes[i] is nodes[j] or one of its ancestors
+
+    nodes defaults to every node in the tree.
+    """
+    nodes = np.arange(len(parent)) if nodes is None else np.asarray(nodes)
+    column = np.full(len(parent), -1, dtype=np.int64)
+    column[nodes] = np.arange(len(nodes))
+
+    matrix = np.zeros((len(nodes), len(nodes)), dtype=bool)
+    for j, node in enumerate(nodes):
+        while node >= 0:
+            if column[node] >= 0:
+                matrix[column[node], j] = True
+            node = parent[node]
+    return matrix
+
+def load_isogg_snps(snp_file):
+    """Load an ISOGG SNP table (name, haplogroup, position, mutation)
+
+    Works for the cleaned and unique tables; the mutation column 'C->T' is
+    split into ancestral and derived alleles.
+    """
+    snps = pd.read_csv(snp_file, sep=r'\s+', header=None, usecols=[0, 1, 2, 3],
+                       names=['SNP', 'Haplogroup', 'Position', 'Mutation'],
+                       dtype={'SNP': str, 'Haplogroup': str, 'Position': np.int64, 'Mutation': str})
+    alleles = snps['Mutation'].str.split('->', expand=True)
+    snps['Ancestral'] = alleles[0]
+    snps['Derived'] = alleles[1]
+    return snps
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the analysis scripts; each subcommand imports only what it needs
+"""
+
+import argparse
+import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Subcommand -> (script whose main() it runs, help)
+SUBCOMMANDS = {
+    'extract': ('extract_yri_males', "extract sample lists from a 1000 Genomes panel"),
+    'call': ('haplogroup_caller', "call haplogroups in-process from a genotype matrix"),
+    'analyze': ('analyze_yri_haplogroups', "haplogroup frequency tables and summary"),
+    'plot': ('visualize_yri_haplogroups', "render the figures"),
+    'query': ('results_store', "build or query a memory-mapped results store"),
+}
+
+# Import-time budget per subcommand in ms (cold interpreter, best of a few runs); 'cli' is
+# this module alone, which is all 'analyze --counts-only' loads
+IMPORT_BUDGET_MS = {
+    'cli': 25,
+    'extract': 300,
+    'call': 300,
+    'analyze': 300,
+    'plot': 600,
+    'query': 100,
+}
+
+def count_haplogroups(haplogroup_file):
+    """YCC haplogroup counts from a yhaplo haplogroups file, with the standard library only
+
+    Returns (total samples, [(haplogroup, count)] most frequent first, ties
+    in order of first appearance).
+    """
+    counts = {}
+    with open(haplogroup_file) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) == 4:
+                counts[fields[3]] = counts.get(fields[3], 0) + 1
+    return sum(counts.values()), sorted(counts.items(), key=lambda item: -item[1])
+
+def import_time_ms(module, repeat=3):
+    """Cumulative import time of a module in a fresh interpreter, best of repeat runs
+
+    Measured with python -X importtime, so modules the interpreter loads at
+    startup are not counted. Returns (ms, [(direct import, ms)] heaviest first).
+    """
+    import subprocess
+
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                                cwd=SCRIPT_DIR, capture_output=True, text=True, check=True)
+        total, direct, inside = None, [], False
+        # Children are reported before their parent, one indentation step deeper
+        for line in reversed(result.stderr.splitlines()):
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line.split('|')
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            if depth == 0:
+                if inside:
+                    break
+                if name.strip() == module:
+                    total, inside = int(cumulative) / 1000, True
+            elif inside and depth == 1:
+                direct.append((name.strip(), int(cumulative) / 1000))
+        if total is not None and (best is None or total < best[0]):
+            best = (total, sorted(direct, key=lambda item: -item[1]))
+    return best
+
+def import_report(subcommands=None, repeat=3):
+    """Import time of each subcommand against IMPORT_BUDGET_MS
+
+    Returns a dict mapping subcommand to {'ms', 'budget_ms', 'heaviest'}.
+    """
+    report = {}
+    for name in ['cli'] + list(subcommands or SUBCOMMANDS):
+        module = 'yri_cli' if name == 'cli' else SUBCOMMANDS[name][0]
+        ms, direct = import_time_ms(module, repeat)
+        report[name] = {'ms': round(ms, 1), 'budget_ms': IMPORT_BUDGET_MS[name],
+                        'heaviest': [(package, round(package_ms, 1)) for package, package_ms in direct[:3]]}
+    return report
+
+def run_script(name, script_args):
+    """Import a subcommand's script and run its main() as if invoked with script_args"""
+    import importlib
+
+    sys.path.insert(0, SCRIPT_DIR)
+    module = importlib.import_module(SUBCOMMANDS[name][0])
+    sys.argv = [f"{os.path.basename(sys.argv[0])} {name}"] + script_args
+    return module.main()
+
+def run_analyze(args):
+    if args.counts_only:
+        total, counts = count_haplogroups(args.haplogroup_file)
+        print(f"{'YCC_Haplogroup':25s} {'Count':>7s} {'Percentage':>10s}")
+        for haplogroup, count in counts:
+            print(f"{haplogroup:25s} {count:7d} {100 * count / total:10.2f}")
+        print(f"Total: {total} samples, {len(counts)} YCC haplogroups")
+        return counts
+
+    sys.path.insert(0, SCRIPT_DIR)
+    import analyze_yri_haplogroups
+    if not args.no_qc:
+        import anc_der_qc
+        anc_der_file = args.anc_der or anc_der_qc.anc_der_file_for(args.haplogroup_file)
+        if args.anc_der or os.path.exists(anc_der_file):
+            anc_der_qc.run_qc(anc_der_file, args.output_dir, args.prefix)
+    return analyze_yri_haplogroups.main(args.haplogroup_file, args.output_dir, args.prefix, args.population,
+                                        args.bootstrap)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--import-report', action='store_true',
+                        help="measure each subcommand's import time against its budget and exit "
+                             "(non-zero if any is over)")
+    subparsers = parser.add_subparsers(dest='command', metavar='{' + ','.join(SUBCOMMANDS) + '}')
+
+    for name, (script, help_text) in SUBCOMMANDS.items():
+        if name == 'analyze':
+            continue
+        # Arguments (including -h) are left for the script's own parser
+        subparsers.add_parser(name, help=f"{help_text} (arguments of {script}.py)", add_help=False)
+
+    analyze = subparsers.add_parser('analyze', help=SUBCOMMANDS['analyze'][1])
+    analyze.add_argument('haplogroup_file', nargs='?', default='yri_haplogroups/haplogroups.YRI_males_chrY.txt')
+    analyze.add_argument('--output-dir', default='.')
+    analyze.add_argument('--prefix', default='yri', help="output file prefix")
+    analyze.add_argument('--population', default='YRI')
+    analyze.add_argument('--counts-only', action='store_true',
+                         help="just print YCC haplogroup counts (no pandas; for many short jobs)")
+    analyze.add_argument('--anc-der', help="yhaplo counts.anc_der file to QC the calls with first "
+                                           "(default: the one next to haplogroup_file, if any)")
+    analyze.add_argument('--no-qc', action='store_true', help="skip the call QC")
+    analyze.add_argument('--bootstrap', type=int, default=0,
+                         help="bootstrap replicates for diversity intervals in the summary (default: none)")
+
+    args, extra = parser.parse_known_args(argv)
+    args.script_args = extra
+    if not args.import_report and args.command is None:
+        parser.error("a subcommand is required")
+    if args.command == 'analyze' and args.script_args:
+        parser.error(f"unrecognized arguments: {' '.join(args.script_args)}")
+    return args
+
+def main():
+    args = parse_args()
+
+    if args.import_report:
+        report = import_report([args.command] if args.command else None)
+        over = [name for name, entry in report.items() if entry['ms'] > entry['budget_ms']]
+        print(f"{'subcommand':10s} {'import ms':>9s} {'budget':>7s}  heaviest imports")
+        for name, entry in report.items():
+            heaviest = ', '.join(f"{package} {ms:.0f}" for package, ms in entry['heaviest'])
+            flag = '  OVER BUDGET' if name in over else ''
+            print(f"{name:10s} {entry['ms']:9.1f} {entry['budget_ms']:7d}  {heaviest}{flag}")
+        if over:
+            sys.exit(1)
+        return report
+
+    if args.command == 'analyze':
+        return run_analyze(args)
+    return run_script(args.command, args.script_args)
+
+if __name__ == "__main__":
+    result = main()
@@ -0,0 +1,63 @@
+"""
+Shared fixtures: the checked-in YRI yhaplo run and analysis tables
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+RESULTS_DIR = os.path.join(ROOT, 'results')
+HAPLOGROUP_DIR = os.path.join(RESULTS_DIR, 'yri_haplogroups')
+RUN_NAME = 'YRI_males_chrY'
+
+@pytest.fixture(scope='session')
+def haplogroup_dir():
+    return HAPLOGROUP_DIR
+
+@pytest.fixture(scope='session')
+def haplogroup_file():
+    return os.path.join(HAPLOGROUP_DIR, f"haplogroups.{RUN_NAME}.txt")
+
+@pytest.fixture(scope='session')
+def paths_file():
+    return os.path.join(HAPLOGROUP_DIR, f"paths.{RUN_NAME}.txt")
+
+@pytest.fixture(scope='session')
+def checked_in_paths():
+    """Paths of the checked-in analysis tables, keyed like result_paths()"""
+    from analyze_yri_haplogroups import result_paths
+    return result_paths(RESULTS_DIR, 'yri')
+
+@pytest.fixture(scope='session')
+def analysis_paths(haplogroup_file, tmp_path_factory):
+    """Paths of a fresh in-memory analysis of the checked-in haplogroups file"""
+    import contextlib
+    import io
+
+    import analyze_yri_haplogroups
+    output_dir = str(tmp_path_factory.mktemp('analysis'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyze_yri_haplogroups.main(haplogroup_file, output_dir=output_dir)
+    return analyze_yri_haplogroups.result_paths(output_dir)
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def assert_same_table(actual_file, expected_file):
+    """Same header and rows, with counts in value_counts() order
+
+    Rows with equal counts may come in a different order: the checked-in
+    tables were written by an older pandas, whose value_counts() broke ties
+    differently.
+    """
+    actual = read_bytes(actual_file).decode().splitlines()
+    expected = read_bytes(expected_file).decode().splitlines()
+    assert actual[0] == expected[0]
+    assert sorted(actual[1:]) == sorted(expected[1:])
+    counts = [int(line.split(',')[1]) for line in actual[1:]]
+    assert counts == sorted(counts, reverse=True)
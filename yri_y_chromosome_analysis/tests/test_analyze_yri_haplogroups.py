@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+
+import analyze_yri_haplogroups
+
+def test_findings_come_from_the_tables(analysis_paths):
+    ycc = pd.read_csv(analysis_paths['ycc'])
+    e1 = pd.read_csv(analysis_paths['e1'])
+    with open(analysis_paths['summary']) as f:
+        findings = f.read().split('Key Findings:\n', 1)[1]
+    assert findings.splitlines() == [
+        "- 52/52 (100.0%) belong to haplogroup E",
+        f"- Most common YCC haplogroup: {ycc['YCC_Haplogroup'][0]} ({ycc['Percentage'][0]:.1f}%)",
+        f"- Most common E subclade: {e1['E_Subclade_L1'][0]} ({e1['Percentage_in_E'][0]:.1f}% of haplogroup E)",
+        f"- {len(ycc)} YCC haplogroups and {len(pd.read_csv(analysis_paths['terminal_snp']))} terminal SNPs observed",
+        "",
+    ]
+
+@pytest.mark.parametrize('content', ['', '\n'])
+def test_empty_haplogroup_file_is_rejected(tmp_path, content):
+    empty = tmp_path / 'haplogroups.EMPTY_males_chrY.txt'
+    empty.write_text(content)
+    with pytest.raises(ValueError, match='no EMPTY samples'):
+        analyze_yri_haplogroups.main(str(empty), output_dir=str(tmp_path / 'out'), population='EMPTY')
+
+def test_empty_tables_are_rejected_by_the_summary():
+    empty = pd.DataFrame(columns=['YCC_Haplogroup', 'Count', 'Frequency', 'Percentage'])
+    with pytest.raises(ValueError, match='No YRI samples'):
+        analyze_yri_haplogroups.format_summary(0, 0, empty, empty, empty, empty)
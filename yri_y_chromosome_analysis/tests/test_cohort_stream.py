@@ -0,0 +1,25 @@
+import contextlib
+import io
+
+import pytest
+
+import cohort_stream
+from analyze_yri_haplogroups import RESULT_FILES
+from conftest import read_bytes
+
+@pytest.mark.parametrize('chunk_rows', [1, 7, 52, cohort_stream.CHUNK_ROWS])
+def test_chunked_results_are_byte_identical(haplogroup_file, analysis_paths, tmp_path, chunk_rows):
+    with contextlib.redirect_stdout(io.StringIO()):
+        levels, total, paths = cohort_stream.aggregate_cohort(haplogroup_file, str(tmp_path),
+                                                             chunk_rows=chunk_rows)
+    assert total == 52
+    for key in RESULT_FILES:
+        assert read_bytes(paths[key]) == read_bytes(analysis_paths[key]), key
+
+def test_tables_without_analyzed_csv(haplogroup_file, analysis_paths, tmp_path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, _, paths = cohort_stream.aggregate_cohort(haplogroup_file, str(tmp_path), chunk_rows=7,
+                                                    write_analyzed=False)
+    assert not (tmp_path / RESULT_FILES['analyzed'].format(prefix='yri')).exists()
+    for key in RESULT_FILES.keys() - {'analyzed'}:
+        assert read_bytes(paths[key]) == read_bytes(analysis_paths[key]), key
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import frequency_engine
+from analyze_yri_haplogroups import add_analysis_columns, load_haplogroup_data
+from conftest import assert_same_table
+
+@pytest.fixture(scope='module')
+def analyzed(haplogroup_file):
+    df = load_haplogroup_data(haplogroup_file)
+    add_analysis_columns(df)
+    return df
+
+@pytest.fixture(scope='module')
+def cohort(analyzed):
+    """The YRI samples split into two groups, plus non-E samples to exercise the E denominators"""
+    others = pd.DataFrame({
+        'Sample_ID': ['X1', 'X2', 'X3'],
+        'Terminal_SNP': ['B-M60', 'B-M60', 'A-M91'],
+        'Representative_SNP': ['B-M60', 'B-M60', 'A-M91'],
+        'YCC_Haplogroup': ['B', 'B', 'A'],
+    })
+    add_analysis_columns(others)
+    df = pd.concat([analyzed, others], ignore_index=True)
+    df['Group'] = np.where(np.arange(len(df)) % 2, 'odd', 'even')
+    return df
+
+@pytest.mark.parametrize('key', ['major', 'ycc', 'terminal_snp', 'e1', 'e2'])
+def test_tables_match_checked_in_results(analysis_paths, checked_in_paths, key):
+    assert_same_table(analysis_paths[key], checked_in_paths[key])
+
+@pytest.mark.parametrize('level', list(frequency_engine.STANDARD_LEVELS))
+def test_tables_follow_value_counts(cohort, level):
+    column, e_only = frequency_engine.STANDARD_LEVELS[level]
+    table = frequency_engine.standard_frequency_tables(cohort)[level]
+    values = cohort.loc[cohort['Major_Haplogroup'] == 'E', column] if e_only else cohort[column]
+    expected = values.value_counts()
+    assert list(table['Haplogroup']) == list(expected.index)
+    assert list(table['Count']) == list(expected)
+    np.testing.assert_allclose(table['Frequency'], expected / len(values))
+
+def test_grouped_tables_match_per_group_tables(cohort):
+    grouped = frequency_engine.standard_frequency_tables(cohort, group_by=['Group'])
+    for group, rows in cohort.groupby('Group'):
+        single = frequency_engine.standard_frequency_tables(rows.reset_index(drop=True))
+        for level, table in grouped.items():
+            part = table[table['Group'] == group].drop(columns='Group').reset_index(drop=True)
+            pd.testing.assert_frame_equal(part, single[level])
+
+def test_e_levels_use_e_denominator(cohort):
+    tables = frequency_engine.standard_frequency_tables(cohort)
+    n_e = (cohort['Major_Haplogroup'] == 'E').sum()
+    assert n_e < len(cohort)
+    for level in ('e1', 'e2', 'e3'):
+        table = tables[level]
+        np.testing.assert_allclose(table['Frequency'], table['Count'] / n_e)
+    assert tables['e1']['Count'].sum() == n_e
+
+def test_bootstrap_does_not_depend_on_batch_size(cohort):
+    counts = np.array([[40, 10, 3], [20, 5, 0], [0, 0, 0]])
+    totals = np.array([55, 30, 0])
+    whole = frequency_engine._bootstrap_intervals(counts, totals, 200, 0.95, np.random.default_rng(7))
+    batched = frequency_engine._bootstrap_intervals(counts, totals, 200, 0.95, np.random.default_rng(7),
+                                                    batch_cells=1)
+    for a, b in zip(whole, batched):
+        np.testing.assert_array_equal(a, b)
+
+def test_bootstrap_intervals_bracket_frequencies(cohort):
+    tables = frequency_engine.standard_frequency_tables(cohort, group_by=['Group'], n_boot=200, seed=1)
+    for table in tables.values():
+        assert (table['Frequency_CI_Low'] <= table['Frequency']).all()
+        assert (table['Frequency'] <= table['Frequency_CI_High']).all()
@@ -0,0 +1,102 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import incremental_results
+from analyze_yri_haplogroups import RESULT_FILES
+from conftest import read_bytes
+
+def write_batches(haplogroup_file, directory, sizes):
+    """Split a haplogroups file into consecutive batches of the given sizes"""
+    with open(haplogroup_file) as f:
+        lines = f.readlines()
+    batches, start = [], 0
+    for i, size in enumerate(sizes):
+        path = os.path.join(directory, f"batch{i}.txt")
+        with open(path, 'w') as f:
+            f.writelines(lines[start:start + size])
+        batches.append(path)
+        start += size
+    return batches
+
+@pytest.fixture(scope='module')
+def appended(haplogroup_file, haplogroup_dir, tmp_path_factory):
+    """Results built by appending the YRI samples as 20 + 32, then all 52 again"""
+    root = tmp_path_factory.mktemp('incremental')
+    output_dir = str(root / 'results')
+    anc_der_file = os.path.join(haplogroup_dir, 'counts.anc_der.YRI_males_chrY.txt')
+    accepted = []
+    for batch in write_batches(haplogroup_file, str(root), [20, 32]) + [haplogroup_file]:
+        df, paths = incremental_results.update_results(batch, output_dir, anc_der_file=anc_der_file)
+        accepted.append(len(df))
+    return output_dir, paths, accepted
+
+def test_reappending_is_a_no_op(appended):
+    output_dir, _, accepted = appended
+    assert accepted == [20, 32, 0]
+    state = incremental_results.load_state(output_dir)
+    assert state['n_samples'] == 52
+    assert state['batches'] == 2
+
+@pytest.mark.parametrize('key', list(RESULT_FILES))
+def test_appended_results_are_byte_identical(appended, analysis_paths, key):
+    _, paths, _ = appended
+    assert read_bytes(paths[key]) == read_bytes(analysis_paths[key])
+
+def test_node_tallies_match_a_single_append(appended, haplogroup_file, haplogroup_dir, tmp_path):
+    _, paths, _ = appended
+    anc_der_file = os.path.join(haplogroup_dir, 'counts.anc_der.YRI_males_chrY.txt')
+    _, single = incremental_results.update_results(haplogroup_file, str(tmp_path), anc_der_file=anc_der_file)
+    assert read_bytes(paths['anc_der']) == read_bytes(single['anc_der'])
+
+def test_is_seen():
+    seen = [np.sort(np.array(['NA18486', 'NA19239'])), np.array([], dtype=str), np.array(['NA19189'])]
+    mask = incremental_results.is_seen(['NA19189', 'NA00000', 'NA19239', 'NZ99999'], seen)
+    assert list(mask) == [True, False, True, False]
+    assert not incremental_results.is_seen(['NA19239'], []).any()
+
+def test_old_state_migrates_to_a_shard(appended, tmp_path):
+    output_dir, _, _ = appended
+    state = incremental_results.load_state(output_dir)
+    samples = np.concatenate(incremental_results.load_seen(state, output_dir)).tolist()
+    old = {key: value for key, value in state.items() if key not in ('n_samples', 'batches')}
+    old['samples'] = samples
+    with open(incremental_results.state_path(str(tmp_path)), 'w') as f:
+        json.dump(old, f)
+
+    migrated = incremental_results.load_state(str(tmp_path))
+    assert migrated['n_samples'] == 52 and migrated['batches'] == 1
+    assert incremental_results.is_seen(samples, incremental_results.load_seen(migrated, str(tmp_path))).all()
+
+def test_rerun_after_a_crash_before_the_state_save(haplogroup_file, analysis_paths, tmp_path, monkeypatch):
+    output_dir = str(tmp_path / 'results')
+    first, second = write_batches(haplogroup_file, str(tmp_path), [20, 32])
+    incremental_results.update_results(first, output_dir)
+
+    def crash(*args, **kwargs):
+        raise KeyboardInterrupt
+    with monkeypatch.context() as patch:
+        patch.setattr(incremental_results, 'save_state', crash)
+        with pytest.raises(KeyboardInterrupt):
+            incremental_results.update_results(second, output_dir)
+
+    df, paths = incremental_results.update_results(second, output_dir)
+    assert len(df) == 32
+    for key in RESULT_FILES:
+        assert read_bytes(paths[key]) == read_bytes(analysis_paths[key]), key
+
+def test_shards_are_merged(haplogroup_file, analysis_paths, tmp_path):
+    output_dir = str(tmp_path / 'results')
+    for batch in write_batches(haplogroup_file, str(tmp_path), [2] * 26) + [haplogroup_file]:
+        df, paths = incremental_results.update_results(batch, output_dir)
+    assert len(df) == 0
+
+    state = incremental_results.load_state(output_dir)
+    assert state['batches'] == 26 - incremental_results.MAX_SEEN_SHARDS
+    shard_dir = os.path.dirname(incremental_results.seen_path(output_dir))
+    assert len(os.listdir(shard_dir)) == state['batches']
+    assert sum(len(shard) for shard in incremental_results.load_seen(state, output_dir)) == 52
+    for key in RESULT_FILES:
+        assert read_bytes(paths[key]) == read_bytes(analysis_paths[key]), key
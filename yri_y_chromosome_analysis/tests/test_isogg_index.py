@@ -0,0 +1,42 @@
+import os
+import shutil
+
+import pytest
+
+import isogg_index
+
+@pytest.fixture
+def reference_dir(haplogroup_dir, tmp_path):
+    """Copy of the tree and ISOGG tables whose mtimes the tests may change"""
+    directory = tmp_path / 'reference'
+    directory.mkdir()
+    for path in isogg_index.source_files(haplogroup_dir):
+        shutil.copy2(path, directory)
+    return str(directory)
+
+def test_repeat_loads_skip_hashing(reference_dir, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    first = isogg_index.load_isogg_index(reference_dir, cache_dir)
+
+    def no_hashing(paths):
+        raise AssertionError('source tables were hashed')
+    monkeypatch.setattr(isogg_index, 'content_hash', no_hashing)
+    second = isogg_index.load_isogg_index(reference_dir, cache_dir)
+    assert second['meta'] == first['meta']
+    assert isogg_index.lookup_node(second, 'E1b1a') == isogg_index.lookup_node(first, 'E1b1a') >= 0
+
+def test_touched_sources_are_rehashed_into_the_same_index(reference_dir, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    first = isogg_index.load_isogg_index(reference_dir, cache_dir)
+    tree = isogg_index.source_files(reference_dir)[0]
+    stat = os.stat(tree)
+    os.utime(tree, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert isogg_index.cached_index_dir(reference_dir, cache_dir) is None
+
+    hashed = []
+    content_hash = isogg_index.content_hash
+    monkeypatch.setattr(isogg_index, 'content_hash', lambda paths: hashed.append(paths) or content_hash(paths))
+    second = isogg_index.load_isogg_index(reference_dir, cache_dir)
+    assert len(hashed) == 1
+    assert second['meta']['content_hash'] == first['meta']['content_hash']
+    assert len([name for name in os.listdir(cache_dir) if name.startswith('isogg-') and name != isogg_index.STAT_DIR]) == 1
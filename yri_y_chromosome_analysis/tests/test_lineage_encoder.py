@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import lineage_encoder
+from analyze_yri_haplogroups import add_analysis_columns, load_haplogroup_data
+from conftest import read_bytes
+
+# The regexes the E_Level columns were extracted with before the encoder
+E_LEVEL_PATTERNS = {1: r'(E\d+)', 2: r'(E\d+[a-z]+)', 3: r'(E\d+[a-z]+\d+)'}
+
+@pytest.fixture(scope='module')
+def haplogroups(haplogroup_file):
+    return load_haplogroup_data(haplogroup_file)
+
+@pytest.fixture(scope='module')
+def encoding(haplogroups):
+    return lineage_encoder.encode_lineages(haplogroups['YCC_Haplogroup'])
+
+def test_lineage_chain():
+    assert lineage_encoder.lineage_chain('E1b1a1') == ['E', 'E1', 'E1b', 'E1b1', 'E1b1a', 'E1b1a1']
+    assert lineage_encoder.lineage_chain('E1a2a1b1')[3] == 'E1a2'
+    assert lineage_encoder.lineage_chain('R/K2b2a2') == ['R']
+    assert lineage_encoder.lineage_chain('A0-T') == ['A0-T']
+    assert lineage_encoder.lineage_chain('B') == ['B']
+
+@pytest.mark.parametrize('level', sorted(E_LEVEL_PATTERNS))
+def test_e_levels_match_regex_extraction(haplogroups, encoding, level):
+    labels = haplogroups['YCC_Haplogroup']
+    expected = labels.str.extract(E_LEVEL_PATTERNS[level])[0].where(labels.str[0] == 'E')
+    actual = pd.Series(lineage_encoder.level_labels(encoding, level, major='E'))
+    assert actual.isna().equals(expected.isna())
+    assert (actual[actual.notna()] == expected[expected.notna()]).all()
+
+@pytest.mark.parametrize('level', [0, 1, 2, 3])
+def test_level_counts_match_value_counts(haplogroups, encoding, level):
+    labels = pd.Series(lineage_encoder.level_labels(encoding, level))
+    expected = labels.value_counts()
+    actual = lineage_encoder.level_counts(encoding, level)
+    assert list(actual.index) == list(expected.index)
+    assert list(actual) == list(expected)
+
+def test_descends_from(haplogroups, encoding):
+    labels = haplogroups['YCC_Haplogroup']
+    e1b = np.array([lineage_encoder.lineage_chain(label)[:3] == ['E', 'E1', 'E1b'] for label in labels])
+    assert (lineage_encoder.descends_from(encoding, 'E1b') == e1b).all()
+    assert not lineage_encoder.descends_from(encoding, 'Q1a').any()
+
+def test_analyzed_table_is_byte_identical(analysis_paths, checked_in_paths):
+    assert read_bytes(analysis_paths['analyzed']) == read_bytes(checked_in_paths['analyzed'])
+
+def test_analysis_columns_on_checked_in_samples(haplogroups):
+    df = haplogroups.copy()
+    add_analysis_columns(df)
+    assert len(df) == 52
+    assert (df['Major_Haplogroup'] == 'E').sum() == df['E_Level1'].notna().sum()
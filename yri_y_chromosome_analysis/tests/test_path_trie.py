@@ -0,0 +1,35 @@
+import path_trie
+import pytest
+
+@pytest.fixture(scope='module')
+def paths(paths_file):
+    with open(paths_file) as f:
+        return [path_trie.parse_path_line(line) for line in f if line.strip()]
+
+@pytest.fixture(scope='module')
+def trie(paths_file):
+    return path_trie.load_path_trie(paths_file)
+
+def test_shared_prefixes_stored_once(trie, paths):
+    assert len(trie.samples) == len(paths) == 52
+    assert len(trie.labels) == 37
+    distinct_prefixes = {tuple(label for label, _, _ in steps[:depth])
+                         for _, _, steps in paths for depth in range(len(steps) + 1)}
+    assert len(trie.labels) == len(distinct_prefixes)
+
+def test_sample_paths_round_trip(trie, paths):
+    for sample_id, haplogroup, steps in paths:
+        assert trie.path(sample_id) == [label for label, _, _ in steps]
+
+def test_samples_under_matches_path_scan(trie, paths):
+    for label in set(trie.labels[1:]):
+        expected = {sample_id for sample_id, _, steps in paths if label in {step[0] for step in steps}}
+        assert set(trie.samples_under(label)) == expected
+    assert trie.samples_under('not-a-haplogroup') == []
+
+def test_node_table_tallies(trie, paths):
+    table = trie.node_table()
+    assert table.loc[0, 'Samples'] == len(paths)
+    assert table['Terminal_Samples'].sum() == len(paths)
+    derived_total = sum(count for _, _, steps in paths for _, count, _ in steps)
+    assert table['Derived_SNP_Total'].sum() == derived_total
@@ -0,0 +1,50 @@
+import contextlib
+import io
+import os
+import shutil
+
+import pytest
+
+import pipeline
+from conftest import ROOT
+
+VCF_FILE = os.path.join(ROOT, 'data', 'YRI_males_chrY.vcf.gz')
+
+@pytest.fixture
+def panel_file(tmp_path):
+    """Panel with three YRI males and a population (FEM) that has only females"""
+    with open(os.path.join(ROOT, 'data', 'yri_male_samples.txt')) as f:
+        males = f.read().split()[:3]
+    rows = [f"{sample}\tYRI\tAFR\tmale" for sample in males] + ["F001\tFEM\tAFR\tfemale"]
+    path = tmp_path / 'test.panel'
+    path.write_text('sample\tpop\tsuper_pop\tgender\t\t\n' + '\n'.join(rows) + '\n')
+    return str(path)
+
+def run(stages, work_dir):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return pipeline.run_pipeline(stages, work_dir, workers=2)
+
+def test_population_without_males_does_not_block_the_others(panel_file, haplogroup_dir, tmp_path):
+    work_dir = str(tmp_path / 'work')
+    stages = [stage for stage in pipeline.build_stages(panel_file, VCF_FILE, haplogroup_dir, work_dir,
+                                                       ['FEM', 'YRI'])
+              if not stage['name'].startswith('plot:')]
+    assert run(stages, work_dir) == {'extract': 'ran', 'genotypes': 'ran', 'call:YRI': 'ran', 'analyze:YRI': 'ran',
+                                     'call:FEM': 'empty', 'analyze:FEM': 'empty'}
+    assert set(run(stages, work_dir).values()) == {'skipped', 'empty'}
+
+def test_stage_key_covers_the_scripts_a_stage_imports(tmp_path):
+    stage = {'name': 'analyze:YRI', 'function': pipeline.stage_analyze, 'params': {}, 'inputs': [],
+             'code': pipeline.stage_code_files(pipeline.stage_analyze)}
+    assert os.path.join(pipeline.SCRIPTS_DIR, 'frequency_engine.py') in stage['code']
+    assert os.path.join(pipeline.SCRIPTS_DIR, 'visualize_yri_haplogroups.py') not in stage['code']
+
+    script = tmp_path / 'frequency_engine.py'
+    shutil.copy(os.path.join(pipeline.SCRIPTS_DIR, 'frequency_engine.py'), script)
+    stage['code'] = [str(script)]
+    file_cache = {}
+    key = pipeline.stage_key(stage, file_cache)
+    assert pipeline.stage_key(stage, file_cache) == key
+    with open(script, 'a') as f:
+        f.write('\n# changed\n')
+    assert pipeline.stage_key(stage, file_cache) != key
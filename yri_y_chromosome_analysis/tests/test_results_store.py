@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+import path_trie
+import results_store
+from analyze_yri_haplogroups import load_haplogroup_data
+
+@pytest.fixture(scope='module')
+def store(haplogroup_dir, tmp_path_factory):
+    root = tmp_path_factory.mktemp('store')
+    store_dir = results_store.build_results_store(haplogroup_dir, str(root / 'store'),
+                                                  cache_dir=str(root / 'cache'))
+    return results_store.open_results_store(store_dir)
+
+@pytest.fixture(scope='module')
+def haplogroups(haplogroup_file):
+    return load_haplogroup_data(haplogroup_file)
+
+def test_sample_records_match_haplogroups_file(store, haplogroups):
+    for row in haplogroups.to_dict('records'):
+        record = results_store.sample_record(store, row['Sample_ID'])
+        assert {key: record[key] for key in row} == row
+        assert record['Node'] > 0
+    assert results_store.find_sample(store, 'NA00000') == -1
+    assert results_store.sample_record(store, 'NA00000') is None
+    assert results_store.sample_path(store, 'NA00000') is None
+
+def test_sample_paths_hold_the_derived_snps(store, haplogroup_dir):
+    with open(os.path.join(haplogroup_dir, 'derived.snps.YRI_males_chrY.txt')) as f:
+        lines = [line for line in f if line.strip()]
+    for line in lines:
+        header, _, entries = line.partition('|')
+        sample_id = header.split()[0]
+        steps = results_store.sample_path(store, sample_id)
+        flattened = [f"{label}:{snp}" for label, snps in steps for snp in snps]
+        assert sorted(flattened) == sorted(entries.split())
+
+def test_samples_under_matches_path_trie(store, paths_file):
+    trie = path_trie.load_path_trie(paths_file)
+    labels = set(trie.labels[1:])
+    assert labels
+    for label in labels:
+        assert sorted(results_store.samples_under(store, label)) == sorted(trie.samples_under(label))
+    assert results_store.samples_under(store, 'not-a-haplogroup') == []
+
+def test_rebuild_gives_the_same_arrays(store, haplogroup_dir, tmp_path):
+    rebuilt = results_store.open_results_store(results_store.build_results_store(
+        haplogroup_dir, str(tmp_path / 'store'), cache_dir=str(tmp_path / 'cache')))
+    for name in store['meta']['arrays']:
+        assert (rebuilt[name] == store[name]).all(), name
@@ -0,0 +1,29 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+
+import run_populations
+
+def test_manifest_paths_survive_moving_the_output(haplogroup_file, tmp_path):
+    empty = tmp_path / 'haplogroups.EMPTY_males_chrY.txt'
+    empty.write_text('')
+    output_root = tmp_path / 'populations'
+    with contextlib.redirect_stdout(io.StringIO()):
+        manifest = run_populations.run_populations([haplogroup_file, str(empty)], str(output_root), workers=2)
+
+    assert 'no EMPTY samples' in manifest['failed']['EMPTY']['error']
+    assert not (output_root / 'EMPTY').exists()
+    assert manifest['completed']['YRI']['analyzed'] == os.path.join('YRI', 'yri_haplogroups_analyzed.csv')
+    assert manifest['merged'] == 'cross_population_frequencies.csv'
+
+    moved = tmp_path / 'moved'
+    shutil.move(str(output_root), str(moved))
+    with open(moved / 'run_manifest.json') as f:
+        saved = json.load(f)
+    assert saved == manifest
+    assert (moved / saved['completed']['YRI']['analyzed']).exists()
+    assert (moved / saved['merged']).exists()
+    merged = run_populations.merge_populations(saved['completed'], str(moved))
+    assert os.path.dirname(merged) == str(moved)
@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+import pytest
+
+import snp_bitmatrix
+
+@pytest.fixture(scope='module')
+def matrix(haplogroup_dir):
+    return snp_bitmatrix.from_detail_files(haplogroup_dir)
+
+def read_calls(haplogroup_dir, state):
+    """{sample: set of SNP names} from a .snps.detail file, parsed line by line"""
+    calls = {}
+    with open(os.path.join(haplogroup_dir, f"{state}.snps.detail.YRI_males_chrY.txt")) as f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            calls.setdefault(fields[0], set())
+            if len(fields) == 5:
+                calls[fields[0]].add(fields[1])
+    return calls
+
+def unpack(bits, n_snps):
+    return np.unpackbits(bits.view(np.uint8), axis=1)[:, :n_snps].astype(bool)
+
+def test_bits_match_detail_files(matrix, haplogroup_dir):
+    derived = read_calls(haplogroup_dir, 'derived')
+    ancestral = read_calls(haplogroup_dir, 'ancestral')
+    assert matrix['samples'] == list(derived) and len(derived) == 52
+    assert set(matrix['snps']) == set().union(*derived.values())
+
+    snps = np.array(matrix['snps'])
+    derived_bits = unpack(matrix['derived'], len(snps))
+    called_bits = unpack(matrix['called'], len(snps))
+    for i, sample in enumerate(matrix['samples']):
+        assert set(snps[derived_bits[i]]) == derived[sample]
+        assert set(snps[called_bits[i]]) == derived[sample] | (ancestral[sample] & set(snps))
+
+@pytest.mark.parametrize('block_bytes', [64, 4096, snp_bitmatrix.BLOCK_BYTES])
+def test_pairwise_counts_are_exact(matrix, block_bytes):
+    n_snps = len(matrix['snps'])
+    derived = unpack(matrix['derived'], n_snps).astype(np.int64)
+    called = unpack(matrix['called'], n_snps).astype(np.int64)
+    i, j = np.triu_indices(len(matrix['samples']), 1)
+    expected = {
+        'shared_derived': (derived @ derived.T)[i, j],
+        'compared': (called @ called.T)[i, j],
+        'discordance': (called * derived) @ (called * (1 - derived)).T,
+    }
+    expected['discordance'] = (expected['discordance'] + expected['discordance'].T)[i, j]
+
+    counts = snp_bitmatrix.pairwise_counts(matrix, block_bytes=block_bytes)
+    for statistic in snp_bitmatrix.STATISTICS:
+        np.testing.assert_array_equal(counts[statistic], expected[statistic])
+
+def test_condensed_index_follows_pdist_order():
+    n = 7
+    i, j = np.triu_indices(n, 1)
+    assert [snp_bitmatrix.condensed_index(n, a, b) for a, b in zip(i, j)] == list(range(len(i)))
+    assert snp_bitmatrix.condensed_index(n, 5, 2) == snp_bitmatrix.condensed_index(n, 2, 5)
+
+def test_popcount_table_fallback(matrix):
+    words = matrix['derived']
+    table = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+    by_bytes = table[words.view(np.uint8)].reshape(*words.shape, 8).sum(axis=-1)
+    np.testing.assert_array_equal(snp_bitmatrix.popcount(words), by_bytes)
+
+def test_written_matrices_match_counts(matrix, tmp_path):
+    paths = snp_bitmatrix.write_pairwise(matrix, str(tmp_path), block_bytes=4096)
+    counts = snp_bitmatrix.pairwise_counts(matrix)
+    for statistic in snp_bitmatrix.STATISTICS:
+        np.testing.assert_array_equal(np.load(paths[statistic]), counts[statistic])
+    with open(paths['samples']) as f:
+        assert f.read().split() == matrix['samples']
@@ -0,0 +1,31 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import visualize_yri_haplogroups
+from analyze_yri_haplogroups import result_paths
+from conftest import ROOT
+
+def test_import_keeps_the_callers_backend():
+    code = ("import sys, matplotlib; sys.path.insert(0, sys.argv[1]); matplotlib.use('pdf'); "
+            "import visualize_yri_haplogroups; print(matplotlib.get_backend())")
+    result = subprocess.run([sys.executable, '-c', code, os.path.join(ROOT, 'scripts')],
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'pdf'
+
+def test_prefixes_sharing_an_output_dir_keep_their_cache(analysis_paths, tmp_path):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    for prefix in ('yri', 'esn'):
+        for key, path in result_paths(str(data_dir), prefix).items():
+            shutil.copy(analysis_paths[key], path)
+
+    output_dir = str(tmp_path / 'figures')
+    for expected in ('rendered', 'cached'):
+        for prefix in ('yri', 'esn'):
+            status = visualize_yri_haplogroups.render_figures(str(data_dir), output_dir, prefix,
+                                                              figures=['pie_chart'], workers=1, dpi=20)
+            assert status == {'pie_chart': expected}
+    assert sorted(name for name in os.listdir(output_dir) if name.endswith('.png')) == [
+        'esn_ycc_haplogroup_pie_chart.png', 'yri_ycc_haplogroup_pie_chart.png']